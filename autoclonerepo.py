@@ -1,35 +1,197 @@
-import requests
+"""
+autoclonerepo.py
+
+Keeps local copies of every private repository the GitHub user owns or
+collaborates on.
+
+Each run clones repositories that aren't there yet and fetches those that are,
+WORKERS at a time. A repository whose pushed_at is the same as at its last
+successful sync (recorded in <dest>/.autoclone_state.json) is skipped without
+running git at all, so a rerun costs one listing (usually 304s, see
+githubclient.py) plus git for the repositories that changed. --mode picks full,
+shallow (--depth 1), partial (--filter=blob:none) or mirror clones.
+
+The token reaches git through GIT_CONFIG_* environment variables as an
+http.extraHeader, so it is never written into a remote URL, .git/config or the
+process list. The header is scoped to the hosts the clone URLs point at, so
+GitHub Enterprise (--api-url) works and the token goes nowhere else. Clone URLs may be anything git accepts (file:// bare repositories
+work, e.g. with fakegithub.py --clone-root).
+
+Run:
+    GITHUB_TOKEN=... python autoclonerepo.py [--dest DIR] [--workers 8] [--mode partial] [--report sync.json]
+or through cloudcli.py as `github clone`.
+"""
+
+import argparse
 import base64
+import json
 import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from githubclient import GitHubError, add_client_args, client_from_args
 
 # --- Configuration ---
-GITHUB_USERNAME = ""
+# Default for --token (the GITHUB_TOKEN environment variable takes precedence)
 GITHUB_TOKEN = ""
-PER_PAGE = 1000
-page = 1
+WORKERS = 8
+STATE_FILE = ".autoclone_state.json"
+# git clone flags per --mode
+CLONE_MODES = {
+    'full': [],
+    'shallow': ['--depth', '1'],
+    'partial': ['--filter=blob:none'],
+    'mirror': ['--mirror'],
+}
+GIT_TIMEOUT = 3600  # seconds per clone / fetch
+
 
-while True:
-    print(f"Fetching page {page}...")
+def load_state(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
 
-    url = f"https://api.github.com/user/repos?visibility=private&affiliation=owner,collaborator&per_page={PER_PAGE}&page={page}"
-    auth = (GITHUB_USERNAME, GITHUB_TOKEN)
-    headers = {
-        "User-Agent": "Python"
-    }
-    response = requests.get(url, auth=auth, headers=headers)
-    repos = response.json()
 
-    if not repos:
-        break
+def save_state(path, state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as fh:
+        json.dump(state, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
 
+
+# 'https://host/' of every http(s) clone URL (github.com, or a GitHub Enterprise host)
+def clone_hosts(repos):
+    hosts = set()
     for repo in repos:
-        repo_name = repo["name"]
-        clone_url = repo["clone_url"]
-        # Embed credentials into the clone URL
-        auth_url = clone_url.replace(
-            "https://", f"https://{GITHUB_USERNAME}:{GITHUB_TOKEN}@"
-        )
-        print(f"Cloning {repo_name}...")
-        os.system(f'git clone "{auth_url}"')
-
-    page += 1
+        url = urlsplit(repo.get('clone_url') or '')
+        if url.scheme in ('http', 'https') and url.netloc:
+            hosts.add(f"{url.scheme}://{url.netloc}/")
+    return sorted(hosts)
+
+
+# Environment for git: the token as an Authorization header for each of hosts,
+# passed as GIT_CONFIG_* variables (git 2.31+) rather than on the command line
+def git_env(token, hosts=('https://github.com/',)):
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    if token:
+        basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        count = int(env.get('GIT_CONFIG_COUNT', 0))
+        for host in hosts:
+            env[f'GIT_CONFIG_KEY_{count}'] = f'http.{host}.extraheader'
+            env[f'GIT_CONFIG_VALUE_{count}'] = f"AUTHORIZATION: basic {basic}"
+            count += 1
+        env['GIT_CONFIG_COUNT'] = str(count)
+    return env
+
+
+def local_path(dest, repo, mode):
+    return os.path.join(dest, f"{repo['name']}.git" if mode == 'mirror' else repo['name'])
+
+
+# Clone or fetch one repository; returns a result row for the report
+def sync_repo(repo, dest, mode, env):
+    path = local_path(dest, repo, mode)
+    if os.path.exists(path):
+        action = 'fetch'
+        command = ['git', '-C', path, 'fetch', '--prune', '--quiet']
+        if mode == 'shallow':
+            command += ['--depth', '1']
+    else:
+        action = 'clone'
+        command = ['git', 'clone', '--quiet'] + CLONE_MODES[mode] + [repo['clone_url'], path]
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(command, env=env, capture_output=True, text=True, timeout=GIT_TIMEOUT)
+        error = None
+        if proc.returncode:
+            lines = proc.stderr.strip().splitlines() or ['git failed']
+            error = next((line for line in lines if line.startswith(('fatal:', 'error:'))), lines[-1])
+    except subprocess.TimeoutExpired:
+        error = f"timed out after {GIT_TIMEOUT}s"
+    return {'repo': repo['full_name'], 'action': action, 'status': 'failed' if error else 'ok',
+            'seconds': round(time.perf_counter() - start, 2), 'error': error}
+
+
+# Sync every listed repository into dest; returns the result rows (skipped ones
+# included). The state file is saved even if the run is interrupted, so it keeps
+# whatever finished.
+def sync_repos(repos, dest, mode='full', workers=WORKERS, token=None, force=False):
+    os.makedirs(dest, exist_ok=True)
+    state_path = os.path.join(dest, STATE_FILE)
+    state = load_state(state_path)
+    env = git_env(token, clone_hosts(repos))
+    rows, jobs = [], []
+    for repo in repos:
+        seen = state.get(repo['full_name'], {})
+        if (not force and seen.get('pushed_at') == repo.get('pushed_at') and seen.get('mode') == mode
+                and os.path.exists(local_path(dest, repo, mode))):
+            rows.append({'repo': repo['full_name'], 'action': 'skip', 'status': 'ok', 'seconds': 0.0, 'error': None})
+        else:
+            jobs.append(repo)
+    print(f"{len(jobs)} to sync, {len(rows)} unchanged since the last sync")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(sync_repo, repo, dest, mode, env): repo for repo in jobs}
+            for fut in as_completed(futures):
+                repo, row = futures[fut], fut.result()
+                rows.append(row)
+                print(f"{row['action']:>5} {row['status']:<6} {row['seconds']:>7.2f}s  {row['repo']}"
+                      + (f"  ({row['error']})" if row['error'] else ""))
+                if row['status'] == 'ok':
+                    state[repo['full_name']] = {'pushed_at': repo.get('pushed_at'), 'mode': mode}
+    finally:
+        save_state(state_path, state)
+    return rows
+
+
+def print_summary(rows, wall):
+    counts = {}
+    for row in rows:
+        key = row['action'] if row['status'] == 'ok' else 'failed'
+        counts[key] = counts.get(key, 0) + 1
+    print(f"\nSynced {len(rows)} repositories in {wall:.1f}s: "
+          + ", ".join(f"{count} {key}" for key, count in sorted(counts.items())))
+    slowest = sorted((r for r in rows if r['action'] != 'skip'), key=lambda r: -r['seconds'])[:5]
+    for row in slowest:
+        print(f"  {row['seconds']:>7.2f}s  {row['action']:<5} {row['repo']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Clone or update every private repository of a GitHub user.")
+    add_client_args(parser, GITHUB_TOKEN)
+    parser.add_argument('--dest', default='.', help="Directory to sync into (default: current directory)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f"Repositories cloned / fetched at once (default: {WORKERS})")
+    parser.add_argument('--mode', choices=list(CLONE_MODES), default='full',
+                        help="full, shallow (--depth 1), partial (--filter=blob:none) or mirror clones")
+    parser.add_argument('--visibility', choices=['private', 'public', 'all'], default='private')
+    parser.add_argument('--force', action='store_true', help="Fetch every repository, even if pushed_at is unchanged")
+    parser.add_argument('--report', metavar='PATH', help="Write per-repository timings to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    with client_from_args(args) as client:
+        try:
+            repos = list(client.paginate('/user/repos', {'visibility': args.visibility,
+                                                         'affiliation': 'owner,collaborator'}))
+        except GitHubError as e:
+            print(f"Failed to list repositories: {e}")
+            return 1
+    rows = sync_repos(repos, args.dest, args.mode, args.workers, args.token, args.force)
+    print_summary(rows, time.perf_counter() - start)
+    if args.report:
+        with open(args.report, "w") as fh:
+            json.dump(rows, fh, indent=2)
+    return 0 if all(r['status'] == 'ok' for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
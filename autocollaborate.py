@@ -1,67 +1,255 @@
-import requests
+"""
+autocollaborate.py
 
-<<<<<<< HEAD
+Reconciles the collaborators of the authenticated GitHub user's repositories
+with a desired mapping.
+
+The mapping is a JSON file of repository patterns (fnmatch globs on
+owner/name) to {login: permission}, where permission is pull, triage, push,
+maintain or admin, or null for "must not have access". Logins are compared
+case-insensitively, as GitHub does. Patterns apply in file order, so a later
+entry overrides an earlier one for the same login:
+
+    {"octo/*":       {"ci-bot": "pull"},
+     "octo/infra-*": {"alice": "admin", "bob": null}}
+
+Each run lists the collaborators and pending invitations of every matching
+repository, WORKERS at a time (unchanged listings are 304s that cost no quota,
+see githubclient.py), works out what differs and sends only those calls:
+    invite              PUT    /repos/{repo}/collaborators/{login}
+    update              PUT    /repos/{repo}/collaborators/{login}
+    update-invitation   PATCH  /repos/{repo}/invitations/{id}
+    remove              DELETE /repos/{repo}/collaborators/{login}
+    cancel-invitation   DELETE /repos/{repo}/invitations/{id}
+again WORKERS at a time. A rerun on unchanged state makes no writes. --prune
+also removes collaborators and invitations the mapping doesn't mention; the
+repository owner is never touched.
+
+Access is compared with what each login can already do (affiliation=all), so
+a login that gets at least the mapped permission through the organisation or a
+team needs no call. Only direct collaborators are changed or removed here;
+organisation and team access is left alone.
+
+Without --username only the repositories the user owns are reconciled. A
+repository whose access can't be listed (403: the token can't administer it) is
+reported as skipped and the others carry on.
+
+Run:
+    GITHUB_TOKEN=... python autocollaborate.py --desired collaborators.json [--prune] [--dry-run]
+    python autocollaborate.py --collaborator login [--permission push]     one login on every repository
+or through cloudcli.py as `github collaborate`.
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatchcase
+
+from githubclient import GitHubError, add_client_args, client_from_args
+
+# Defaults for --username / --token / --collaborator (the GITHUB_USERNAME /
+# GITHUB_TOKEN environment variables take precedence over the first two)
 GITHUB_USERNAME = ""
 TOKEN = ""
 COLLABORATOR = "copilot-chat"
+WORKERS = 8
+PERMISSIONS = ['pull', 'triage', 'push', 'maintain', 'admin']
+# The API reports (and invitations take) read / write for pull / push
+ROLE_ALIASES = {'read': 'pull', 'write': 'push'}
+INVITATION_PERMISSIONS = {'pull': 'read', 'push': 'write'}
 
-=======
-# Replace with your GitHub username, token, and collaborator username
 
-GITHUB_USERNAME = ""
+def normalise(permission):
+    return ROLE_ALIASES.get(permission, permission)
 
-TOKEN = ""
 
-COLLABORATOR = "copilot-chat"
+def load_desired(path):
+    with open(path) as fh:
+        desired = json.load(fh)
+    for pattern, logins in desired.items():
+        for login, permission in logins.items():
+            if permission is not None and normalise(permission) not in PERMISSIONS:
+                raise ValueError(f"{pattern}: unknown permission '{permission}' for {login}, "
+                                 f"expected one of {', '.join(PERMISSIONS)} or null")
+    return desired
+
+
+# {lowercased login: permission or None} for one repository
+def desired_for(full_name, desired):
+    access = {}
+    for pattern, logins in desired.items():
+        if fnmatchcase(full_name, pattern):
+            access.update({login.lower(): normalise(p) for login, p in logins.items()})
+    return access
+
+
+def _highest(permissions):
+    granted = [p for p in PERMISSIONS if permissions.get(p)]
+    return granted[-1] if granted else None
+
+
+def _permissions(client, full_name, affiliation):
+    return {c['login'].lower(): normalise(c.get('role_name') or _highest(c.get('permissions', {})))
+            for c in client.paginate(f"/repos/{full_name}/collaborators", {'affiliation': affiliation})}
+
+
+# (collaborators {login: permission}, direct collaborators {login: permission},
+# invitations {login: (id, permission)}), logins lowercased. collaborators is
+# everyone's effective access, organisation and team grants included.
+def current_access(client, full_name):
+    collaborators = _permissions(client, full_name, 'all')
+    direct = _permissions(client, full_name, 'direct')
+    invitations = {i['invitee']['login'].lower(): (i['id'], normalise(i.get('permissions')))
+                   for i in client.paginate(f"/repos/{full_name}/invitations")}
+    return collaborators, direct, invitations
+
+
+def _rank(permission):
+    return PERMISSIONS.index(permission) if permission in PERMISSIONS else -1
+
+
+# The calls that take one repository from its current access to the desired one.
+# direct (default: all of collaborators) are the collaborators that can be
+# changed here; the rest have access through the organisation or a team.
+def plan_repo(full_name, owner, access, collaborators, invitations, prune=False, direct=None):
+    base = f"/repos/{full_name}"
+    owner = (owner or '').lower()
+    direct = collaborators if direct is None else direct
+    changes = []
+
+    def change(action, login, method, path, permission=None, body=None):
+        changes.append({'repo': full_name, 'action': action, 'login': login, 'permission': permission,
+                        'method': method, 'path': path, 'json': body})
+
+    for login, permission in sorted(access.items()):
+        if login == owner or permission is None:
+            continue
+        if login in direct:
+            if direct[login] != permission:
+                change('update', login, 'PUT', f"{base}/collaborators/{login}", permission,
+                       {'permission': permission})
+        elif _rank(collaborators.get(login)) >= _rank(permission):
+            # Already granted at least this through the organisation or a team
+            continue
+        elif login in invitations:
+            invitation_id, invited = invitations[login]
+            if invited != permission:
+                change('update-invitation', login, 'PATCH', f"{base}/invitations/{invitation_id}", permission,
+                       {'permissions': INVITATION_PERMISSIONS.get(permission, permission)})
+        else:
+            change('invite', login, 'PUT', f"{base}/collaborators/{login}", permission, {'permission': permission})
+
+    unwanted = {login for login, permission in access.items() if permission is None}
+    if prune:
+        unwanted |= (set(direct) | set(invitations)) - set(access)
+    for login in sorted(unwanted - {owner}):
+        if login in direct:
+            change('remove', login, 'DELETE', f"{base}/collaborators/{login}")
+        if login in invitations:
+            change('cancel-invitation', login, 'DELETE', f"{base}/invitations/{invitations[login][0]}")
+    return changes
+
+
+# List the current access of every repository the mapping covers and plan the
+# changes; returns (changes, number of repositories checked, {repository: error}
+# for those whose access couldn't be listed). Without owner, only the user's own
+# repositories.
+def plan(client, desired, owner=None, prune=False, workers=WORKERS):
+    listing = {} if owner else {'affiliation': 'owner'}
+    repos = [r for r in client.paginate('/user/repos', listing)
+             if desired_for(r['full_name'], desired) and (not owner or r['owner']['login'].lower() == owner.lower())]
+
+    def plan_one(repo):
+        try:
+            collaborators, direct, invitations = current_access(client, repo['full_name'])
+        except GitHubError as e:
+            return [], e
+        return plan_repo(repo['full_name'], repo['owner']['login'], desired_for(repo['full_name'], desired),
+                         collaborators, invitations, prune, direct), None
+
+    changes, skipped = [], {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for repo, (planned, error) in zip(repos, pool.map(plan_one, repos)):
+            changes += planned
+            if error is not None:
+                skipped[repo['full_name']] = error
+    return changes, len(repos), skipped
+
+
+def describe(change):
+    permission = f" ({change['permission']})" if change['permission'] else ""
+    return f"{change['action']:>17}  {change['repo']}  {change['login']}{permission}"
+
+
+# Send the planned calls, WORKERS at a time; returns the changes that failed
+# (an error status, or no response at all)
+def apply(client, changes, workers=WORKERS):
+    failed = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(client.request, c['method'], c['path'], json=c['json']): c for c in changes}
+        for fut in as_completed(futures):
+            change = futures[fut]
+            try:
+                status = fut.result().status_code
+            except (OSError, GitHubError) as e:
+                # requests' ConnectionError and Timeout are OSErrors
+                status = e
+            # 201: invitation sent, 204: collaborator updated / removed
+            if status not in (200, 201, 204):
+                failed.append(change)
+            print(describe(change) + ("" if status in (200, 201, 204) else f"  FAILED: {status}"))
+    return failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reconcile the collaborators of a GitHub user's repositories.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--desired', metavar='PATH',
+                        help="JSON mapping of repository patterns to {login: permission}")
+    target.add_argument('--collaborator', default=COLLABORATOR,
+                        help=f"Without --desired: give this login access to every repository (default: {COLLABORATOR})")
+    parser.add_argument('--permission', default='push', choices=PERMISSIONS,
+                        help="Permission for --collaborator (default: push)")
+    parser.add_argument('--username', default=os.environ.get('GITHUB_USERNAME', GITHUB_USERNAME),
+                        help="Only repositories owned by this login")
+    add_client_args(parser, TOKEN)
+    parser.add_argument('--prune', action='store_true',
+                        help="Also remove collaborators and invitations the mapping doesn't mention")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f"Repositories listed / calls sent at once (default: {WORKERS})")
+    parser.add_argument('--dry-run', action='store_true', help="Print the planned calls without sending them")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        desired = load_desired(args.desired) if args.desired else {'*': {args.collaborator: args.permission}}
+    except (OSError, ValueError) as e:
+        print(f"Can't read {args.desired}: {e}")
+        return 1
+    with client_from_args(args) as client:
+        try:
+            changes, checked, skipped = plan(client, desired, args.username, args.prune, args.workers)
+        except GitHubError as e:
+            print(f"Failed to list repositories: {e}")
+            return 1
+        for full_name, error in sorted(skipped.items()):
+            print(f"{'skipped':>17}  {full_name}  (can't list access: {error})")
+        print(f"{checked} repositories checked, {len(changes)} changes needed"
+              + (f", {len(skipped)} skipped" if skipped else ""))
+        if args.dry_run:
+            for change in changes:
+                print(describe(change))
+            return 1 if skipped else 0
+        failed = apply(client, changes, args.workers)
+        stats = client.stats()
+    print(f"Applied {len(changes) - len(failed)} of {len(changes)} changes; {stats['requests']} requests, "
+          f"{stats['not_modified']} of them unchanged listings")
+    return 1 if failed or skipped else 0
+
 
-# API endpoint to list repositories
-REPO_LIST_URL = f"https://api.github.com/user/repos"
-
-# Headers for authentication
->>>>>>> 96da162d62b899d8c129d5f3fc08b5b4b3467bb5
-headers = {
-    "Authorization": f"token {TOKEN}"
-}
-
-def add_collaborator(repo_name):
-    url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{repo_name}/collaborators/{COLLABORATOR}"
-    response = requests.put(url, headers=headers)
-<<<<<<< HEAD
-    if response.status_code == 201 or response.status_code == 204:
-=======
-    if response.status_code == 201:
->>>>>>> 96da162d62b899d8c129d5f3fc08b5b4b3467bb5
-        print(f"Collaborator added to {repo_name}")
-    else:
-        print(f"Failed to add collaborator to {repo_name}: {response.status_code}")
-
-<<<<<<< HEAD
-def get_all_repos():
-    repos = []
-    page = 1
-    while True:
-        url = f"https://api.github.com/user/repos?per_page=100&page={page}"
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            print(f"Failed to fetch repositories: {response.status_code}")
-            break
-        page_repos = response.json()
-        if not page_repos:
-            break
-        repos.extend(page_repos)
-        page += 1
-    return repos
-
-repos = get_all_repos()
-for repo in repos:
-    add_collaborator(repo["name"])
-=======
-# Get the list of repositories
-response = requests.get(REPO_LIST_URL, headers=headers)
-if response.status_code == 200:
-    repos = response.json()
-    for repo in repos:
-        add_collaborator(repo["name"])
-else:
-    print(f"Failed to fetch repositories: {response.status_code}")
->>>>>>> 96da162d62b899d8c129d5f3fc08b5b4b3467bb5
+if __name__ == "__main__":
+    sys.exit(main())
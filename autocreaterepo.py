@@ -1,29 +1,250 @@
+"""
+autocreaterepo.py
+
+Turns every folder under a base directory into a git repository and pushes it
+to a new private GitHub repository of the same name.
+
+Folders go through three steps; the local one and the two remote ones have
+separate worker pools:
+    local    git init / add / commit / branch -M main    (LOCAL_WORKERS at a time)
+    create   create the repository                        (REMOTE_WORKERS at a time,
+    push     set it as origin, git push -u origin main     together with create)
+A folder's remote steps start as soon as its local step is done. Folders that
+are already git repositories skip the local step, and folders whose repository
+already exists on GitHub skip the remote ones. Every finished step is appended
+to a journal (<base_dir>/.autocreate_journal.jsonl), so a rerun after a failure
+or an interrupt only does what is left; a failed folder doesn't stop the rest.
+The create entry carries the new repository's clone_url, and an existing
+repository still counts as this folder's own (and is pushed) when it is empty
+or the folder's origin already points at it, so a run interrupted between
+creating and journaling doesn't leave the repository unpushed.
+
+Repositories are created through githubclient.py (POST /user/repos) and pushed
+with the token passed to git as in autoclonerepo.py, so --api-url can point
+both at fakegithub.py --clone-root.
+
+Run:
+    GITHUB_TOKEN=... python autocreaterepo.py BASE_DIR [--local-workers 8] [--remote-workers 3]
+or through cloudcli.py as `github create`.
+"""
+
+import argparse
+import json
 import os
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from autoclonerepo import git_env
+from githubclient import GitHubError, add_client_args, client_from_args
+
+GITHUB_TOKEN = ""
+LOCAL_WORKERS = 8
+# Repository creation counts towards GitHub's secondary (content-creation) limits
+REMOTE_WORKERS = 3
+JOURNAL_FILE = ".autocreate_journal.jsonl"
+STEPS = ['local', 'create', 'push']
+
+
+class StepFailed(Exception):
+    pass
 
-# Set working directory
-base_dir = r"C:\Users\saksh\Downloads\Angular"
-os.chdir(base_dir)
 
-# Get list of folders
-folders = [f for f in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, f))]
+def git(path, *args, env=None):
+    proc = subprocess.run(["git", *args], cwd=path, env=env, capture_output=True, text=True)
+    if proc.returncode:
+        lines = proc.stderr.strip().splitlines() or [f"git {args[0]} failed"]
+        raise StepFailed(next((line for line in lines if line.startswith(('fatal:', 'error:'))), lines[-1]))
+    return proc.stdout.strip()
 
-for folder in folders:
-    repo_name = folder
-    path = os.path.join(base_dir, folder)
 
-    print(f"\nCreating and pushing {repo_name}...")
+# Append-only record of finished steps; the last entry per (folder, step) counts
+class Journal:
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        # {folder: clone_url} of the repositories created for folders
+        self.clone_urls = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path) as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = (entry['folder'], entry['step'])
+                    if entry.get('clone_url'):
+                        self.clone_urls[entry['folder']] = entry['clone_url']
+                    if entry['status'] in ('ok', 'skipped'):
+                        self.done.add(key)
+                    else:
+                        self.done.discard(key)
+        except OSError:
+            pass
 
-    os.chdir(path)
+    def record(self, folder, step, status, detail=None, clone_url=None):
+        entry = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'folder': folder, 'step': step, 'status': status}
+        if detail:
+            entry['detail'] = detail
+        if clone_url:
+            entry['clone_url'] = clone_url
+        with self._lock:
+            with open(self.path, "a") as fh:
+                fh.write(json.dumps(entry) + "\n")
+            if status in ('ok', 'skipped'):
+                self.done.add((folder, step))
+            if clone_url:
+                self.clone_urls[folder] = clone_url
 
+
+def local_step(path):
+    if os.path.isdir(os.path.join(path, ".git")):
+        try:
+            git(path, "rev-parse", "--verify", "HEAD")
+            return 'skipped', "already a git repository"
+        except StepFailed:
+            pass
     # Initialize git repo
-    subprocess.run(["git", "init"], check=True)
-    subprocess.run(["git", "add", "."], check=True)
-    subprocess.run(["git", "commit", "-m", "Initial commit"], check=True)
-    subprocess.run(["git", "branch", "-M", "main"], check=True)
-
-    # Create repo on GitHub using GitHub CLI
-    subprocess.run([
-        "gh", "repo", "create", repo_name,
-        "--private", "--source=.", "--remote=origin", "--push"
-    ], check=True)
+    git(path, "init", "-q")
+    git(path, "add", ".")
+    git(path, "commit", "-q", "-m", "Initial commit")
+    git(path, "branch", "-M", "main")
+    return 'ok', None
+
+
+# A 422 from POST /user/repos is also returned for invalid names; only the
+# "name already exists" validation error means the repository is there
+def already_exists(response):
+    try:
+        errors = response.json().get('errors') or []
+    except ValueError:
+        return False
+    return any('name already exists' in (error.get('message') or '') for error in errors if isinstance(error, dict))
+
+
+def origin_url(path):
+    try:
+        return git(path, "remote", "get-url", "origin")
+    except StepFailed:
+        return None
+
+
+# An existing repository is the folder's own when nothing has been pushed to it
+# yet (an earlier run created it and stopped before journaling) or the folder's
+# origin already points at it
+def is_ours(path, repo):
+    return repo.get('size') == 0 or origin_url(path) == repo.get('clone_url')
+
+
+# Returns (status, detail, clone_url of the folder's repository or None)
+def create_step(client, path, repo_name, existing):
+    repo = existing.get(repo_name)
+    if repo is None:
+        response = client.post('/user/repos', json={'name': repo_name, 'private': True})
+        if response.status_code == 201:
+            return 'ok', None, response.json()['clone_url']
+        if response.status_code != 422 or not already_exists(response):
+            raise GitHubError(response)
+        # Created since the listing
+        repo = client.get(f"/repos/{client.get('/user')['login']}/{repo_name}")
+    if is_ours(path, repo):
+        return 'ok', "created by an earlier run", repo['clone_url']
+    return 'skipped', "already exists on GitHub", None
+
+
+def push_step(path, env, clone_url):
+    if clone_url and origin_url(path) != clone_url:
+        remotes = git(path, "remote").split()
+        git(path, "remote", "set-url" if "origin" in remotes else "add", "origin", clone_url)
+    git(path, "push", "-q", "-u", "origin", "HEAD:main", env=env)
+    return 'ok', None
+
+
+# Run the steps left for every folder in base_dir; returns {folder: {step: status}}
+# for the folders that had any
+def create_repos(client, base_dir, token=None, local_workers=LOCAL_WORKERS, remote_workers=REMOTE_WORKERS):
+    journal = Journal(os.path.join(base_dir, JOURNAL_FILE))
+    folders = sorted(f for f in os.listdir(base_dir)
+                     if os.path.isdir(os.path.join(base_dir, f)) and not f.startswith('.'))
+    pending = [f for f in folders if any((f, step) not in journal.done for step in STEPS)]
+    print(f"{len(folders)} folders, {len(folders) - len(pending)} already done according to {journal.path}")
+    existing = {}
+    if any((f, 'create') not in journal.done for f in pending):
+        existing = {repo['name']: repo for repo in client.paginate('/user/repos', {'affiliation': 'owner'})}
+    env = git_env(token)
+    results = {f: {} for f in pending}
+
+    def run(folder, step, func, *args):
+        clone_url = None
+        try:
+            status, detail, *rest = func(*args)
+            clone_url = rest[0] if rest else None
+        except (StepFailed, GitHubError, OSError) as e:
+            status, detail = 'failed', str(e)
+        journal.record(folder, step, status, detail, clone_url)
+        results[folder][step] = status
+        print(f"{step:>6} {status:<7} {folder}" + (f"  ({detail})" if detail else ""))
+        return status
+
+    with ThreadPoolExecutor(max_workers=max(1, local_workers)) as local_pool, \
+            ThreadPoolExecutor(max_workers=max(1, remote_workers)) as remote_pool:
+        remote_futures = []
+        lock = threading.Lock()
+
+        # A repository created by an earlier run whose push failed is only pushed
+        def remote_job(folder, path):
+            if (folder, 'create') not in journal.done:
+                status = run(folder, 'create', create_step, client, path, folder, existing)
+                if status == 'failed':
+                    return
+                if status == 'skipped':
+                    # Someone else's repository: leave it alone
+                    journal.record(folder, 'push', 'skipped', "repository existed before")
+                    return
+            run(folder, 'push', push_step, path, env, journal.clone_urls.get(folder))
+
+        def folder_job(folder):
+            path = os.path.join(base_dir, folder)
+            if (folder, 'local') not in journal.done and run(folder, 'local', local_step, path) == 'failed':
+                return
+            if (folder, 'push') not in journal.done:
+                future = remote_pool.submit(remote_job, folder, path)
+                with lock:
+                    remote_futures.append(future)
+
+        wait([local_pool.submit(folder_job, folder) for folder in pending])
+        wait(remote_futures)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create and push a private GitHub repository per folder.")
+    parser.add_argument('base_dir', help="Folder whose subfolders become repositories")
+    add_client_args(parser, GITHUB_TOKEN)
+    parser.add_argument('--local-workers', type=int, default=LOCAL_WORKERS,
+                        help=f"Folders initialised and committed at once (default: {LOCAL_WORKERS})")
+    parser.add_argument('--remote-workers', type=int, default=REMOTE_WORKERS,
+                        help=f"Repositories created and pushed at once (default: {REMOTE_WORKERS})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.perf_counter()
+    with client_from_args(args) as client:
+        try:
+            results = create_repos(client, args.base_dir, args.token, args.local_workers, args.remote_workers)
+        except GitHubError as e:
+            print(f"Failed to list existing repositories: {e}")
+            return 1
+    failed = sorted(f for f, steps in results.items() if 'failed' in steps.values())
+    print(f"\nProcessed {len(results)} folders in {time.perf_counter() - start:.1f}s, {len(failed)} failed"
+          + (f": {', '.join(failed)} (rerun to retry them)" if failed else ""))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,39 +1,244 @@
-import requests
-from getpass import getpass
+"""
+autodeleterepo.py
 
-# Replace with your GitHub username and personal access token
-GITHUB_USER = 'your-username'
-GITHUB_TOKEN = 'your-token'
+Deletes GitHub repositories the authenticated user owns, either asking about
+each one or from a reviewed plan. Organisation repositories and ones the user
+only collaborates on are never listed, so no filter can select them.
+
+Plan and apply (for cleaning up many repositories at once):
+    python autodeleterepo.py --name 'tmp-*' --archived yes --pushed-before 2023-01-01 --plan delete_plan.json
+        lists the repositories matching every filter into the plan file; nothing
+        is deleted. Filters: --name GLOB (repeatable, any may match), --archived
+        yes/no, --fork yes/no, --visibility, --pushed-before / --pushed-after DATE.
+    python autodeleterepo.py --apply delete_plan.json [--workers 4] [--dry-run]
+        deletes the repositories in the plan, WORKERS at a time. A repository
+        pushed to since the plan was written is left alone. Secondary rate limits
+        are backed off and retried (see githubclient.py). Per-repository results
+        and a summary go to <plan>.results.json (or --results PATH).
+
+Asking (the original mode):
+    GITHUB_TOKEN=... python autodeleterepo.py                       asks per repository
+    python autodeleterepo.py --repo you/old-1 --repo you/old-2 --yes  no questions (cron / CI)
+Without a terminal to ask on and without --yes, nothing is deleted.
+
+--dry-run prints what would be deleted in either mode. Run through cloudcli.py
+as `github delete`; fakegithub.py serves the same endpoints for trying it out.
+"""
 
-# GitHub API to list repositories
-repos_url = 'https://api.github.com/user/repos?per_page=1000'
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatchcase
 
-# Fetch list of repositories
-response = requests.get(repos_url, auth=(GITHUB_USER, GITHUB_TOKEN))
+from githubclient import GitHubError, add_client_args, client_from_args
 
-if response.status_code != 200:
-    print(f"Error fetching repositories: {response.status_code}")
-    exit()
+# Replace with your GitHub personal access token, or pass --token (the
+# GITHUB_TOKEN environment variable takes precedence over this)
+GITHUB_TOKEN = 'your-token'
+PLAN_FILE = "delete_plan.json"
+# Deletions are writes, which GitHub's secondary rate limits are strictest about
+WORKERS = 4
+PLAN_FIELDS = ['full_name', 'visibility', 'archived', 'fork', 'pushed_at']
+# Only repositories the user owns are ever listed for deletion, never organisation
+# repositories or ones the user merely collaborates on
+OWNED = {'affiliation': 'owner'}
 
-repos = response.json()
 
-# Loop through each repository
-for repo in repos:
-    repo_name = repo['full_name']
-    
+def confirm(repo_name, args):
+    if args.yes:
+        return True
+    if not sys.stdin.isatty():
+        return False
     # Ask for confirmation before deleting
     user_input = input(f"Do you want to delete the repository '{repo_name}'? (y/n): ").strip().lower()
-    
-    if user_input == 'y':
-        # Proceed to delete the repo
-        delete_url = f"https://api.github.com/repos/{repo_name}"
-        delete_response = requests.delete(delete_url, auth=(GITHUB_USER, GITHUB_TOKEN))
-        
-        if delete_response.status_code == 204:
-            print(f"Repository '{repo_name}' deleted successfully.")
+    return user_input == 'y'
+
+
+def has_filters(args):
+    return bool(args.name or args.archived or args.fork or args.visibility or args.pushed_before
+                or args.pushed_after)
+
+
+# True if repo matches every filter given; pushed_at is compared as an ISO 8601
+# string, so --pushed-before 2023 and 2023-01-01T00:00:00Z both work
+def matches(repo, args):
+    pushed = repo.get('pushed_at') or ''
+    return ((not args.name or any(fnmatchcase(repo['name'], glob) or fnmatchcase(repo['full_name'], glob)
+                                  for glob in args.name))
+            and (not args.archived or repo.get('archived', False) == (args.archived == 'yes'))
+            and (not args.fork or repo.get('fork', False) == (args.fork == 'yes'))
+            and (not args.visibility or repo.get('visibility', 'private' if repo.get('private') else 'public')
+                 == args.visibility)
+            and (not args.pushed_before or pushed < args.pushed_before)
+            and (not args.pushed_after or pushed >= args.pushed_after))
+
+
+def filter_args(args):
+    return {key: getattr(args, key) for key in ['name', 'archived', 'fork', 'visibility', 'pushed_before',
+                                                'pushed_after'] if getattr(args, key)}
+
+
+def write_plan(client, args):
+    try:
+        repos = [repo for repo in client.paginate('/user/repos', OWNED) if matches(repo, args)]
+    except GitHubError as e:
+        print(f"Error fetching repositories: {e.status}")
+        return 1
+    for repo in repos:
+        print(f"  {repo['full_name']:<50} {repo.get('visibility', ''):<8} pushed {repo.get('pushed_at')}"
+              + (" archived" if repo.get('archived') else "") + (" fork" if repo.get('fork') else ""))
+    if args.dry_run:
+        print(f"{len(repos)} repositories match (dry run, no plan written)")
+        return 0
+    plan = {'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'filters': filter_args(args),
+            'repositories': [{key: repo.get(key) for key in PLAN_FIELDS} for repo in repos]}
+    with open(args.plan, "w") as fh:
+        json.dump(plan, fh, indent=2)
+    print(f"{len(repos)} repositories match; review {args.plan}, then run with --apply {args.plan}")
+    return 0
+
+
+def delete_repo(client, full_name):
+    response = client.delete(f"/repos/{full_name}")
+    # 404: already gone, which is what the plan asked for
+    status = {204: 'deleted', 404: 'not-found'}.get(response.status_code, 'failed')
+    return {'repo': full_name, 'status': status, 'http_status': response.status_code}
+
+
+# Delete the repositories in a plan file; writes the results file
+def apply_plan(client, args):
+    try:
+        with open(args.apply) as fh:
+            planned = json.load(fh)['repositories']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Can't read plan {args.apply}: {e}")
+        return 1
+    try:
+        current = {repo['full_name']: repo for repo in client.paginate('/user/repos', OWNED)}
+    except GitHubError as e:
+        print(f"Error fetching repositories: {e.status}")
+        return 1
+    start = time.perf_counter()
+    results, jobs = [], []
+    for entry in planned:
+        repo = current.get(entry['full_name'])
+        if repo is None:
+            results.append({'repo': entry['full_name'], 'status': 'not-found', 'http_status': None})
+        elif repo.get('pushed_at') != entry.get('pushed_at'):
+            results.append({'repo': entry['full_name'], 'status': 'changed', 'http_status': None})
+        elif args.dry_run:
+            results.append({'repo': entry['full_name'], 'status': 'would-delete', 'http_status': None})
+        else:
+            jobs.append(entry['full_name'])
+    for row in results:
+        print(f"{row['status']:>12}  {row['repo']}")
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(delete_repo, client, full_name) for full_name in jobs]
+        for fut in as_completed(futures):
+            row = fut.result()
+            results.append(row)
+            print(f"{row['status']:>12}  {row['repo']}"
+                  + (f"  (status {row['http_status']})" if row['status'] == 'failed' else ""))
+
+    counts = {}
+    for row in results:
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+    stats = client.stats()
+    summary = {'plan': args.apply, 'dry_run': args.dry_run, 'seconds': round(time.perf_counter() - start, 2),
+               'counts': counts, 'secondary_limits': stats['secondary_limits'], 'requests': stats['requests'],
+               'results': sorted(results, key=lambda r: r['repo'])}
+    results_path = args.results or f"{os.path.splitext(args.apply)[0]}.results.json"
+    with open(results_path, "w") as fh:
+        json.dump(summary, fh, indent=2)
+    print(f"\n{len(planned)} planned in {summary['seconds']:.1f}s: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+          + f" ({stats['secondary_limits']} secondary rate limits backed off); results in {results_path}")
+    return 1 if counts.get('failed') else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Delete GitHub repositories, asking about each one or from a plan.")
+    add_client_args(parser, GITHUB_TOKEN)
+    parser.add_argument('--repo', action='append', default=[], metavar='OWNER/NAME',
+                        help="Only consider this repository (repeatable)")
+    parser.add_argument('--yes', '-y', action='store_true',
+                        help="Delete the --repo repositories without asking")
+    filters = parser.add_argument_group("plan filters (a repository must match all of them)")
+    filters.add_argument('--name', action='append', default=[], metavar='GLOB',
+                         help="Name or owner/name glob (repeatable, any may match)")
+    filters.add_argument('--archived', choices=['yes', 'no'])
+    filters.add_argument('--fork', choices=['yes', 'no'])
+    filters.add_argument('--visibility', choices=['private', 'public', 'internal'])
+    filters.add_argument('--pushed-before', metavar='DATE', help="Last pushed before this ISO date")
+    filters.add_argument('--pushed-after', metavar='DATE', help="Last pushed on or after this ISO date")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--plan', nargs='?', const=PLAN_FILE, metavar='PATH',
+                      help=f"Write the repositories matching the filters to a plan file (default: {PLAN_FILE})")
+    mode.add_argument('--apply', metavar='PATH', help="Delete the repositories in this plan file")
+    parser.add_argument('--results', metavar='PATH', help="Results file for --apply (default: <plan>.results.json)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f"Concurrent deletions with --apply (default: {WORKERS})")
+    parser.add_argument('--dry-run', action='store_true', help="Show what would be deleted without deleting")
+    args = parser.parse_args(argv)
+    if has_filters(args) and not args.plan:
+        args.plan = PLAN_FILE
+    if args.yes and not args.repo:
+        parser.error("--yes needs the repositories to delete named with --repo")
+    if (args.plan or args.apply) and (args.repo or args.yes):
+        parser.error("--repo / --yes can't be combined with a plan; use --name filters instead")
+    if args.apply and has_filters(args):
+        parser.error("filters select what goes into a plan; --apply deletes exactly what the plan lists")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with client_from_args(args) as client:
+        if args.plan:
+            return write_plan(client, args)
+        if args.apply:
+            return apply_plan(client, args)
+        return delete_repos(client, args)
+
+
+def delete_repos(client, args):
+    # Fetch list of repositories (every page)
+    try:
+        repos = list(client.paginate('/user/repos', OWNED))
+    except GitHubError as e:
+        print(f"Error fetching repositories: {e.status}")
+        return 1
+
+    if args.repo:
+        repos = [repo for repo in repos if repo['full_name'] in args.repo]
+    if not args.yes and not sys.stdin.isatty():
+        print("No terminal to confirm deletions on; pass --repo ... --yes to delete without asking.")
+
+    # Loop through each repository
+    for repo in repos:
+        repo_name = repo['full_name']
+
+        if confirm(repo_name, args):
+            if args.dry_run:
+                print(f"Would delete '{repo_name}'.")
+                continue
+            # Proceed to delete the repo
+            delete_response = client.delete(f"/repos/{repo_name}")
+
+            if delete_response.status_code == 204:
+                print(f"Repository '{repo_name}' deleted successfully.")
+            else:
+                print(f"Failed to delete '{repo_name}'. Status code: {delete_response.status_code}")
         else:
-            print(f"Failed to delete '{repo_name}'. Status code: {delete_response.status_code}")
-    else:
-        print(f"Skipping repository '{repo_name}'.")
+            print(f"Skipping repository '{repo_name}'.")
+
+    print("Process complete.")
+    return 0
+
 
-print("Process complete.")
+if __name__ == "__main__":
+    sys.exit(main())
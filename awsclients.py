@@ -0,0 +1,116 @@
+"""
+awsclients.py
+
+Shared boto3 client registry used by the scanners in createinfradiagram.py.
+
+Creating a boto3 client loads the service model and opens a new connection pool,
+so building one per scanner call is expensive when many regions are scanned.
+ClientPool hands out one client per (service, region, profile) and reuses it.
+boto3 clients are thread-safe once created; sessions are not, so creation is
+serialised behind a lock. A pool can also be pointed at an existing session
+(e.g. assumed-role credentials for another account, see orgscan.py), and hooks
+can be registered to instrument every client it creates (see scantrace.py).
+
+boto3 is imported when the first session is created, so importing this module
+(and the scripts built on it) stays cheap for commands that never call AWS.
+"""
+
+import threading
+import logging
+
+# Connections per client; should be at least the number of scan workers that may
+# share a client (e.g. concurrent EKS describes in one region)
+MAX_POOL_CONNECTIONS = 32
+
+
+class ClientPool:
+    def __init__(self, max_pool_connections=MAX_POOL_CONNECTIONS, profile=None, session=None):
+        self.max_pool_connections = max_pool_connections
+        # Profile used when a caller doesn't name one (None = env / default chain)
+        self.profile = profile
+        # Session used instead of the profile's when set
+        self.session = session
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._clients = {}
+        # Called with each client as it is created
+        self._hooks = []
+        self.hits = 0
+        self.creations = 0
+
+    def _session(self, profile):
+        # Caller holds the lock
+        if profile is None and self.session is not None:
+            return self.session
+        session = self._sessions.get(profile)
+        if session is None:
+            import boto3.session
+            session = boto3.session.Session(profile_name=profile)
+            self._sessions[profile] = session
+        return session
+
+    def client(self, service, region=None, profile=None):
+        profile = profile or self.profile
+        key = (service, region, profile)
+        client = self._clients.get(key)
+        if client is not None:
+            with self._lock:
+                self.hits += 1
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+            from botocore.config import Config
+            # Retries are handled by ratelimit.call_api so throttling feeds its limiter
+            config = Config(max_pool_connections=self.max_pool_connections,
+                            retries={'mode': 'standard', 'total_max_attempts': 1})
+            client = self._session(profile).client(service, region_name=region, config=config)
+            for hook in self._hooks:
+                hook(client)
+            self._clients[key] = client
+            self.creations += 1
+            logging.debug(f"Created {service} client for {region or 'default region'}")
+            return client
+
+    # Run hook(client) on every client, existing ones included
+    def add_hook(self, hook):
+        with self._lock:
+            self._hooks.append(hook)
+            clients = list(self._clients.values())
+        for client in clients:
+            hook(client)
+
+    def stats(self):
+        with self._lock:
+            return {'clients': len(self._clients), 'creations': self.creations, 'hits': self.hits}
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+            self.hits = 0
+            self.creations = 0
+
+
+# Process-wide pool shared by all scanners
+CLIENTS = ClientPool()
+
+
+def get_client(service, region=None, profile=None):
+    return CLIENTS.client(service, region, profile)
+
+
+# session switches every profile-less client to that boto3 session (dropping
+# clients made with the previous one)
+def configure(max_pool_connections=None, profile=None, session=None):
+    if max_pool_connections and max_pool_connections != CLIENTS.max_pool_connections:
+        CLIENTS.clear()
+        CLIENTS.max_pool_connections = max_pool_connections
+    if profile:
+        CLIENTS.profile = profile
+    if session is not None and session is not CLIENTS.session:
+        CLIENTS.clear()
+        CLIENTS.session = session
+    return CLIENTS
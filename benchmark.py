@@ -0,0 +1,492 @@
+"""
+benchmark.py
+
+Performance benchmarks for the AWS exporter on synthetic inventories, so changes
+can be measured without a real AWS account.
+
+Run:
+    python benchmark.py graph [--sizes 1000 10000 100000]
+    python benchmark.py memory [--size 500000]
+    python benchmark.py suite [--sizes 1000 10000 100000] [--output bench_results.json]
+                              [--baseline old_results.json] [--workers 8] [--latency 20]
+    python benchmark.py startup [--runs 5] [--budget-ms 150]
+
+The suite serves a synthetic account to scan_account through a stubbed
+botocore (StubAccount answers every call from memory, paginated like the real
+API, optionally with a fixed per-call latency), then times each phase in its own
+process: scan, scan with a warm cache, build_graph, and the split render
+pipeline. Each phase records wall time, API calls and peak RSS; --baseline
+compares against an earlier results file and exits non-zero on regressions.
+
+The startup benchmark runs cloudcli.py commands under `python -X importtime`
+and fails when one imports a module in HEAVY_MODULES it doesn't need, or spends
+more than the budget importing (interpreter start-up itself not counted).
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import quote
+
+# Shape of the generated accounts
+REGIONS = ['us-east-1', 'us-west-2', 'eu-west-1', 'ap-southeast-1']
+VPCS_PER_REGION = 250
+SUBNETS_PER_VPC = 6
+INSTANCE_TYPES = ['t3.micro', 't3.large', 'm5.large', 'm5.xlarge', 'c5.2xlarge', 'r5.large']
+RUNTIMES = ['python3.12', 'python3.9', 'nodejs20.x', 'nodejs16.x', 'java17', 'go1.x']
+
+
+# Build a results dict (scan_account shape) with roughly `size` resources spread
+# over REGIONS x VPCS_PER_REGION x SUBNETS_PER_VPC. Seeded, so runs are comparable.
+# Resources are plain dicts; inventory.to_records() converts them.
+def synthetic_results(size, seed=0):
+    from inventory import new_region, new_global
+    rnd = random.Random(seed)
+    results = {'regions': {}, 'global': new_global()}
+    results['global']['iam'] = {'UsersCount': 10, 'RolesCount': 50, 'ManagedPoliciesCount': 20}
+    per_region = max(1, size // len(REGIONS))
+    for r in REGIONS:
+        data = new_region()
+        subnets = []
+        for v in range(VPCS_PER_REGION):
+            vpc_id = f"vpc-{r}-{v:04d}"
+            data['vpcs'][vpc_id] = {'CidrBlock': f"10.{v % 256}.0.0/16", 'IsDefault': v == 0, 'Tags': [], 'Subnets': []}
+            for s in range(SUBNETS_PER_VPC):
+                subnet_id = f"subnet-{r}-{v:04d}-{s}"
+                data['vpcs'][vpc_id]['Subnets'].append(
+                    {'SubnetId': subnet_id, 'CidrBlock': f"10.{v % 256}.{s}.0/24", 'AvailabilityZone': f"{r}{'abc'[s % 3]}"})
+                subnets.append((vpc_id, subnet_id))
+        for i in range(per_region):
+            vpc_id, subnet_id = rnd.choice(subnets)
+            kind = rnd.random()
+            if kind < 0.6:
+                data['ec2'].append({
+                    'InstanceId': f"i-{r}-{i:08x}", 'State': rnd.choice(['running', 'running', 'stopped']),
+                    'InstanceType': rnd.choice(INSTANCE_TYPES), 'VpcId': vpc_id, 'SubnetId': subnet_id, 'Name': f"web-{i}"})
+            elif kind < 0.9:
+                vpc_config = {'SubnetIds': [subnet_id], 'SecurityGroupIds': [], 'VpcId': vpc_id} if rnd.random() < 0.3 \
+                    else {'SubnetIds': [], 'SecurityGroupIds': [], 'VpcId': ''}
+                data['lambda'].append({'FunctionName': f"fn-{r}-{i}", 'Runtime': rnd.choice(RUNTIMES), 'VpcConfig': vpc_config})
+            elif kind < 0.97:
+                data['rds'].append({
+                    'DBInstanceIdentifier': f"db-{r}-{i}", 'Engine': 'postgres', 'DBInstanceClass': 'db.m5.large',
+                    'VpcId': vpc_id, 'Status': 'available', 'MultiAZ': rnd.random() < 0.5})
+            elif kind < 0.99:
+                data['elbv2'].append({
+                    'LoadBalancerName': f"lb-{r}-{i}", 'Type': 'application', 'Scheme': 'internet-facing',
+                    'VpcId': vpc_id, 'DNSName': f"lb-{i}.{r}.elb.amazonaws.com"})
+            else:
+                results['global']['s3'].append({'Name': f"bucket-{r}-{i}", 'CreationDate': '2024-01-01 00:00:00+00:00'})
+        results['regions'][r] = data
+    return results
+
+
+def bench_graph(sizes):
+    from createinfradiagram import build_graph
+    print(f"{'resources':>10} {'seconds':>9} {'us/resource':>12}")
+    for size in sizes:
+        results = synthetic_results(size)
+        start = time.perf_counter()
+        build_graph(results)
+        elapsed = time.perf_counter() - start
+        print(f"{size:>10} {elapsed:>9.3f} {elapsed / size * 1e6:>12.1f}")
+
+
+# Peak RSS in MB of this process so far. Linux carries ru_maxrss over from the
+# parent across exec, so VmHWM is used where /proc has it. ru_maxrss is KB on
+# Linux, bytes on macOS.
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Runs in a child process so each variant's peak RSS is measured on its own:
+# 'baseline' only imports, 'dicts' loads resources as plain dicts (the old
+# shape), 'records' as compact records
+def load_variant(variant, path):
+    from inventory import load_ndjson
+    start = time.perf_counter()
+    results = None
+    if variant != 'baseline':
+        results = load_ndjson(path, records=(variant == 'records'))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({'variant': variant, 'peak_mb': peak_rss_mb(), 'seconds': elapsed,
+                      'regions': len(results['regions']) if results else 0}))
+
+
+# Writes a synthetic inventory to NDJSON once, then loads it in a fresh process
+# per variant. Loading from JSON gives every resource its own copy of each
+# string, as a real scan's API responses do.
+def bench_memory(size):
+    from inventory import InventoryWriter
+    results = synthetic_results(size)
+    fd, path = tempfile.mkstemp(suffix='.ndjson')
+    os.close(fd)
+    try:
+        with InventoryWriter(path) as writer:
+            for region, data in results['regions'].items():
+                writer.region(region)
+                for service, items in data.items():
+                    writer.write_service(region, service, items)
+            for service, items in results['global'].items():
+                writer.write_service(None, service, items)
+        del results
+        rows = []
+        for variant in ['baseline', 'dicts', 'records']:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), 'memory-load', variant, path],
+                                 check=True, capture_output=True, text=True).stdout
+            rows.append(json.loads(out.strip().splitlines()[-1]))
+    finally:
+        os.remove(path)
+    base = rows[0]['peak_mb']
+    print(f"{size:,} resources")
+    print(f"{'variant':>10} {'peak MB':>9} {'over base':>10} {'load s':>8}")
+    for row in rows:
+        print(f"{row['variant']:>10} {row['peak_mb']:>9.1f} {row['peak_mb'] - base:>10.1f} {row['seconds']:>8.2f}")
+    dicts, records = rows[1]['peak_mb'] - base, rows[2]['peak_mb'] - base
+    if records > 0:
+        print(f"records use {dicts / records:.2f}x less memory than dicts")
+
+
+# --- Scan / render suite ---
+
+SUITE_OUTPUT = "bench_results.json"
+SUITE_PHASES = ['scan', 'scan_cached', 'graph', 'render']
+# Relative increase over the baseline that counts as a regression
+REGRESSION_TOLERANCE = 0.2
+# Metrics compared against the baseline (all lower-is-better), and the absolute
+# change below which a difference is treated as noise
+SUITE_METRICS = ['wall_s', 'api_calls', 'peak_mb']
+REGRESSION_FLOOR = {'wall_s': 0.1, 'api_calls': 0, 'peak_mb': 5.0}
+
+
+# API-shaped items for every (region, service, operation) of a synthetic
+# account; region None holds the global services
+def api_items(results):
+    items = {}
+    for region, data in results['regions'].items():
+        items[(region, 'ec2', 'describe_instances')] = [
+            {'Instances': [{'InstanceId': i['InstanceId'], 'State': {'Name': i['State']},
+                            'InstanceType': i['InstanceType'], 'VpcId': i['VpcId'], 'SubnetId': i['SubnetId'],
+                            'Tags': [{'Key': 'Name', 'Value': i['Name']}]}]} for i in data['ec2']]
+        items[(region, 'ec2', 'describe_vpcs')] = [
+            {'VpcId': vpc_id, 'CidrBlock': v['CidrBlock'], 'IsDefault': v['IsDefault'], 'Tags': v['Tags']}
+            for vpc_id, v in data['vpcs'].items()]
+        items[(region, 'ec2', 'describe_subnets')] = [
+            dict(subnet, VpcId=vpc_id) for vpc_id, v in data['vpcs'].items() for subnet in v['Subnets']]
+        items[(region, 'rds', 'describe_db_instances')] = [
+            {'DBInstanceIdentifier': d['DBInstanceIdentifier'], 'Engine': d['Engine'],
+             'DBInstanceClass': d['DBInstanceClass'], 'DBSubnetGroup': {'VpcId': d['VpcId']},
+             'DBInstanceStatus': d['Status'], 'MultiAZ': d['MultiAZ']} for d in data['rds']]
+        items[(region, 'lambda', 'list_functions')] = data['lambda']
+        items[(region, 'elbv2', 'describe_load_balancers')] = data['elbv2']
+    items[(None, 's3', 'list_buckets')] = results['global']['s3']
+    iam = results['global']['iam']
+    account = "arn:aws:iam::123456789012"
+    users = [{'UserName': f"user-{i}", 'Arn': f"{account}:user/user-{i}"} for i in range(iam['UsersCount'])]
+    roles = [{'RoleName': f"role-{i}", 'Arn': f"{account}:role/role-{i}"} for i in range(iam['RolesCount'])]
+    policies = [{'Arn': f"{account}:policy/policy-{i}", 'DefaultVersionId': 'v1'}
+                for i in range(iam['ManagedPoliciesCount'])]
+    # Every role gets one policy, each granting a slice of the buckets
+    for i, role in enumerate(roles):
+        role['AttachedManagedPolicies'] = [{'PolicyArn': policies[i % len(policies)]['Arn']}] if policies else []
+    items[(None, 'iam', 'list_users')] = users
+    items[(None, 'iam', 'list_roles')] = roles
+    items[(None, 'iam', 'list_policies')] = policies
+    # Single-response calls answer with a whole dict
+    items[(None, 'iam', 'get_account_authorization_details')] = {'UserDetailList': users, 'RoleDetailList': roles}
+    # Policy documents are URL-encoded JSON on the wire; botocore decodes them
+    items[(None, 'iam', 'get_policy_version')] = {'PolicyVersion': {'Document': quote(json.dumps({'Statement': [
+        {'Effect': 'Allow', 'Action': 's3:GetObject', 'Resource': 'arn:aws:s3:::bucket-eu-west-1-*'}]}))}}
+    return items
+
+
+# Answers botocore calls from a synthetic account instead of AWS: a before-call
+# handler returns the response, so signing and HTTP are skipped while the
+# scanners, pagination, rate limiter and client pool run as usual.
+class StubAccount:
+    def __init__(self, results, latency=0.0):
+        from pagination import PAGINATION
+        self.items = api_items(results)
+        self.pagination = PAGINATION
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def attach(self, client):
+        from botocore import xform_name
+        region = client.meta.region_name
+        global_service = client.meta.service_model.service_name in ('s3', 'iam')
+        scope = None if global_service else region
+
+        def capture(params, context=None, **kwargs):
+            if context is not None:
+                context['bench_params'] = dict(params)
+
+        def respond(model, context=None, **kwargs):
+            return self.respond(scope, model.service_model.service_name, xform_name(model.name),
+                                (context or {}).get('bench_params', {}))
+
+        client.meta.events.register_first('before-parameter-build.*.*', capture, unique_id='bench-params')
+        client.meta.events.register_first('before-call.*.*', respond, unique_id='bench-respond')
+
+    def respond(self, scope, service, operation, params):
+        from botocore.awsrequest import AWSResponse
+        with self._lock:
+            self.calls[f"{service}.{operation}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = {}
+        config = self.pagination.get((service, operation))
+        items = self.items.get((scope, service, operation))
+        if service == 'sts':
+            parsed = {'Account': '123456789012'}
+        elif isinstance(items, dict):
+            # A copy: botocore's handlers edit the parsed response in place
+            parsed = json.loads(json.dumps(items))
+        elif config is not None:
+            token_in, token_out, size_param, max_size = config
+            start = int(params.get(token_in) or 0)
+            # Some APIs take no page size, and CloudFront's is a string
+            size = min(int(params.get(size_param) or max_size), int(max_size)) if size_param else len(items or [])
+            result_key = {'describe_instances': 'Reservations', 'describe_vpcs': 'Vpcs', 'describe_subnets': 'Subnets',
+                          'describe_db_instances': 'DBInstances', 'list_functions': 'Functions',
+                          'describe_load_balancers': 'LoadBalancers', 'list_buckets': 'Buckets',
+                          'list_users': 'Users', 'list_roles': 'Roles', 'list_policies': 'Policies',
+                          'list_clusters': 'clusters' if service == 'eks' else 'clusterArns'}.get(operation, 'Items')
+            page = (items or [])[start:start + size]
+            parsed = {result_key: page}
+            if items and start + size < len(items):
+                parsed[token_out] = str(start + size)
+        return AWSResponse(None, 200, {}, None), parsed
+
+
+def count_resources(results):
+    count = len(results['global']['s3'])
+    for data in results['regions'].values():
+        count += sum(len(items) for service, items in data.items() if service != 'vpcs')
+    return count
+
+
+def suite_phase(phase, size, workers, latency):
+    import awsclients
+    import createinfradiagram as cid
+    import diagramrender
+    import iamgraph
+    from inventorycache import InventoryCache
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    os.environ.setdefault('AWS_DEFAULT_REGION', REGIONS[0])
+    results = synthetic_results(size)
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    # Keep synthetic policy documents out of the real policy cache
+    iamgraph.POLICY_CACHE = os.path.join(workdir, 'cache', 'iam_policies.json')
+    stub = None
+    try:
+        if phase in ('scan', 'scan_cached'):
+            stub = StubAccount(results, latency)
+            awsclients.CLIENTS.add_hook(stub.attach)
+            del results
+            cache = InventoryCache('123456789012', os.path.join(workdir, 'cache')) if phase == 'scan_cached' else None
+            out = os.path.join(workdir, 'aws_resources.json')
+            if cache is not None:
+                cid.scan_account(REGIONS, workers=workers, cache=cache, out_json=out)
+                stub.calls.clear()
+        elif phase == 'render':
+            jobs = cid.render_jobs(results, 'region', cid.LOD_THRESHOLDS)
+        base_mb = peak_rss_mb()
+        start = time.perf_counter()
+        extra = {}
+        if phase in ('scan', 'scan_cached'):
+            scanned = cid.scan_account(REGIONS, workers=workers, cache=cache, out_json=out)
+            extra['resources'] = count_resources(scanned)
+        elif phase == 'graph':
+            cid.build_graph(results)
+        elif phase == 'render':
+            rendered = diagramrender.render_all(cid.build_graph, jobs, workdir, workers=workers)
+            extra['render_status'] = dict(Counter(r['status'] for r in rendered))
+        wall = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    calls = stub.calls if stub else Counter()
+    print(json.dumps(dict({'phase': phase, 'size': size, 'wall_s': round(wall, 4),
+                           'api_calls': sum(calls.values()), 'api_calls_by_operation': dict(calls),
+                           'peak_mb': round(peak_rss_mb(), 1), 'base_mb': round(base_mb, 1)}, **extra)))
+
+
+# Compare rows against a baseline file; returns regression messages
+def compare_baseline(rows, baseline, tolerance=REGRESSION_TOLERANCE):
+    previous = {(r['phase'], r['size']): r for r in baseline['results']}
+    regressions = []
+    print(f"{'phase':>12} {'size':>8} " + " ".join(f"{m:>18}" for m in SUITE_METRICS))
+    for row in rows:
+        old = previous.get((row['phase'], row['size']))
+        if old is None:
+            continue
+        cells = []
+        for metric in SUITE_METRICS:
+            before, after = old.get(metric, 0), row.get(metric, 0)
+            change = (after - before) / before if before else 0.0
+            regressed = change > tolerance and after - before > REGRESSION_FLOOR[metric]
+            cells.append(f"{before:>7g}->{after:<7g}{'!' if regressed else ' '}")
+            if regressed:
+                regressions.append(f"{row['phase']} @ {row['size']:,}: {metric} {before:g} -> {after:g} "
+                                   f"(+{change:.0%})")
+        print(f"{row['phase']:>12} {row['size']:>8} " + " ".join(f"{c:>18}" for c in cells))
+    return regressions
+
+
+def bench_suite(sizes, phases=SUITE_PHASES, output=SUITE_OUTPUT, baseline=None, workers=8, latency_ms=0.0,
+                tolerance=REGRESSION_TOLERANCE):
+    rows = []
+    print(f"{'phase':>12} {'size':>8} {'wall s':>9} {'API calls':>10} {'peak MB':>9}")
+    for size in sizes:
+        for phase in phases:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), 'suite-phase', phase, str(size),
+                                  '--workers', str(workers), '--latency', str(latency_ms)],
+                                 check=True, capture_output=True, text=True).stdout
+            row = json.loads(out.strip().splitlines()[-1])
+            rows.append(row)
+            print(f"{phase:>12} {size:>8} {row['wall_s']:>9.3f} {row['api_calls']:>10} {row['peak_mb']:>9.1f}")
+    report = {
+        'meta': {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                 'platform': platform.platform(), 'workers': workers, 'latency_ms': latency_ms,
+                 'regions': len(REGIONS), 'vpcs_per_region': VPCS_PER_REGION, 'subnets_per_vpc': SUBNETS_PER_VPC},
+        'results': rows,
+    }
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Results written to {output}")
+    if baseline:
+        with open(baseline) as fh:
+            regressions = compare_baseline(rows, json.load(fh), tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return not regressions
+    return True
+
+
+# cloudcli.py commands timed by the startup benchmark; none of them should need
+# the SDKs, so any HEAVY_MODULES import is a regression
+STARTUP_COMMANDS = [
+    ['--help'],
+    ['scan', '--help'],
+    ['diagram', '--help'],
+    ['cost', '--help'],
+    ['cost', '--provider', 'aws'],
+    ['github', 'delete', '--help'],
+]
+HEAVY_MODULES = ['boto3', 'botocore', 'graphviz', 'tqdm', 'numpy', 'requests']
+STARTUP_BUDGET_MS = 150
+
+
+# Top-level modules of one `python -X importtime` run -> cumulative microseconds,
+# plus every module it imported
+def import_times(argv, cwd=None):
+    stderr = subprocess.run([sys.executable, '-X', 'importtime'] + argv, cwd=cwd, stdin=subprocess.DEVNULL,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    top, modules = {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.add(name.strip())
+        if not name.startswith('  '):
+            top[name.strip()] = int(cumulative)
+    return top, modules
+
+
+def bench_startup(runs=5, budget_ms=STARTUP_BUDGET_MS):
+    cli = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cloudcli.py')
+    # Run from an empty directory so no cloudcli.json / aws_resources.json is picked up
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    ok = True
+    try:
+        interpreter, _ = import_times(['-c', 'pass'], workdir)
+        print(f"{'command':<28} {'import ms':>10} {'wall ms':>9}  heavy modules")
+        for command in STARTUP_COMMANDS:
+            imports, walls = [], []
+            for _ in range(runs):
+                start = time.perf_counter()
+                top, modules = import_times([cli] + command, workdir)
+                walls.append((time.perf_counter() - start) * 1000)
+                imports.append(sum(us for name, us in top.items() if name not in interpreter) / 1000)
+            heavy = [m for m in HEAVY_MODULES if m in modules]
+            import_ms = min(imports)
+            if heavy or import_ms > budget_ms:
+                ok = False
+            flag = '!' if import_ms > budget_ms else ' '
+            print(f"{' '.join(command):<28} {import_ms:>9.1f}{flag} {min(walls):>9.1f}  {', '.join(heavy) or '-'}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        print(f"Startup regression: a command imported a heavy module or spent over {budget_ms} ms importing")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the AWS exporter.")
+    sub = parser.add_subparsers(dest='bench', required=True)
+    graph = sub.add_parser('graph', help="Time build_graph on synthetic inventories (should scale linearly)")
+    graph.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    memory = sub.add_parser('memory', help="Peak RSS of an inventory held as dicts vs compact records")
+    memory.add_argument('--size', type=int, default=500000)
+    suite = sub.add_parser('suite', help="Time scan, cached scan, build_graph and rendering on stubbed accounts")
+    suite.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    suite.add_argument('--phases', nargs='+', choices=SUITE_PHASES, default=SUITE_PHASES)
+    suite.add_argument('--output', default=SUITE_OUTPUT, help=f"Results file (default: {SUITE_OUTPUT})")
+    suite.add_argument('--baseline', help="Earlier results file to compare against")
+    suite.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                       help="Relative increase counted as a regression (default: 0.2)")
+    suite.add_argument('--workers', type=int, default=8, help="Scan and render workers")
+    suite.add_argument('--latency', type=float, default=0.0, help="Simulated milliseconds per API call")
+    # Internal: one measurement per child process
+    phase = sub.add_parser('suite-phase')
+    phase.add_argument('phase', choices=SUITE_PHASES)
+    phase.add_argument('size', type=int)
+    phase.add_argument('--workers', type=int, default=8)
+    phase.add_argument('--latency', type=float, default=0.0)
+    startup = sub.add_parser('startup', help="Import time of cloudcli.py commands (python -X importtime)")
+    startup.add_argument('--runs', type=int, default=5, help="Runs per command; the fastest counts")
+    startup.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                         help=f"Import time allowed per command (default: {STARTUP_BUDGET_MS})")
+    load = sub.add_parser('memory-load')
+    load.add_argument('variant', choices=['baseline', 'dicts', 'records'])
+    load.add_argument('path')
+    args = parser.parse_args(argv)
+    if args.bench == 'graph':
+        bench_graph(args.sizes)
+    elif args.bench == 'memory':
+        bench_memory(args.size)
+    elif args.bench == 'memory-load':
+        load_variant(args.variant, args.path)
+    elif args.bench == 'suite':
+        if not bench_suite(args.sizes, args.phases, args.output, args.baseline, args.workers, args.latency,
+                           args.tolerance):
+            sys.exit(1)
+    elif args.bench == 'suite-phase':
+        suite_phase(args.phase, args.size, args.workers, args.latency / 1000)
+    elif args.bench == 'startup':
+        if not bench_startup(args.runs, args.budget_ms):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
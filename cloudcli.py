@@ -0,0 +1,152 @@
+"""
+cloudcli.py
+
+One command line for the scripts in this repository, usable from cron and CI:
+every command takes flags (or a config file) instead of prompting.
+
+Run:
+    python cloudcli.py scan [--regions eu-west-1] [--yes] [--no-diagram] [createinfradiagram.py flags]
+    python cloudcli.py diagram [aws_resources.json | .ndjson | .db] [--lod] [--split]
+    python cloudcli.py cost [--provider aws] [--inventory aws_resources.json] [--output findings.json]
+    python cloudcli.py org --organization [orgscan.py flags]
+    python cloudcli.py trail-sync SOURCE [cloudtrailsync.py flags]
+    python cloudcli.py store {import,query} ...
+    python cloudcli.py github {clone,create,collaborate,delete} ...
+    python cloudcli.py bench {graph,memory,suite,startup} ...
+    python cloudcli.py COMMAND --help
+
+Each command hands its arguments to the main() of the script that implements
+it, which is only imported when that command runs; boto3, graphviz, tqdm,
+numpy and requests are in turn imported by the code paths that use them. The
+GitHub tools are run the way `python autoclonerepo.py ARGS` would run them
+(runpy, with ARGS in sys.argv), also only when their command is given. So
+`cloudcli.py --help` loads nothing beyond the standard library, and
+`benchmark.py startup` keeps it that way.
+
+Config file (--config, default cloudcli.json when present): JSON with one
+section per command ("scan", "cost", "github delete", ...; "github" applies to
+every github command) mapping option names to values. Values become flags in
+front of the command-line arguments, so the command line wins:
+    {"scan": {"regions": ["eu-west-1", "us-east-1"], "yes": true, "ttl": [["ec2=600"], ["s3=3600"]]},
+     "github": {"username": "me"}}
+true adds a bare flag, false / null leave the option out, a list is passed after
+one flag (--regions a b) and a list of lists repeats the flag (--ttl ec2=600 --ttl s3=3600).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import runpy
+import sys
+
+CONFIG_FILE = "cloudcli.json"
+
+# command -> (module, arguments put before the user's, help)
+COMMANDS = {
+    'scan': ('createinfradiagram', [], "Scan the AWS account, save the inventory and draw the diagram"),
+    'diagram': ('createinfradiagram', ['--from-inventory'],
+                "Draw diagrams from a saved inventory without scanning (default: aws_resources.json)"),
+    'cost': ('costoptimisation', [], "Cost optimisation tips and findings over a scanned inventory"),
+    'org': ('orgscan', [], "Scan every account of an AWS organisation"),
+    'trail-sync': ('cloudtrailsync', [], "Update a saved inventory from CloudTrail logs"),
+    'store': ('inventorystore', [], "Import into / query the SQLite inventory store"),
+    'bench': ('benchmark', [], "Performance benchmarks, including CLI startup time"),
+}
+GITHUB_COMMANDS = {
+    'clone': ('autoclonerepo', [], "Clone every private repository"),
+    'create': ('autocreaterepo', [], "Create and push a repository per local folder"),
+    'collaborate': ('autocollaborate', [], "Reconcile repository collaborators with a desired mapping"),
+    'delete': ('autodeleterepo', [], "Delete repositories"),
+}
+
+
+# Flags for one config section (see module docstring)
+def config_args(section):
+    argv = []
+    for key, value in section.items():
+        flag = f"--{key.replace('_', '-')}"
+        if value is None or value is False:
+            continue
+        if value is True:
+            argv.append(flag)
+        elif isinstance(value, list) and value and all(isinstance(v, list) for v in value):
+            for values in value:
+                argv += [flag] + [str(v) for v in values]
+        elif isinstance(value, list):
+            argv += [flag] + [str(v) for v in value]
+        else:
+            argv += [flag, str(value)]
+    return argv
+
+
+def load_config(path):
+    if path is None:
+        if not os.path.exists(CONFIG_FILE):
+            return {}
+        path = CONFIG_FILE
+    with open(path) as fh:
+        return json.load(fh)
+
+
+# Run a script as __main__ with argv as its command line; returns its exit status
+def run_script(module, argv):
+    saved = sys.argv
+    sys.argv = [f"{module}.py"] + argv
+    try:
+        runpy.run_module(module, run_name='__main__', alter_sys=True)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) or e.code is None else 1
+    finally:
+        sys.argv = saved
+    return 0
+
+
+# Command list for --help: COMMANDS then the github tools
+def commands_help():
+    lines = ["commands:"]
+    lines += [f"  {name:<22}{help_text}" for name, (_, _, help_text) in COMMANDS.items()]
+    lines += [f"  github {name:<15}{help_text}" for name, (_, _, help_text) in GITHUB_COMMANDS.items()]
+    lines.append("")
+    lines.append("Run 'cloudcli.py COMMAND --help' for a command's options.")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="AWS inventory, diagrams, cost findings and GitHub bulk tools.",
+                                     epilog=commands_help(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', metavar='PATH',
+                        help=f"JSON file of per-command options (default: {CONFIG_FILE} if present)")
+    parser.add_argument('command', choices=list(COMMANDS) + ['github'], metavar='COMMAND',
+                        help="One of the commands below")
+    # Everything after the command is left, untouched and in order, for the
+    # command's own parser (so `diagram --lod PATH` or `scan --config x` reach it)
+    parser.add_argument('args', nargs=argparse.REMAINDER, metavar='ARGS',
+                        help="The command's own arguments")
+    args = parser.parse_args(argv)
+    args.github_command = None
+    if args.command == 'github':
+        if not args.args or args.args[0] not in GITHUB_COMMANDS:
+            parser.error(f"github needs a tool: {', '.join(GITHUB_COMMANDS)}")
+        args.github_command, args.args = args.args[0], args.args[1:]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+    if args.command == 'github':
+        module, fixed, _ = GITHUB_COMMANDS[args.github_command]
+        defaults = (config_args(config.get('github', {}))
+                    + config_args(config.get(f"github {args.github_command}", {})))
+        return run_script(module, defaults + fixed + args.args) or 0
+    module, fixed, _ = COMMANDS[args.command]
+    defaults = config_args(config.get(args.command, {}))
+    # The script's module is only imported now, for the command being run. Fixed
+    # arguments go right before the user's, so `diagram PATH` binds PATH to them.
+    status = importlib.import_module(module).main(defaults + fixed + args.args)
+    return status or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,515 @@
+"""
+cloudtrailsync.py
+
+Incremental inventory updates from CloudTrail logs.
+
+After a baseline scan (createinfradiagram.scan_account), this keeps
+aws_resources.json current by replaying CloudTrail events instead of rescanning
+the account. Create / delete events whose payload carries everything the
+inventory needs (RunInstances, TerminateInstances, CreateDBInstance,
+CreateFunction, CreateVpc, DeleteSubnet, ...) are applied directly. Anything
+ambiguous (modify / update events, or a create whose responseElements CloudTrail
+left out) queues a targeted rescan of just those resources, falling back to
+rescanning that one service in that region when the ids can't be resolved.
+
+Log files are read from a local directory or an s3://bucket/prefix export, as
+written by CloudTrail (gzipped JSON with a "Records" list). A watermark per log
+directory in cloudtrail_state.json makes reruns only read new files. CloudTrail
+can deliver a file after later ones, so files named up to OVERLAP behind the
+watermark are still read unless the state lists them as already applied. Rescans
+that couldn't run (--no-rescan, or a service rescan that came back partial) are
+kept in the same file as pending and run by the next sync, since the watermarks
+have already moved past the events that asked for them.
+
+Run:
+    python cloudtrailsync.py ./cloudtrail-logs
+    python cloudtrailsync.py s3://my-trail-bucket/AWSLogs/123456789012/CloudTrail/
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+
+import createinfradiagram as cid
+from awsclients import get_client
+from inventory import (new_region, json_default, to_records, Ec2Record, RdsRecord, LambdaRecord, Elbv2Record,
+                       VpcRecord, SubnetRecord, BucketRecord)
+from pagination import paginate, batched_describe, map_concurrently
+from ratelimit import call_api, error_code
+
+STATE_FILE = "cloudtrail_state.json"
+# Rescan every resource of the service in the region
+ALL = '*'
+# Files named up to this long before a directory's watermark are still read
+OVERLAP = timedelta(hours=1)
+# <account>_CloudTrail_<region>_<YYYYMMDDTHHMMZ>_<id>.json.gz
+FILE_TIME = re.compile(r'_(\d{8}T\d{4})Z_')
+
+
+# --- Reading log files ---
+
+def _load_records(raw):
+    if raw[:2] == b'\x1f\x8b':
+        raw = gzip.decompress(raw)
+    try:
+        return json.loads(raw).get('Records', [])
+    except ValueError:
+        return []
+
+
+def _is_log(name):
+    return name.endswith('.json.gz') or name.endswith('.json')
+
+
+def _file_time(key):
+    match = FILE_TIME.search(os.path.basename(key))
+    return match.group(1) if match else None
+
+
+# Earliest file time still read behind a watermark key ('' if it has none)
+def _window_start(watermark):
+    stamp = _file_time(watermark)
+    if stamp is None:
+        return ''
+    return (datetime.strptime(stamp, '%Y%m%dT%H%M') - OVERLAP).strftime('%Y%m%dT%H%M')
+
+
+# A file is new when it sorts after its directory's watermark, or was named
+# within OVERLAP of it and isn't among the recently applied ones
+def _is_new(key, watermarks, recent):
+    directory = os.path.dirname(key)
+    watermark = watermarks.get(directory, '')
+    if key > watermark:
+        return True
+    stamp, start = _file_time(key), _window_start(watermark)
+    return bool(stamp and start) and stamp >= start and key not in recent.get(directory, ())
+
+
+# Yield (key, records) for every new log file. CloudTrail file names embed a
+# UTC timestamp, so key order is (mostly) time order.
+def iter_log_files(source, watermarks, recent=None):
+    recent = recent or {}
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[5:].partition('/')
+        s3 = get_client('s3')
+        keys = [obj['Key'] for obj in paginate(s3, 'list_objects_v2', 'Contents', Bucket=bucket, Prefix=prefix)
+                if _is_log(obj['Key'])]
+        for key in sorted(keys):
+            if _is_new(key, watermarks, recent):
+                body = call_api(s3, 'get_object', Bucket=bucket, Key=key)['Body'].read()
+                yield key, _load_records(body)
+        return
+    paths = []
+    for root, _, files in os.walk(source):
+        paths.extend(os.path.relpath(os.path.join(root, f), source) for f in files if _is_log(f))
+    for key in sorted(paths):
+        if _is_new(key, watermarks, recent):
+            with open(os.path.join(source, key), 'rb') as fh:
+                yield key, _load_records(fh.read())
+
+
+# The applied files still inside each directory's overlap window
+def recent_files(watermarks, recent, read):
+    kept = {}
+    for directory in set(recent) | set(read):
+        start = _window_start(watermarks.get(directory, ''))
+        keys = [key for key in set(recent.get(directory, ())) | set(read.get(directory, ()))
+                if start and (_file_time(key) or '') >= start]
+        if keys:
+            kept[directory] = sorted(keys)
+    return kept
+
+
+# --- Inventory edits ---
+
+def _upsert(items, key, record):
+    for i, item in enumerate(items):
+        if item.get(key) == record.get(key):
+            items[i] = record
+            return
+    items.append(record)
+
+
+def _remove(items, key, values):
+    values = set(values)
+    items[:] = [item for item in items if item.get(key) not in values]
+
+
+def _items(container, name):
+    return (container or {}).get(name, {}).get('items', [])
+
+
+def _name_tag(tag_set):
+    return next((t.get('value', '') for t in (tag_set or {}).get('items', []) if t.get('key') == 'Name'), '')
+
+
+def _function_name(name):
+    # DeleteFunction accepts a name, a partial ARN or a full ARN
+    if name and ':function:' in name:
+        return name.split(':function:')[1].split(':')[0]
+    return name
+
+
+# Each handler gets (data, req, resp, event, rescan): data is the region's
+# inventory (results['global'] for S3), req / resp the event's requestParameters
+# / responseElements, and rescan(service, id_or_ALL) queues a targeted rescan.
+
+def on_run_instances(data, req, resp, event, rescan):
+    items = _items(resp, 'instancesSet')
+    if not items:
+        return rescan('ec2', ALL)
+    for inst in items:
+        _upsert(data['ec2'], 'InstanceId', Ec2Record(
+            InstanceId=inst.get('instanceId'), State=(inst.get('instanceState') or {}).get('name'),
+            InstanceType=inst.get('instanceType'), VpcId=inst.get('vpcId'),
+            SubnetId=inst.get('subnetId'), Name=_name_tag(inst.get('tagSet')),
+        ))
+
+
+def on_terminate_instances(data, req, resp, event, rescan):
+    _remove(data['ec2'], 'InstanceId', [i.get('instanceId') for i in _items(req, 'instancesSet')])
+
+
+def on_instance_state(data, req, resp, event, rescan):
+    known = {i['InstanceId']: i for i in data['ec2']}
+    for inst in _items(resp, 'instancesSet'):
+        iid = inst.get('instanceId')
+        if iid in known:
+            known[iid]['State'] = (inst.get('currentState') or {}).get('name')
+        else:
+            rescan('ec2', iid)
+
+
+def on_modify_instance(data, req, resp, event, rescan):
+    rescan('ec2', req.get('instanceId') or ALL)
+
+
+def on_create_vpc(data, req, resp, event, rescan):
+    vpc = resp.get('vpc')
+    if not vpc:
+        return rescan('vpcs', ALL)
+    data['vpcs'][vpc['vpcId']] = VpcRecord(
+        CidrBlock=vpc.get('cidrBlock'), IsDefault=vpc.get('isDefault', False),
+        Tags=[{'Key': t.get('key'), 'Value': t.get('value')} for t in _items(vpc, 'tagSet')],
+        Subnets=[],
+    )
+
+
+def on_delete_vpc(data, req, resp, event, rescan):
+    data['vpcs'].pop(req.get('vpcId'), None)
+
+
+def on_create_subnet(data, req, resp, event, rescan):
+    subnet = resp.get('subnet')
+    if not subnet or subnet.get('vpcId') not in data['vpcs']:
+        return rescan('vpcs', ALL)
+    _upsert(data['vpcs'][subnet['vpcId']]['Subnets'], 'SubnetId', SubnetRecord(
+        SubnetId=subnet.get('subnetId'), CidrBlock=subnet.get('cidrBlock'),
+        AvailabilityZone=subnet.get('availabilityZone'),
+    ))
+
+
+def on_delete_subnet(data, req, resp, event, rescan):
+    for vpc in data['vpcs'].values():
+        _remove(vpc['Subnets'], 'SubnetId', [req.get('subnetId')])
+
+
+def on_create_db_instance(data, req, resp, event, rescan):
+    if not resp.get('dBInstanceIdentifier'):
+        return rescan('rds', req.get('dBInstanceIdentifier') or ALL)
+    _upsert(data['rds'], 'DBInstanceIdentifier', RdsRecord(
+        DBInstanceIdentifier=resp.get('dBInstanceIdentifier'), Engine=resp.get('engine'),
+        DBInstanceClass=resp.get('dBInstanceClass'), VpcId=(resp.get('dBSubnetGroup') or {}).get('vpcId'),
+        Status=resp.get('dBInstanceStatus'), MultiAZ=resp.get('multiAZ'),
+    ))
+
+
+def on_delete_db_instance(data, req, resp, event, rescan):
+    _remove(data['rds'], 'DBInstanceIdentifier', [req.get('dBInstanceIdentifier')])
+
+
+def on_change_db_instance(data, req, resp, event, rescan):
+    rescan('rds', req.get('dBInstanceIdentifier') or req.get('targetDBInstanceIdentifier') or ALL)
+
+
+def on_create_function(data, req, resp, event, rescan):
+    if not resp.get('functionName'):
+        return rescan('lambda', req.get('functionName') or ALL)
+    vpc = resp.get('vpcConfig') or {}
+    _upsert(data['lambda'], 'FunctionName', LambdaRecord(
+        FunctionName=resp['functionName'], Runtime=resp.get('runtime'), VpcId=vpc.get('vpcId') or None,
+        SubnetIds=vpc.get('subnetIds') or None, SecurityGroupIds=vpc.get('securityGroupIds') or None,
+    ))
+
+
+def on_delete_function(data, req, resp, event, rescan):
+    _remove(data['lambda'], 'FunctionName', [_function_name(req.get('functionName'))])
+
+
+def on_update_function(data, req, resp, event, rescan):
+    rescan('lambda', _function_name(req.get('functionName')) or ALL)
+
+
+def on_eks_cluster(data, req, resp, event, rescan):
+    rescan('eks', req.get('name') or ALL)
+
+
+def on_delete_eks_cluster(data, req, resp, event, rescan):
+    _remove(data['eks'], 'Name', [req.get('name')])
+
+
+def on_create_ecs_cluster(data, req, resp, event, rescan):
+    cluster = resp.get('cluster')
+    if not cluster:
+        return rescan('ecs', ALL)
+    _upsert(data['ecs'], 'ClusterArn', cid.ecs_record(cluster))
+
+
+def on_delete_ecs_cluster(data, req, resp, event, rescan):
+    cluster = req.get('cluster')
+    data['ecs'][:] = [c for c in data['ecs'] if cluster not in (c.get('ClusterArn'), c.get('ClusterName'))]
+
+
+def on_create_load_balancer(data, req, resp, event, rescan):
+    lbs = resp.get('loadBalancers')
+    if lbs is None:
+        # Classic ELBs (loadBalancerName in the request) aren't inventoried; an
+        # ELBv2 create (name) without a payload needs a rescan
+        if 'name' in req:
+            rescan('elbv2', ALL)
+        return
+    for lb in lbs:
+        _upsert(data['elbv2'], 'LoadBalancerName', Elbv2Record(
+            LoadBalancerName=lb.get('loadBalancerName'), Type=lb.get('type'), Scheme=lb.get('scheme'),
+            VpcId=lb.get('vpcId'), DNSName=lb.get('dNSName'),
+        ))
+
+
+def on_delete_load_balancer(data, req, resp, event, rescan):
+    arn = req.get('loadBalancerArn')
+    if arn:
+        # arn:aws:elasticloadbalancing:<region>:<account>:loadbalancer/<app|net|gwy>/<name>/<id>
+        _remove(data['elbv2'], 'LoadBalancerName', [arn.split('/')[-2]])
+
+
+def on_create_bucket(data, req, resp, event, rescan):
+    created = datetime.fromisoformat(event['eventTime'].replace('Z', '+00:00'))
+    _upsert(data['s3'], 'Name', BucketRecord(Name=req.get('bucketName'), CreationDate=str(created)))
+
+
+def on_delete_bucket(data, req, resp, event, rescan):
+    _remove(data['s3'], 'Name', [req.get('bucketName')])
+
+
+# (event source prefix, event name without API version suffix) -> handler
+HANDLERS = {
+    ('ec2', 'RunInstances'): on_run_instances,
+    ('ec2', 'TerminateInstances'): on_terminate_instances,
+    ('ec2', 'StartInstances'): on_instance_state,
+    ('ec2', 'StopInstances'): on_instance_state,
+    ('ec2', 'ModifyInstanceAttribute'): on_modify_instance,
+    ('ec2', 'ModifyInstancePlacement'): on_modify_instance,
+    ('ec2', 'CreateVpc'): on_create_vpc,
+    ('ec2', 'DeleteVpc'): on_delete_vpc,
+    ('ec2', 'CreateSubnet'): on_create_subnet,
+    ('ec2', 'DeleteSubnet'): on_delete_subnet,
+    ('rds', 'CreateDBInstance'): on_create_db_instance,
+    ('rds', 'DeleteDBInstance'): on_delete_db_instance,
+    ('rds', 'ModifyDBInstance'): on_change_db_instance,
+    ('rds', 'RebootDBInstance'): on_change_db_instance,
+    ('rds', 'StartDBInstance'): on_change_db_instance,
+    ('rds', 'StopDBInstance'): on_change_db_instance,
+    ('rds', 'RestoreDBInstanceFromDBSnapshot'): on_change_db_instance,
+    ('rds', 'CreateDBInstanceReadReplica'): on_change_db_instance,
+    ('lambda', 'CreateFunction'): on_create_function,
+    ('lambda', 'DeleteFunction'): on_delete_function,
+    ('lambda', 'UpdateFunctionConfiguration'): on_update_function,
+    ('eks', 'CreateCluster'): on_eks_cluster,
+    ('eks', 'UpdateClusterVersion'): on_eks_cluster,
+    ('eks', 'UpdateClusterConfig'): on_eks_cluster,
+    ('eks', 'DeleteCluster'): on_delete_eks_cluster,
+    ('ecs', 'CreateCluster'): on_create_ecs_cluster,
+    ('ecs', 'DeleteCluster'): on_delete_ecs_cluster,
+    ('elasticloadbalancing', 'CreateLoadBalancer'): on_create_load_balancer,
+    ('elasticloadbalancing', 'DeleteLoadBalancer'): on_delete_load_balancer,
+    ('s3', 'CreateBucket'): on_create_bucket,
+    ('s3', 'DeleteBucket'): on_delete_bucket,
+}
+
+
+# Apply one event; returns True if it touched the inventory. Failed calls
+# (errorCode set) changed nothing and are ignored.
+def apply_event(results, event, rescans):
+    if event.get('errorCode'):
+        return False
+    # Lambda event names carry the API version, e.g. CreateFunction20150331
+    name = re.sub(r'\d{8}(v\d+)?$', '', event.get('eventName', ''))
+    source = event.get('eventSource', '').split('.')[0]
+    handler = HANDLERS.get((source, name))
+    if handler is None:
+        return False
+    if source == 's3':
+        region, data = None, results['global']
+    else:
+        region = event.get('awsRegion')
+        data = results['regions'].setdefault(region, new_region())
+
+    def rescan(service, resource_id):
+        rescans.setdefault((region, service), set()).add(resource_id)
+
+    handler(data, event.get('requestParameters') or {}, event.get('responseElements') or {}, event, rescan)
+    return True
+
+
+# --- Targeted rescans ---
+
+def _describe_or_none(fn):
+    from botocore.exceptions import ClientError
+
+    def wrapped(resource_id):
+        try:
+            return fn(resource_id)
+        except ClientError as e:
+            if 'NotFound' in (error_code(e) or ''):
+                return None
+            raise
+    return wrapped
+
+
+# Re-describe ids in one region; returns {id: record or None (gone)}
+def describe_ids(region, service, ids):
+    if service == 'ec2':
+        client = get_client('ec2', region)
+        found = {i: None for i in ids}
+        for res in batched_describe(client, 'describe_instances', 'InstanceIds', ids, 'Reservations'):
+            for inst in res.get('Instances', []):
+                found[inst['InstanceId']] = cid.ec2_record(inst)
+        return found
+    if service == 'rds':
+        client = get_client('rds', region)
+        fetch = _describe_or_none(lambda i: cid.rds_record(
+            call_api(client, 'describe_db_instances', DBInstanceIdentifier=i)['DBInstances'][0]))
+    elif service == 'lambda':
+        client = get_client('lambda', region)
+        fetch = _describe_or_none(lambda i: cid.lambda_record(
+            call_api(client, 'get_function_configuration', FunctionName=i)))
+    elif service == 'eks':
+        client = get_client('eks', region)
+        fetch = _describe_or_none(lambda i: cid.eks_record(
+            i, call_api(client, 'describe_cluster', name=i)['cluster']))
+    else:
+        raise ValueError(f"No targeted rescan for {service}")
+    return dict(zip(ids, map_concurrently(fetch, ids)))
+
+
+ID_KEYS = {'ec2': 'InstanceId', 'rds': 'DBInstanceIdentifier', 'lambda': 'FunctionName', 'eks': 'Name'}
+
+
+# Run the queued rescans; returns the ones still pending (the service rescan
+# came back partial)
+def run_rescans(results, rescans):
+    scanners = dict(cid.REGIONAL_SCANNERS + cid.GLOBAL_SCANNERS)
+    pending = {}
+    for (region, service), ids in sorted(rescans.items(), key=lambda kv: (kv[0][0] or '', kv[0][1])):
+        data = results['global'] if region is None else results['regions'][region]
+        if ALL not in ids and service in ID_KEYS:
+            ids = sorted(ids)
+            try:
+                found = describe_ids(region, service, ids)
+            except Exception as e:
+                logging.info(f"Targeted {service} rescan in {region} failed ({e}); rescanning the service")
+            else:
+                key = ID_KEYS[service]
+                _remove(data[service], key, [i for i, rec in found.items() if rec is None])
+                for rec in found.values():
+                    if rec is not None:
+                        _upsert(data[service], key, rec)
+                logging.info(f"Rescanned {len(ids)} {service} resource(s) in {region}")
+                continue
+        fresh, status = cid.run_scan_job(region, service, scanners[service])
+        data[service] = fresh
+        results.setdefault('status', {}).setdefault(region or 'global', {})[service] = status
+        logging.info(f"Rescanned all {service} in {region or 'global'} ({status})")
+        if status == 'partial':
+            pending[(region, service)] = {ALL}
+    return pending
+
+
+# --- Driver ---
+
+def load_state(path):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {'watermarks': {}}
+
+
+# Pending rescans <-> the state file's [[region, service, [ids]], ...]
+def encode_rescans(rescans):
+    return [[region, service, sorted(ids)] for (region, service), ids in
+            sorted(rescans.items(), key=lambda kv: (kv[0][0] or '', kv[0][1]))]
+
+
+def decode_rescans(entries):
+    return {(region, service): set(ids) for region, service, ids in entries or []}
+
+
+# Replay new CloudTrail files from source into results (in place), after the
+# rescans left pending by earlier syncs. recent is {directory: [keys]} of the
+# files already applied inside the overlap window. Returns the number of events
+# applied, the updated watermarks and recent files, and the rescans still pending.
+def sync(results, source, watermarks, rescan=True, pending=None, recent=None):
+    events = []
+    latest = {}
+    read = {}
+    count = 0
+    for key, records in iter_log_files(source, watermarks, recent):
+        events.extend(records)
+        directory = os.path.dirname(key)
+        latest[directory] = max(latest.get(directory, ''), key)
+        read.setdefault(directory, []).append(key)
+        count += 1
+    events.sort(key=lambda e: e.get('eventTime', ''))
+    rescans = {key: set(ids) for key, ids in (pending or {}).items()}
+    applied = sum(1 for event in events if apply_event(results, event, rescans))
+    logging.info(f"Applied {applied} of {len(events)} events from {count} new log files")
+    if rescan and rescans:
+        rescans = run_rescans(results, rescans)
+    if rescans:
+        logging.warning(f"{len(rescans)} (region, service) pairs still need a rescan; they are kept in the state "
+                        f"file for the next sync" + (" without --no-rescan" if not rescan else ""))
+    watermarks = {d: max(watermarks.get(d, ''), key) for d, key in dict(watermarks, **latest).items()}
+    return applied, watermarks, recent_files(watermarks, recent or {}, read), rescans
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update an AWS inventory from CloudTrail event logs.")
+    parser.add_argument('source', help="Directory of CloudTrail log files, or s3://bucket/prefix")
+    parser.add_argument('--inventory', default=cid.OUT_JSON, help=f"Inventory to update (default: {cid.OUT_JSON})")
+    parser.add_argument('--state', default=STATE_FILE, help=f"Watermark file (default: {STATE_FILE})")
+    parser.add_argument('--no-rescan', action='store_true',
+                        help="Only apply events; keep the rescans ambiguous ones need for the next sync")
+    args = parser.parse_args(argv)
+
+    with open(args.inventory) as fh:
+        results = to_records(json.load(fh))
+    state = load_state(args.state)
+    applied, watermarks, recent, pending = sync(results, args.source, state.get('watermarks', {}),
+                                                rescan=not args.no_rescan,
+                                                pending=decode_rescans(state.get('pending_rescans')),
+                                                recent=state.get('recent_files'))
+    with open(args.inventory, "w") as fh:
+        json.dump(results, fh, indent=2, default=json_default)
+    with open(args.state, "w") as fh:
+        json.dump({'watermarks': watermarks, 'recent_files': recent,
+                   'pending_rescans': encode_rescans(pending)}, fh, indent=2)
+    print(f"Applied {applied} events to {args.inventory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,35 @@
+"""
+costoptimisation.py
+
+Cost optimisation suggestions per cloud provider, and for AWS, concrete findings
+over the inventory createinfradiagram.py scanned.
+
+The tip dictionaries are the rule catalogue: each rule in RULES puts one AWS tip
+into practice and names the resources it applies to. The inventory is loaded
+into NumPy columns per service (one array per attribute, plus region), so every
+rule is evaluated over whole columns at once; hundreds of thousands of resources
+take seconds, most of it spent reading the file.
+
+Run:
+    python costoptimisation.py                                   interactive tips
+    python costoptimisation.py --provider aws                    tips without the menu (cron / CI)
+    (without --provider and with no terminal on stdin, the AWS tips are shown)
+    python costoptimisation.py --inventory aws_resources.json [--output findings.json] [--limit 20]
+    (the inventory may also be an NDJSON stream or a SQLite store from --db)
+"""
+
+import argparse
+import json
+import logging
+import os
 import sys
 
+# Per-resource findings list at most this many resources per rule on screen
+FINDINGS_LIMIT = 10
+
+# --provider values
+PROVIDERS = {'aws': "AWS", 'azure': "Azure", 'gcp': "GCP"}
+
 def get_cloud_provider():
     print("Select your cloud provider:")
     print("1. AWS")
@@ -24,7 +54,9 @@ def aws_cost_optimization():
             "Use AWS Cost Explorer to identify underutilized instances.",
             "Switch to Reserved Instances or Savings Plans for steady workloads.",
             "Use Spot Instances for non-critical workloads.",
-            "Enable auto-scaling to match demand."
+            "Enable auto-scaling to match demand.",
+            "Terminate or snapshot long-stopped instances; their EBS volumes and Elastic IPs are still billed.",
+            "Move previous-generation instance types to current ones for better price/performance."
         ],
         "S3": [
             "Move infrequently accessed data to S3 Glacier or IA tiers.",
@@ -33,13 +65,26 @@ def aws_cost_optimization():
         ],
         "RDS": [
             "Stop RDS instances during non-business hours.",
+            "Keep Multi-AZ for production; run dev/test databases single-AZ and stop them out of hours.",
             "Use RDS Reserved Instances for predictable workloads.",
-            "Enable storage auto-scaling and monitor idle connections."
+            "Enable storage auto-scaling and monitor idle connections.",
+            "Move previous-generation instance classes to current ones."
+        ],
+        "Lambda": [
+            "Upgrade functions on deprecated runtimes; current runtimes start faster and support arm64 (Graviton)."
         ],
         "EKS / ECS": [
             "Use Fargate Spot or EC2 Spot nodes.",
             "Right-size container resources.",
-            "Consolidate workloads using cluster autoscaler."
+            "Consolidate workloads using cluster autoscaler.",
+            "Upgrade EKS clusters before their Kubernetes version enters paid extended support.",
+            "Delete clusters with no container instances or services."
+        ],
+        "DynamoDB": [
+            "Use on-demand capacity for empty or spiky tables instead of provisioned capacity."
+        ],
+        "ElastiCache": [
+            "Move previous-generation cache node types to current ones."
         ]
     }
     return services
@@ -106,8 +151,252 @@ def display_suggestions(provider, services):
         print()
 
 
-if __name__ == "__main__":
-    provider = get_cloud_provider()
+# --- Inventory rule engine (AWS) ---
+
+# Attribute naming each resource in findings, per service
+RESOURCE_IDS = {
+    'ec2': 'InstanceId',
+    'rds': 'DBInstanceIdentifier',
+    'lambda': 'FunctionName',
+    'eks': 'Name',
+    'ecs': 'ClusterName',
+    'elbv2': 'LoadBalancerName',
+    'dynamodb': 'TableName',
+    'sqs': 'QueueUrl',
+    'sns': 'TopicArn',
+    'elasticache': 'CacheClusterId',
+    'apigateway': 'Name',
+    'cloudfront': 'Id',
+    's3': 'Name',
+}
+
+PREVIOUS_GENERATION_EC2 = ['t1', 't2', 'm1', 'm2', 'm3', 'm4', 'c1', 'c3', 'c4', 'r3', 'r4', 'i2', 'd2', 'g2', 'p2', 'x1']
+PREVIOUS_GENERATION_RDS = ['db.t2', 'db.m1', 'db.m2', 'db.m3', 'db.m4', 'db.r3', 'db.r4']
+PREVIOUS_GENERATION_CACHE = ['cache.t1', 'cache.t2', 'cache.m1', 'cache.m2', 'cache.m3', 'cache.m4',
+                             'cache.c1', 'cache.r3', 'cache.r4']
+DEPRECATED_RUNTIMES = ['python2.7', 'python3.6', 'python3.7', 'python3.8', 'nodejs', 'nodejs4.3', 'nodejs6.10',
+                       'nodejs8.10', 'nodejs10.x', 'nodejs12.x', 'nodejs14.x', 'nodejs16.x', 'java8', 'go1.x',
+                       'dotnetcore1.0', 'dotnetcore2.0', 'dotnetcore2.1', 'dotnetcore3.1', 'dotnet5.0',
+                       'dotnet6', 'ruby2.5', 'ruby2.7', 'provided']
+# Oldest Kubernetes minor version (1.x) still in EKS standard support, as of the
+# EKS version calendar on 2025-06-01; --eks-standard-support-minor overrides it
+# once AWS moves the window on
+EKS_STANDARD_SUPPORT_MINOR = 29
+
+
+# Column helpers. NumPy is only needed for inventory findings, so each function
+# that uses it imports it.
+def _family(column, sep='.'):
+    import numpy as np
+    return np.char.partition(column, sep)[:, 0]
+
+
+def _prefix(column):
+    # 'db.m4.large' -> 'db.m4'
+    import numpy as np
+    split = np.char.partition(column, '.')
+    rest = np.char.partition(split[:, 2], '.')[:, 0]
+    return np.char.add(np.char.add(split[:, 0], '.'), rest)
+
+
+def _minor_version(column):
+    import numpy as np
+    minor = np.char.partition(np.char.partition(column, '.')[:, 2], '.')[:, 0]
+    return np.where(np.char.isdigit(minor), minor, '-1').astype(int)
+
+
+def _isin(column, values):
+    import numpy as np
+    return np.isin(column, values)
+
+
+# Matches clusters on a Kubernetes 1.x version older than 1.<oldest_minor>
+def _past_standard_support(oldest_minor):
+    def match(t):
+        minor = _minor_version(t['Version'])
+        return (minor >= 0) & (minor < oldest_minor)
+    return match
+
+
+# Each rule: the catalogue tip it applies (section, tip text), the service whose
+# columns it reads, a vectorised match over those columns (a boolean array) and
+# what it says about each matching resource
+RULES = [
+    {'id': 'ec2-stopped', 'service': 'ec2', 'section': 'EC2',
+     'tip': "Terminate or snapshot long-stopped instances; their EBS volumes and Elastic IPs are still billed.",
+     'match': lambda t: t['State'] == 'stopped',
+     'finding': "stopped instance"},
+    {'id': 'ec2-previous-generation', 'service': 'ec2', 'section': 'EC2',
+     'tip': "Move previous-generation instance types to current ones for better price/performance.",
+     'match': lambda t: _isin(_family(t['InstanceType']), PREVIOUS_GENERATION_EC2),
+     'finding': "previous-generation instance type", 'detail': 'InstanceType'},
+    {'id': 'rds-single-az', 'service': 'rds', 'section': 'RDS',
+     'tip': "Keep Multi-AZ for production; run dev/test databases single-AZ and stop them out of hours.",
+     'match': lambda t: (t['MultiAZ'] == 0) & (t['Status'] == 'available'),
+     'finding': "single-AZ instance running around the clock; if non-production, stop it out of hours",
+     'detail': 'DBInstanceClass'},
+    {'id': 'rds-previous-generation', 'service': 'rds', 'section': 'RDS',
+     'tip': "Move previous-generation instance classes to current ones.",
+     'match': lambda t: _isin(_prefix(t['DBInstanceClass']), PREVIOUS_GENERATION_RDS),
+     'finding': "previous-generation instance class", 'detail': 'DBInstanceClass'},
+    {'id': 'lambda-deprecated-runtime', 'service': 'lambda', 'section': 'Lambda',
+     'tip': "Upgrade functions on deprecated runtimes; current runtimes start faster and support arm64 (Graviton).",
+     'match': lambda t: _isin(t['Runtime'], DEPRECATED_RUNTIMES),
+     'finding': "deprecated runtime", 'detail': 'Runtime'},
+    {'id': 'eks-extended-support', 'service': 'eks', 'section': 'EKS / ECS',
+     'tip': "Upgrade EKS clusters before their Kubernetes version enters paid extended support.",
+     'match': _past_standard_support(EKS_STANDARD_SUPPORT_MINOR),
+     'finding': "Kubernetes version past standard support", 'detail': 'Version'},
+    {'id': 'ecs-empty-cluster', 'service': 'ecs', 'section': 'EKS / ECS',
+     'tip': "Delete clusters with no container instances or services.",
+     'match': lambda t: t['RegisteredContainerInstancesCount'] == 0,
+     'finding': "no registered container instances (check for Fargate services before deleting)"},
+    {'id': 'dynamodb-empty-provisioned', 'service': 'dynamodb', 'section': 'DynamoDB',
+     'tip': "Use on-demand capacity for empty or spiky tables instead of provisioned capacity.",
+     'match': lambda t: (t['BillingMode'] == 'PROVISIONED') & (t['ItemCount'] == 0),
+     'finding': "empty table on provisioned capacity"},
+    {'id': 'elasticache-previous-generation', 'service': 'elasticache', 'section': 'ElastiCache',
+     'tip': "Move previous-generation cache node types to current ones.",
+     'match': lambda t: _isin(_prefix(t['CacheNodeType']), PREVIOUS_GENERATION_CACHE),
+     'finding': "previous-generation node type", 'detail': 'CacheNodeType'},
+]
+
+
+# RULES with the EKS standard-support cut-off at 1.<eks_minor>
+def configured_rules(eks_minor=EKS_STANDARD_SUPPORT_MINOR):
+    if eks_minor == EKS_STANDARD_SUPPORT_MINOR:
+        return RULES
+    return [dict(rule, match=_past_standard_support(eks_minor)) if rule['id'] == 'eks-extended-support' else rule
+            for rule in RULES]
+
+
+def _column(values):
+    import numpy as np
+    kinds = {type(v) for v in values if v is not None}
+    if kinds and kinds <= {bool, int, float}:
+        # Numbers and flags as float, so a missing value is NaN and matches nothing
+        return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+    if kinds <= {str}:
+        return np.array(['' if v is None else v for v in values], dtype=str)
+    return np.array(values, dtype=object)
+
+
+# {service: {attribute: array, 'region': array}} for every service that lists
+# resources; lists / dicts (Subnets, VpcConfig) become object columns
+def load_columns(results):
+    scopes = [(region, data) for region, data in results['regions'].items()]
+    scopes.append((None, results['global']))
+    rows = {}
+    for region, data in scopes:
+        for service, items in data.items():
+            if isinstance(items, list) and items:
+                rows.setdefault(service, []).append((region, items))
+    columns = {}
+    for service, chunks in rows.items():
+        keys = {}
+        for _, items in chunks:
+            for item in items[:1]:
+                keys.update(dict.fromkeys(item))
+        table = {'region': _column([region or 'global' for region, items in chunks for _ in items])}
+        for key in keys:
+            table[key] = _column([item.get(key) for _, items in chunks for item in items])
+        columns[service] = table
+    return columns
+
+
+# Run every rule over the columns. Returns [(rule, region array, id array,
+# detail array or None)] for the rules that matched something.
+def evaluate(columns, rules=RULES):
+    import numpy as np
+    findings = []
+    for rule in rules:
+        table = columns.get(rule['service'])
+        if table is None:
+            continue
+        try:
+            mask = rule['match'](table)
+        except KeyError as e:
+            logging.info(f"Rule {rule['id']} skipped: inventory has no {e} column")
+            continue
+        index = np.flatnonzero(mask)
+        if len(index):
+            detail = table[rule['detail']][index] if rule.get('detail') else None
+            findings.append((rule, table['region'][index], table[RESOURCE_IDS[rule['service']]][index], detail))
+    return findings
+
+
+def display_findings(findings, limit=FINDINGS_LIMIT):
+    total = sum(len(ids) for _, _, ids, _ in findings)
+    print(f"\n--- {total:,} findings from {len(findings)} rules ---\n")
+    for rule, regions, ids, detail in findings:
+        print(f"🔹 {rule['section']}: {rule['tip']}")
+        print(f"   {len(ids):,} × {rule['finding']} [{rule['id']}]")
+        for n in range(min(limit, len(ids))):
+            extra = f" ({detail[n]})" if detail is not None else ""
+            print(f"   - {regions[n]}  {ids[n]}{extra}")
+        if len(ids) > limit:
+            print(f"   … and {len(ids) - limit:,} more")
+        print()
+
+
+def write_findings(findings, path):
+    rows = []
+    for rule, regions, ids, detail in findings:
+        for n in range(len(ids)):
+            row = {'rule': rule['id'], 'service': rule['service'], 'region': str(regions[n]),
+                   'resource': str(ids[n]), 'finding': rule['finding'], 'tip': rule['tip']}
+            if detail is not None:
+                row['detail'] = str(detail[n])
+            rows.append(row)
+    with open(path, "w") as fh:
+        json.dump(rows, fh, indent=2)
+    return len(rows)
+
+
+def inventory_findings(path, rules=RULES):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        print("Inventory findings need NumPy: pip install numpy")
+        return None
+    from inventory import load_inventory
+    return evaluate(load_columns(load_inventory(path, records=False)), rules)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cloud cost optimisation suggestions and AWS inventory findings.")
+    parser.add_argument('--provider', choices=list(PROVIDERS), help="Show this provider's tips without asking")
+    parser.add_argument('--inventory', metavar='PATH',
+                        help="Report findings for a scanned inventory (.json, .ndjson or .db) instead of asking")
+    parser.add_argument('--output', metavar='PATH', help="Also write every finding to this JSON file")
+    parser.add_argument('--limit', type=int, default=FINDINGS_LIMIT,
+                        help=f"Resources listed per rule (default: {FINDINGS_LIMIT})")
+    parser.add_argument('--eks-standard-support-minor', type=int, default=EKS_STANDARD_SUPPORT_MINOR, metavar='N',
+                        help="Flag EKS clusters older than Kubernetes 1.N as in extended support "
+                             f"(default: {EKS_STANDARD_SUPPORT_MINOR})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    args = parse_args(argv)
+    if args.inventory:
+        findings = inventory_findings(args.inventory, configured_rules(args.eks_standard_support_minor))
+        if findings is None:
+            return 1
+        display_findings(findings, args.limit)
+        if args.output:
+            print(f"Wrote {write_findings(findings, args.output):,} findings to {args.output}")
+        return 0
+
+    if args.provider:
+        provider = PROVIDERS[args.provider]
+    elif sys.stdin.isatty():
+        provider = get_cloud_provider()
+    else:
+        # No one to answer the menu (cron / CI)
+        print("stdin is not a terminal; showing AWS tips (choose with --provider aws|azure|gcp)")
+        provider = "AWS"
     if provider == "AWS":
         services = aws_cost_optimization()
     elif provider == "Azure":
@@ -116,3 +405,13 @@ if __name__ == "__main__":
         services = gcp_cost_optimization()
 
     display_suggestions(provider, services)
+    # Concrete findings too, when a scan has been saved here
+    if provider == "AWS" and os.path.exists("aws_resources.json"):
+        findings = inventory_findings("aws_resources.json", configured_rules(args.eks_standard_support_minor))
+        if findings is not None:
+            display_findings(findings, args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
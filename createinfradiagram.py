@@ -2,277 +2,568 @@
 aws_architecture_exporter.py
 
 What it does:
-- Scans your AWS account (multiple regions) for common resources (EC2, RDS, EKS, ECS, Lambda, S3, ELB, VPCs, IAM)
+- Scans your AWS account (multiple regions) for common resources (EC2, RDS, EKS, ECS, Lambda, S3, ELB, VPCs, IAM,
+  DynamoDB, SQS, SNS, ElastiCache, API Gateway, CloudFront); see scannerregistry.py for adding more
 - Constructs a Graphviz diagram (grouped by Region -> VPC -> Subnet where possible)
 - Renders to aws_architecture.pdf and saves resource metadata to aws_resources.json
+  (or streams it to aws_resources.ndjson with --stream, or a SQLite store with --db)
 
 Run:
-    AWS_PROFILE=yourprofile python aws_architecture_exporter.py
-or ensure AWS credentials are available in env or IAM role.
+    AWS_PROFILE=yourprofile python aws_architecture_exporter.py [--regions us-east-1 eu-west-1] [--workers 8]
+or ensure AWS credentials are available in env or IAM role. --yes skips the
+confirmation prompt (as does running without a terminal, e.g. from cron);
+--from-inventory redraws a saved inventory without scanning. cloudcli.py wraps
+this as its scan and diagram commands.
+
+graphviz and tqdm are imported by the functions that draw and scan, boto3 by
+the first client (see awsclients.py) and botocore's exceptions by the functions
+that catch them, so --help and redraws start quickly.
+
+Results are cached per (account, region, service) in .inventory_cache/ with
+per-service TTLs; use --refresh-region / --refresh-service to force a rescan of
+part of the account, or --no-cache to scan everything.
 """
 
-import boto3
 import json
 import os
 import sys
 import logging
-from graphviz import Digraph
-from tqdm import tqdm
-from botocore.exceptions import ClientError, NoCredentialsError, EndpointConnectionError
+import argparse
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import awsclients
+import diagramrender
+import scantrace
+from awsclients import get_client
+from ratelimit import LIMITERS, call_api
+from pagination import pages, paginate
+from inventory import (Inventory, InventoryWriter, load_ndjson, load_inventory, new_region, new_global, json_default, make_records,
+                       mark_partial, VpcRecord, SubnetRecord, BucketRecord)
+from scannerregistry import REGISTRY, scanners, probe_types, diagram_services
+from iamgraph import scan_iam_graph, AccessIndex
+from inventorystore import InventoryStore, STORE_DB
+from inventorycache import InventoryCache, CACHE_DIR, parse_ttls
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
-# Services to scan per region
-REGIONAL_SERVICES = ['ec2', 'rds', 'lambda', 'eks', 'ecs', 'elbv2']  # elbv2 covers ALB/NLB
-GLOBAL_SERVICES = ['s3', 'iam']
+# Services to scan per region (elbv2 covers ALB/NLB) and account-wide
+REGIONAL_SERVICES = ['vpcs'] + [service for service, _ in scanners('regional')]
+GLOBAL_SERVICES = ['s3', 'iam'] + [service for service, _ in scanners('global')]
 
 # Output files
 OUT_JSON = "aws_resources.json"
+OUT_NDJSON = "aws_resources.ndjson"
 OUT_PDF = "aws_architecture.pdf"
 DOT_BASENAME = "aws_architecture"
 
-# Utility: get all commercial regions for ec2 (We'll query ec2.describe_regions)
-def get_all_regions():
+# Max concurrent (region, service) scan jobs; 1 keeps the old serial behaviour
+SCAN_WORKERS = 8
+
+# Utility: get all commercial regions for ec2 (We'll query ec2.describe_regions).
+# With a cache, the list is reused until its '_regions' entry expires.
+def get_all_regions(cache=None):
+    if cache is not None:
+        regions = cache.get(None, '_regions')
+        if regions:
+            logging.info(f"Using {len(regions)} cached regions")
+            return regions
+    from botocore.exceptions import ClientError, NoCredentialsError
     try:
-        ec2 = boto3.client("ec2")
-        resp = ec2.describe_regions(AllRegions=False)
+        resp = call_api(get_client("ec2"), 'describe_regions', AllRegions=False)
         regions = [r['RegionName'] for r in resp['Regions']]
         logging.info(f"Found {len(regions)} regions: {regions}")
+        if cache is not None:
+            cache.put(None, '_regions', regions)
         return regions
     except (NoCredentialsError, ClientError) as e:
         logging.error("Unable to list regions. Check AWS credentials and permissions.")
         raise
 
-# Scanners for each service (best-effort; stable APIs)
-def scan_ec2(region, results):
-    ec2 = boto3.client("ec2", region_name=region)
-    try:
-        instances = ec2.describe_instances()
-    except Exception as e:
-        logging.warning(f"EC2 describe_instances failed in {region}: {e}")
-        return
-    for res in instances.get('Reservations', []):
-        for inst in res.get('Instances', []):
-            iid = inst.get('InstanceId')
-            vpc = inst.get('VpcId')
-            subnet = inst.get('SubnetId')
-            state = inst.get('State', {}).get('Name')
-            instance_type = inst.get('InstanceType')
-            name = next((t['Value'] for t in inst.get('Tags', []) if t.get('Key') == 'Name'), '')
-            results['regions'][region]['ec2'].append({
-                'InstanceId': iid, 'State': state, 'InstanceType': instance_type,
-                'VpcId': vpc, 'SubnetId': subnet, 'Name': name
-            })
-
-def scan_rds(region, results):
-    rds = boto3.client("rds", region_name=region)
-    try:
-        dbs = rds.describe_db_instances()
-    except Exception as e:
-        logging.warning(f"RDS describe_db_instances failed in {region}: {e}")
-        return
-    for db in dbs.get('DBInstances', []):
-        results['regions'][region]['rds'].append({
-            'DBInstanceIdentifier': db.get('DBInstanceIdentifier'),
-            'Engine': db.get('Engine'),
-            'DBInstanceClass': db.get('DBInstanceClass'),
-            'VpcId': db.get('DBSubnetGroup', {}).get('VpcId'),
-            'Status': db.get('DBInstanceStatus'),
-            'MultiAZ': db.get('MultiAZ')
-        })
+# Account the current credentials belong to (cache key)
+def get_account_id():
+    return call_api(get_client("sts"), 'get_caller_identity')['Account']
 
-def scan_s3(results):
-    s3 = boto3.client("s3")
-    try:
-        buckets = s3.list_buckets()
-    except Exception as e:
-        logging.warning(f"S3 list_buckets failed: {e}")
-        return
-    for b in buckets.get('Buckets', []):
-        results['global']['s3'].append({'Name': b['Name'], 'CreationDate': str(b['CreationDate'])})
+# Record builders: turn an API response item into the inventory shape, with the
+# registry's projections. Shared by targeted rescans (cloudtrailsync.py).
+def ec2_record(inst):
+    return REGISTRY['ec2'].project(inst)
 
-def scan_lambda(region, results):
-    client = boto3.client('lambda', region_name=region)
-    try:
-        paginator = client.get_paginator('list_functions')
-        for page in paginator.paginate():
-            for f in page.get('Functions', []):
-                results['regions'][region]['lambda'].append({
-                    'FunctionName': f.get('FunctionName'),
-                    'Runtime': f.get('Runtime'),
-                    'VpcConfig': f.get('VpcConfig', {}),
-                })
-    except Exception as e:
-        logging.warning(f"Lambda list_functions failed in {region}: {e}")
+def rds_record(db):
+    return REGISTRY['rds'].project(db)
 
-def scan_eks(region, results):
-    client = boto3.client('eks', region_name=region)
-    try:
-        clusters = client.list_clusters().get('clusters', [])
-        for c in clusters:
-            info = client.describe_cluster(name=c).get('cluster', {})
-            results['regions'][region]['eks'].append({
-                'Name': c,
-                'Version': info.get('version'),
-                'VpcId': info.get('resourcesVpcConfig', {}).get('vpcId'),
-                'Subnets': info.get('resourcesVpcConfig', {}).get('subnetIds', []),
-            })
-    except Exception as e:
-        logging.debug(f"EKS list/describe failed in {region}: {e}")
+def lambda_record(f):
+    return REGISTRY['lambda'].project(f)
 
-def scan_ecs(region, results):
-    client = boto3.client('ecs', region_name=region)
-    try:
-        clusters = client.list_clusters().get('clusterArns', [])
-        for arn in clusters:
-            summary = client.describe_clusters(clusters=[arn]).get('clusters', [])[0]
-            results['regions'][region]['ecs'].append({
-                'ClusterArn': arn,
-                'ClusterName': summary.get('clusterName'),
-                'Status': summary.get('status'),
-                'RegisteredContainerInstancesCount': summary.get('registeredContainerInstancesCount')
-            })
-    except Exception as e:
-        logging.debug(f"ECS list/describe failed in {region}: {e}")
+def eks_record(name, info):
+    return REGISTRY['eks'].project(dict(info, Listed=name))
 
-def scan_elbv2(region, results):
-    client = boto3.client('elbv2', region_name=region)
+def ecs_record(summary):
+    return REGISTRY['ecs'].project(summary)
+
+def elbv2_record(lb):
+    return REGISTRY['elbv2'].project(lb)
+
+# Hand-written scanners for the services the registry can't describe: S3 and
+# IAM (global summaries) and VPCs (subnets nest under their VPC)
+def scan_s3(results):
+    s3 = get_client("s3")
     try:
-        lbs = client.describe_load_balancers().get('LoadBalancers', [])
-        for lb in lbs:
-            results['regions'][region]['elbv2'].append({
-                'LoadBalancerName': lb.get('LoadBalancerName'),
-                'Type': lb.get('Type'),
-                'Scheme': lb.get('Scheme'),
-                'VpcId': lb.get('VpcId'),
-                'DNSName': lb.get('DNSName')
-            })
+        for b in paginate(s3, 'list_buckets', 'Buckets'):
+            results['global']['s3'].append(BucketRecord(Name=b['Name'], CreationDate=str(b['CreationDate'])))
     except Exception as e:
-        logging.debug(f"ELBv2 describe failed in {region}: {e}")
+        logging.warning(f"S3 list_buckets failed: {e}")
+        mark_partial(results, None, 's3')
 
 def scan_vpcs(region, results):
-    client = boto3.client('ec2', region_name=region)
+    client = get_client('ec2', region)
     try:
-        vpcs = client.describe_vpcs().get('Vpcs', [])
-        subnets = client.describe_subnets().get('Subnets', [])
+        vpcs = list(paginate(client, 'describe_vpcs', 'Vpcs'))
+        subnets = list(paginate(client, 'describe_subnets', 'Subnets'))
     except Exception as e:
         logging.debug(f"VPC/Subnet describe failed in {region}: {e}")
+        mark_partial(results, region, 'vpcs')
         return
     for v in vpcs:
         vid = v.get('VpcId')
-        results['regions'][region]['vpcs'][vid] = {
-            'CidrBlock': v.get('CidrBlock'),
-            'IsDefault': v.get('IsDefault'),
-            'Tags': v.get('Tags', []),
-            'Subnets': []
-        }
+        results['regions'][region]['vpcs'][vid] = VpcRecord(
+            CidrBlock=v.get('CidrBlock'),
+            IsDefault=v.get('IsDefault'),
+            Tags=v.get('Tags', []),
+            Subnets=[]
+        )
     for s in subnets:
         sid = s.get('SubnetId')
         vid = s.get('VpcId')
         if vid in results['regions'][region]['vpcs']:
-            results['regions'][region]['vpcs'][vid]['Subnets'].append({
-                'SubnetId': sid, 'CidrBlock': s.get('CidrBlock'), 'AvailabilityZone': s.get('AvailabilityZone')
-            })
+            results['regions'][region]['vpcs'][vid]['Subnets'].append(SubnetRecord(
+                SubnetId=sid, CidrBlock=s.get('CidrBlock'), AvailabilityZone=s.get('AvailabilityZone')
+            ))
 
 def scan_iam(results):
-    client = boto3.client('iam')
+    client = get_client('iam')
     try:
-        users = client.list_users().get('Users', [])
-        roles = client.list_roles().get('Roles', [])
-        policies = client.list_policies(Scope='Local').get('Policies', [])
-        results['global']['iam'] = {
-            'UsersCount': len(users),
-            'RolesCount': len(roles),
-            'ManagedPoliciesCount': len(policies)
-        }
+        results['global']['iam'] = scan_iam_graph(client)
     except Exception as e:
-        logging.debug(f"IAM list failed: {e}")
+        logging.warning(f"IAM scan failed: {e}")
+        mark_partial(results, None, 'iam')
 
-# Main scanner orchestration
-def scan_account(regions=None):
-    results = {'regions': {}, 'global': {'s3': [], 'iam': {}}}
-    if not regions:
-        regions = get_all_regions()
+# Scanners in the order the serial path runs them; keys match the result containers
+REGIONAL_SCANNERS = [
+    ('vpcs', scan_vpcs),  # VPCs first to allow mapping
+] + scanners('regional')
+GLOBAL_SCANNERS = [
+    ('s3', scan_s3),
+    ('iam', scan_iam),
+] + scanners('global')
+
+def new_results(regions):
+    # status[region or 'global'][service] is 'complete', 'partial' (a call failed
+    # even after retries, so the data may be missing resources) or 'skipped' (the
+    # occupancy probe found nothing to scan)
+    results = {'regions': {}, 'global': new_global(), 'status': {}}
     # Initialize region containers
     for r in regions:
-        results['regions'][r] = {
-            'ec2': [], 'rds': [], 'lambda': [], 'eks': [], 'ecs': [], 'elbv2': [],
-            'vpcs': {}
-        }
-
-    for r in tqdm(regions, desc="Scanning regions"):
-        try:
-            # VPCs first to allow mapping
-            scan_vpcs(r, results)
-            scan_ec2(r, results)
-            scan_rds(r, results)
-            scan_lambda(r, results)
-            scan_eks(r, results)
-            scan_ecs(r, results)
-            scan_elbv2(r, results)
-        except EndpointConnectionError:
-            logging.warning(f"Region {r} not accessible in this account/region.")
-        except Exception as exc:
-            logging.debug(f"Unhandled scanning error in {r}: {exc}")
-
-    # Global scans
-    scan_s3(results)
-    scan_iam(results)
+        results['regions'][r] = new_region()
+        results['status'][r] = {service: 'complete' for service, _ in REGIONAL_SCANNERS}
+    results['status']['global'] = {service: 'complete' for service, _ in GLOBAL_SCANNERS}
+    return results
+
+# Run a single (region, service) job. The scanner writes into a private results
+# container, so concurrent jobs never share mutable state; the caller merges the
+# returned (data, status). region=None runs a global scanner.
+def run_scan_job(region, service, scanner):
+    from botocore.exceptions import EndpointConnectionError
+    scratch = new_results([region] if region else [])
+    try:
+        with scantrace.job_span(region or 'global', service):
+            if region:
+                scanner(region, scratch)
+            else:
+                scanner(scratch)
+    except EndpointConnectionError:
+        logging.warning(f"Region {region} not accessible in this account/region.")
+        mark_partial(scratch, region, service)
+    except Exception as exc:
+        logging.debug(f"Unhandled scanning error in {region or 'global'} ({service}): {exc}")
+        mark_partial(scratch, region, service)
+    status = scratch['status'][region or 'global'][service]
+    if region:
+        return scratch['regions'][region][service], status
+    return scratch['global'][service], status
+
+def scan_jobs(regions):
+    jobs = [(r, name, fn) for r in regions for name, fn in REGIONAL_SCANNERS]
+    jobs += [(None, name, fn) for name, fn in GLOBAL_SCANNERS]
+    return jobs
+
+# Tagging API resource types the occupancy probe looks for, and the scanner each
+# one stands for ('sqs' alone matches any SQS resource)
+PROBE_TYPES = probe_types()
+# Pages read per region before the probe gives up and assumes every type is present
+PROBE_MAX_PAGES = 3
+
+# Which regional scanners have anything to find in region, from one paginated
+# Resource Groups Tagging API call. Returns None (scan everything) when the probe
+# can't tell. The Tagging API only sees resources that carry, or once carried, a
+# tag, so this is an opt-in fast path for accounts that tag their resources.
+def probe_region(region):
+    client = get_client('resourcegroupstaggingapi', region)
+    found = set()
+    try:
+        for n, page in enumerate(pages(client, 'get_resources', ResourceTypeFilters=list(PROBE_TYPES))):
+            for item in page.get('ResourceTagMappingList', []):
+                # arn:aws:<service>:<region>:<account>:<type>[/:]<id>
+                # (API Gateway's <type> starts with a slash: ...::/restapis/<id>)
+                parts = item['ResourceARN'].split(':', 5)
+                rtype = re.split('[:/]', parts[5].lstrip('/'))[0] if len(parts) == 6 else ''
+                service = PROBE_TYPES.get(f"{parts[2]}:{rtype}") or PROBE_TYPES.get(parts[2])
+                if service:
+                    found.add(service)
+            if len(found) == len(set(PROBE_TYPES.values())):
+                break
+            if n + 1 >= PROBE_MAX_PAGES and page.get('PaginationToken'):
+                return None
+    except Exception as e:
+        logging.debug(f"Occupancy probe failed in {region}: {e}")
+        return None
+    # VPCs are only worth drawing where something lives in them
+    if found:
+        found.add('vpcs')
+    return sorted(found)
+
+# Probe regions concurrently; cached occupancy is reused unless the region is
+# being force-refreshed. Returns {region: [services] or None}.
+def probe_regions(regions, cache=None, workers=SCAN_WORKERS, refresh_regions=()):
+    occupancy = {}
+    pending = []
+    for r in regions:
+        cached = None if cache is None or r in refresh_regions else cache.get(r, '_occupancy')
+        if cached is None:
+            pending.append(r)
+        else:
+            occupancy[r] = cached
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for r, services in zip(pending, pool.map(probe_region, pending)):
+            occupancy[r] = services
+            if cache is not None and services is not None:
+                cache.put(r, '_occupancy', services)
+    empty = [r for r in regions if occupancy[r] == []]
+    logging.info(f"Probe: {len(empty)} of {len(regions)} regions look empty")
+    return occupancy
+
+# Main scanner orchestration. With stream=path, each job's resources are appended
+# to an NDJSON file as soon as the job finishes and are not kept in memory; the
+# returned results then only hold empty region containers (use load_ndjson).
+# With a cache, only jobs whose entry is stale (or whose region / service is in
+# refresh_regions / refresh_services; 'global' names S3 and IAM) are scanned.
+# With probe=True, regional scanners only run where the Tagging API probe found
+# resources of their type; the others are recorded as 'skipped'.
+# With db, results go to that SQLite store (see inventorystore) instead.
+def scan_account(regions=None, workers=SCAN_WORKERS, stream=None, cache=None,
+                 refresh_regions=(), refresh_services=(), probe=False, db=None, out_json=OUT_JSON):
+    if not regions:
+        regions = get_all_regions(cache)
+    results = new_results(regions)
+    occupancy = probe_regions(regions, cache, workers, refresh_regions) if probe else {}
+    jobs = []
+    cached = []
+    skipped = []
+    for region, service, scanner in scan_jobs(regions):
+        present = occupancy.get(region)
+        if region and present is not None and service not in present:
+            skipped.append((region, service))
+            continue
+        forced = (region or 'global') in refresh_regions or service in refresh_services
+        data = None if cache is None or forced else cache.get(region, service)
+        if data is None:
+            jobs.append((region, service, scanner))
+        else:
+            cached.append((region, service, make_records(service, data)))
+    if cache is not None:
+        logging.info(f"Cache: {len(cached)} fresh entries, {len(jobs)} jobs to scan")
+    if skipped:
+        logging.info(f"Skipping {len(skipped)} jobs with nothing to find")
+    writer = None
+    if db:
+        writer = InventoryStore(db)
+    elif stream:
+        writer = InventoryWriter(stream)
+    if writer:
+        for r in regions:
+            writer.region(r)
+
+    # Merging happens on this thread only; each job owns exactly one slot, and
+    # the slots were created up front, so the output matches the serial path.
+    def store(region, service, data, status='complete'):
+        results['status'][region or 'global'][service] = status
+        if writer:
+            writer.write_service(region, service, data, status)
+        elif region:
+            results['regions'][region][service] = data
+        else:
+            results['global'][service] = data
+
+    # Partial results are not cached, so the next run scans them again
+    def scanned(region, service, outcome):
+        data, status = outcome
+        if cache is not None and status == 'complete':
+            cache.put(region, service, data)
+        store(region, service, data, status)
+
+    try:
+        for region, service, data in cached:
+            store(region, service, data)
+        for region, service in skipped:
+            store(region, service, new_region()[service], 'skipped')
+        from tqdm import tqdm
+        if workers <= 1:
+            for region, service, scanner in tqdm(jobs, desc="Scanning"):
+                scanned(region, service, run_scan_job(region, service, scanner))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(run_scan_job, region, service, scanner): (region, service)
+                           for region, service, scanner in jobs}
+                for fut in tqdm(as_completed(futures), total=len(futures), desc="Scanning"):
+                    region, service = futures[fut]
+                    scanned(region, service, fut.result())
+    finally:
+        if writer:
+            writer.close()
+
+    partial = [f"{scope}/{service}" for scope, services in results['status'].items()
+               for service, status in services.items() if status == 'partial']
+    if partial:
+        logging.warning(f"Incomplete results (API errors after retries) for: {', '.join(partial)}")
+    throttled = {key: st for key, st in LIMITERS.stats().items() if st['throttles']}
+    for key, st in throttled.items():
+        logging.info(f"Throttled {st['throttles']}x on {key}; settled at {st['rate']} rps, concurrency {st['concurrency']}")
+
+    if writer:
+        logging.info(f"Streamed {writer.count} resource records to {writer.path}")
+        return results
 
     # Save JSON
-    with open(OUT_JSON, "w") as fh:
-        json.dump(results, fh, indent=2, default=str)
-    logging.info(f"Saved resource metadata to {OUT_JSON}")
+    with open(out_json, "w") as fh:
+        json.dump(results, fh, indent=2, default=json_default)
+    logging.info(f"Saved resource metadata to {out_json}")
+    stats = awsclients.CLIENTS.stats()
+    logging.info(f"boto3 clients: {stats['creations']} created, {stats['hits']} reused")
     return results
 
-# Build Graphviz diagram (best-effort relationships)
-def build_graph(results):
-    dot = Digraph(name="AWS_Architecture", format="pdf")
+# Level of detail: once a group (per VPC, subnet or region) has more members than
+# its threshold, it is drawn as one summary node instead of a node per resource
+LOD_THRESHOLDS = {
+    'vpcs': 100,
+    'subnets': 50,
+    'ec2': 50,
+    'rds': 25,
+    'lambda': 100,
+    'eks': 25,
+    'ecs': 25,
+    'elbv2': 25,
+    's3': 100,
+    'dynamodb': 50,
+    'sqs': 50,
+    'sns': 50,
+    'elasticache': 25,
+    'apigateway': 50,
+    'cloudfront': 50,
+    # Principals with access to one resource before they are drawn as one edge
+    # from the IAM node
+    'iam': 10,
+}
+# Values listed in a summary label before it is cut off with "…"
+LOD_TOP_VALUES = 3
+# The split-render overview collapses every group
+OVERVIEW_LOD = {service: 0 for service in LOD_THRESHOLDS}
+
+def collapsed(lod, service, items):
+    return lod is not None and len(items) > lod.get(service, float('inf'))
+
+# e.g. "EC2 ×412 (m5.large ×300, t3.micro ×80, …)"
+def summary_label(title, items, key=None):
+    label = f"{title} ×{len(items):,}"
+    if key:
+        counts = {}
+        for item in items:
+            value = key(item) if callable(key) else item.get(key)
+            counts[value] = counts.get(value, 0) + 1
+        top = sorted(counts.items(), key=lambda kv: (-kv[1], str(kv[0])))
+        parts = [f"{value} ×{count:,}" for value, count in top[:LOD_TOP_VALUES]]
+        if len(top) > LOD_TOP_VALUES:
+            parts.append("…")
+        label += f"\n({', '.join(parts)})"
+    return label
+
+def vpc_cluster(region, vpc_id):
+    return f"cluster_{region}_{vpc_id.replace('-', '_')}"
+
+# Edges to a VPC point at its cluster, or at the region's VPC summary node
+def vpc_target(region, vpc_id, vpcs_collapsed):
+    return f"{region}_vpcs" if vpcs_collapsed else vpc_cluster(region, vpc_id)
+
+# Node id from parts; ':' would read as a port in edge statements
+def node_id(*parts):
+    return "_".join(str(p) for p in parts).replace(':', '_')
+
+# Nodes (or a summary per service) for the registry services drawn without
+# relationships, e.g. DynamoDB tables and SQS queues in a region
+def listed_nodes(g, prefix, data, scope, lod):
+    for service, (title, name_key, summary_key) in diagram_services(scope):
+        items = data.get(service) or []
+        if collapsed(lod, service, items):
+            g.node(f"{prefix}_{service}_summary", label=summary_label(title, items, summary_key))
+            continue
+        for item in items:
+            name = str(item.get(name_key))
+            # Queue URLs and topic ARNs: the last part is the name
+            short = re.split('[:/]', name)[-1]
+            g.node(node_id(prefix, service, name), label=f"{title}\n{short}")
+
+# (resource ARN, node id) for the drawn nodes IAM policies can name: S3 buckets,
+# Lambda functions and the registry's listed services
+def arn_nodes(results, lod, iam):
+    partition = iam.get('Partition') or 'aws'
+    nodes = []
+    buckets = results['global'].get('s3') or []
+    if not collapsed(lod, 's3', buckets):
+        nodes += [(f"arn:{partition}:s3:::{b['Name']}", node_id('s3', b['Name'])) for b in buckets]
+    scopes = [('global', None, results['global'])] + [(r, r, data) for r, data in results['regions'].items()]
+    for prefix, region, data in scopes:
+        # Organisation inventories key regions "<account>/<region>"
+        account, _, name = (region or '').rpartition('/')
+        account = account or iam.get('Account')
+        if region and not collapsed(lod, 'lambda', data.get('lambda') or []):
+            nodes += [(REGISTRY['lambda'].arn_of(f, name, account, partition), f"{region}_lambda_{f['FunctionName']}")
+                      for f in data['lambda']]
+        for service, (_, name_key, _) in diagram_services('regional' if region else 'global'):
+            items = data.get(service) or []
+            if not collapsed(lod, service, items):
+                nodes += [(REGISTRY[service].arn_of(item, name, account, partition),
+                           node_id(prefix, service, item.get(name_key))) for item in items]
+    return [(arn, node) for arn, node in nodes if arn]
+
+# [(node id, [principal ARNs])] for drawn resources some principal has access to
+def iam_access(results, lod):
+    iam = results['global'].get('iam') or {}
+    if not iam.get('Access'):
+        return []
+    index = AccessIndex(iam)
+    access = []
+    for arn, node in arn_nodes(results, lod, iam):
+        found = index.principals(arn)
+        if found:
+            access.append((node, found))
+    return access
+
+# Build Graphviz diagram (best-effort relationships). lod is a thresholds dict
+# (see LOD_THRESHOLDS) or None to draw every resource. Pass dot to build into an
+# existing graph or a diagramrender.DotWriter instead of a new Digraph. results
+# may also be an InventoryStore; use subset_results to draw one region / VPC.
+def build_graph(results, lod=None, name="AWS_Architecture", include_global=True, dot=None):
+    if isinstance(results, InventoryStore):
+        results = results.load(include_global=include_global)
+    if dot is None:
+        from graphviz import Digraph
+        dot = Digraph(name=name, format="pdf")
     dot.attr(rankdir='LR', splines='ortho')
     dot.attr('node', shape='box')
+    access = iam_access(results, lod) if include_global else []
 
     # Global cluster for S3 / IAM
-    with dot.subgraph(name='cluster_global') as g:
-        g.attr(label='Global')
-        # S3
-        if results['global']['s3']:
-            with g.subgraph(name='cluster_s3') as s3c:
-                s3c.attr(label='S3 Buckets')
-                for b in results['global']['s3']:
-                    bnode = f"s3:{b['Name']}"
-                    s3c.node(bnode, label=f"S3\n{b['Name']}")
-        # IAM summary (single node)
-        iam_summary = results['global'].get('iam', {})
-        g.node('iam', label=f"IAM\nUsers:{iam_summary.get('UsersCount', '?')} Roles:{iam_summary.get('RolesCount', '?')}")
+    if include_global:
+        with dot.subgraph(name='cluster_global') as g:
+            g.attr(label='Global')
+            # S3
+            buckets = results['global']['s3']
+            if buckets:
+                with g.subgraph(name='cluster_s3') as s3c:
+                    s3c.attr(label='S3 Buckets')
+                    if collapsed(lod, 's3', buckets):
+                        s3c.node('s3_summary', label=summary_label("S3", buckets))
+                    else:
+                        for b in buckets:
+                            bnode = node_id('s3', b['Name'])
+                            s3c.node(bnode, label=f"S3\n{b['Name']}")
+            # IAM summary (single node)
+            iam_summary = results['global'].get('iam', {})
+            g.node('iam', label=f"IAM\nUsers:{iam_summary.get('UsersCount', '?')} Roles:{iam_summary.get('RolesCount', '?')}")
+            listed_nodes(g, 'global', results['global'], 'global', lod)
+            # Principals with an access edge of their own
+            principals = iam_summary.get('Principals') or {}
+            for arn in sorted({p for _, found in access if not collapsed(lod, 'iam', found) for p in found}):
+                info = principals.get(arn) or {}
+                g.node(node_id('iam', arn), label=f"{info.get('Type', 'principal').capitalize()}\n{info.get('Name', arn)}")
 
     # Regions
+    inventory = Inventory(results)
     for region, data in results['regions'].items():
+        index = inventory.region(region)
         with dot.subgraph(name=f'cluster_{region}') as rg:
             rg.attr(label=f"Region: {region}")
+            vpcs_collapsed = collapsed(lod, 'vpcs', data['vpcs'])
+            if vpcs_collapsed:
+                # Whole-region summary: VPCs -> subnets -> EC2, VPCs -> RDS
+                vid = f"{region}_vpcs"
+                rg.node(vid, label=summary_label("VPC", list(data['vpcs'].values()),
+                                                 lambda v: 'default' if v.get('IsDefault') else 'custom'))
+                subnets = [sub for v in data['vpcs'].values() for sub in v.get('Subnets', [])]
+                if subnets:
+                    rg.node(f"{region}_subnets", label=summary_label("Subnets", subnets, 'AvailabilityZone'))
+                    rg.edge(vid, f"{region}_subnets")
+                if data['ec2']:
+                    rg.node(f"{region}_ec2", label=summary_label("EC2", data['ec2'], 'InstanceType'))
+                    rg.edge(f"{region}_subnets" if subnets else vid, f"{region}_ec2")
+                if data['rds']:
+                    rg.node(f"{region}_rds", label=summary_label("RDS", data['rds'], 'Engine'))
+                    rg.edge(vid, f"{region}_rds")
             # VPC clusters
-            if data['vpcs']:
+            elif data['vpcs']:
                 for vpc_id, vpc_info in data['vpcs'].items():
-                    cname = f"cluster_{region}_{vpc_id.replace('-', '_')}"
+                    cname = vpc_cluster(region, vpc_id)
                     with rg.subgraph(name=cname) as vcl:
                         vcl.attr(label=f"VPC {vpc_id}\n{vpc_info.get('CidrBlock','')}")
+                        subnets = vpc_info.get('Subnets', [])
+                        ec2s = index.in_vpc('ec2', vpc_id)
                         # Subnets as nodes (optional)
-                        for subnet in vpc_info.get('Subnets', []):
-                            sn = f"{region}_{subnet['SubnetId']}"
-                            vcl.node(sn, label=f"Subnet\n{subnet['SubnetId']}\n{subnet.get('AvailabilityZone')}")
-                        # Attach EC2 instances that belong to this VPC
-                        for ec2i in [e for e in data['ec2'] if e.get('VpcId') == vpc_id]:
-                            nid = f"{region}_{ec2i['InstanceId']}"
-                            label = f"EC2\n{ec2i['InstanceId']}\n{ec2i.get('InstanceType')}\n{ec2i.get('State')}"
-                            vcl.node(nid, label=label)
-                            # edge to subnet
-                            if ec2i.get('SubnetId'):
-                                sn = f"{region}_{ec2i['SubnetId']}"
-                                vcl.edge(sn, nid)
+                        if collapsed(lod, 'subnets', subnets):
+                            vcl.node(f"{cname}_subnets", label=summary_label("Subnets", subnets, 'AvailabilityZone'))
+                            if ec2s:
+                                vcl.node(f"{cname}_ec2", label=summary_label("EC2", ec2s, 'InstanceType'))
+                                vcl.edge(f"{cname}_subnets", f"{cname}_ec2")
+                        else:
+                            for subnet in subnets:
+                                sn = f"{region}_{subnet['SubnetId']}"
+                                vcl.node(sn, label=f"Subnet\n{subnet['SubnetId']}\n{subnet.get('AvailabilityZone')}")
+                            if collapsed(lod, 'ec2', ec2s):
+                                # One summary per subnet, hung off the subnet node
+                                for subnet in subnets:
+                                    members = index.in_subnet('ec2', subnet['SubnetId'])
+                                    if members:
+                                        sn = f"{region}_{subnet['SubnetId']}"
+                                        vcl.node(f"{sn}_ec2", label=summary_label("EC2", members, 'InstanceType'))
+                                        vcl.edge(sn, f"{sn}_ec2")
+                            else:
+                                # Attach EC2 instances that belong to this VPC
+                                for ec2i in ec2s:
+                                    nid = f"{region}_{ec2i['InstanceId']}"
+                                    label = f"EC2\n{ec2i['InstanceId']}\n{ec2i.get('InstanceType')}\n{ec2i.get('State')}"
+                                    vcl.node(nid, label=label)
+                                    # edge to subnet
+                                    if ec2i.get('SubnetId'):
+                                        sn = f"{region}_{ec2i['SubnetId']}"
+                                        vcl.edge(sn, nid)
                         # Attach RDS in same VPC
-                        for rdsinst in [r for r in data['rds'] if r.get('VpcId') == vpc_id]:
-                            rid = f"{region}_rds_{rdsinst['DBInstanceIdentifier']}"
-                            vcl.node(rid, label=f"RDS\n{rdsinst['DBInstanceIdentifier']}\n{rdsinst.get('Engine')}")
+                        rdss = index.in_vpc('rds', vpc_id)
+                        if collapsed(lod, 'rds', rdss):
+                            vcl.node(f"{cname}_rds", label=summary_label("RDS", rdss, 'Engine'))
+                        else:
+                            for rdsinst in rdss:
+                                rid = f"{region}_rds_{rdsinst['DBInstanceIdentifier']}"
+                                vcl.node(rid, label=f"RDS\n{rdsinst['DBInstanceIdentifier']}\n{rdsinst.get('Engine')}")
                 # EC2 not in any VPC (rare)
+            elif collapsed(lod, 'ec2', data['ec2']):
+                rg.node(f"{region}_ec2", label=summary_label("EC2", data['ec2'], 'InstanceType'))
             else:
                 # If no VPC data, just list EC2 etc at region level
                 for ec2i in data['ec2']:
@@ -280,62 +571,269 @@ def build_graph(results):
                     rg.node(nid, label=f"EC2\n{ec2i['InstanceId']}\n{ec2i.get('InstanceType')}\n{ec2i.get('State')}")
 
             # Load balancers
-            for lb in data['elbv2']:
-                lid = f"{region}_lb_{lb['LoadBalancerName']}"
-                rg.node(lid, label=f"LB\n{lb['LoadBalancerName']}\n{lb['Type']}\n{lb.get('DNSName')}")
-                # connect LB to VPC node (if known)
-                if lb.get('VpcId') and lb.get('VpcId') in data['vpcs']:
-                    # make a small edge to the VPC cluster label node
-                    rg.edge(lid, f"cluster_{region}_{lb['VpcId'].replace('-', '_')}")
+            if collapsed(lod, 'elbv2', data['elbv2']):
+                lid = f"{region}_lb_summary"
+                rg.node(lid, label=summary_label("LB", data['elbv2'], 'Type'))
+                vpc_ids = {lb['VpcId'] for lb in data['elbv2'] if lb.get('VpcId') in data['vpcs']}
+                for target in sorted({vpc_target(region, v, vpcs_collapsed) for v in vpc_ids}):
+                    rg.edge(lid, target)
+            else:
+                for lb in data['elbv2']:
+                    lid = f"{region}_lb_{lb['LoadBalancerName']}"
+                    rg.node(lid, label=f"LB\n{lb['LoadBalancerName']}\n{lb['Type']}\n{lb.get('DNSName')}")
+                    # connect LB to VPC node (if known)
+                    if lb.get('VpcId') and lb.get('VpcId') in data['vpcs']:
+                        # make a small edge to the VPC cluster label node
+                        rg.edge(lid, vpc_target(region, lb['VpcId'], vpcs_collapsed))
             # EKS clusters
-            for eks in data['eks']:
-                eid = f"{region}_eks_{eks['Name']}"
-                rg.node(eid, label=f"EKS\n{eks['Name']}\nver:{eks.get('Version')}")
-                if eks.get('VpcId'):
-                    rg.edge(eid, f"cluster_{region}_{eks['VpcId'].replace('-', '_')}")
+            if collapsed(lod, 'eks', data['eks']):
+                eid = f"{region}_eks_summary"
+                rg.node(eid, label=summary_label("EKS", data['eks'], 'Version'))
+                vpc_ids = {e['VpcId'] for e in data['eks'] if e.get('VpcId')}
+                for target in sorted({vpc_target(region, v, vpcs_collapsed) for v in vpc_ids}):
+                    rg.edge(eid, target)
+            else:
+                for eks in data['eks']:
+                    eid = f"{region}_eks_{eks['Name']}"
+                    rg.node(eid, label=f"EKS\n{eks['Name']}\nver:{eks.get('Version')}")
+                    if eks.get('VpcId'):
+                        rg.edge(eid, vpc_target(region, eks['VpcId'], vpcs_collapsed))
             # ECS clusters
-            for ecs in data['ecs']:
-                cid = f"{region}_ecs_{ecs['ClusterName']}"
-                rg.node(cid, label=f"ECS\n{ecs['ClusterName']}\n{ecs.get('Status')}")
+            if collapsed(lod, 'ecs', data['ecs']):
+                rg.node(f"{region}_ecs_summary", label=summary_label("ECS", data['ecs'], 'Status'))
+            else:
+                for ecs in data['ecs']:
+                    cid = f"{region}_ecs_{ecs['ClusterName']}"
+                    rg.node(cid, label=f"ECS\n{ecs['ClusterName']}\n{ecs.get('Status')}")
             # Lambdas (map VPC if present)
-            for lam in data['lambda']:
-                lid = f"{region}_lambda_{lam['FunctionName']}"
-                rg.node(lid, label=f"Lambda\n{lam['FunctionName']}\n{lam.get('Runtime')}")
-                vpccfg = lam.get('VpcConfig') or {}
-                if vpccfg.get('VpcId'):
-                    rg.edge(lid, f"cluster_{region}_{vpccfg['VpcId'].replace('-', '_')}")
+            if collapsed(lod, 'lambda', data['lambda']):
+                lid = f"{region}_lambda_summary"
+                rg.node(lid, label=summary_label("Lambda", data['lambda'], 'Runtime'))
+                vpc_ids = {(lam.get('VpcConfig') or {}).get('VpcId') for lam in data['lambda']} - {None, ''}
+                for target in sorted({vpc_target(region, v, vpcs_collapsed) for v in vpc_ids}):
+                    rg.edge(lid, target)
+            else:
+                for lam in data['lambda']:
+                    lid = f"{region}_lambda_{lam['FunctionName']}"
+                    rg.node(lid, label=f"Lambda\n{lam['FunctionName']}\n{lam.get('Runtime')}")
+                    vpccfg = lam.get('VpcConfig') or {}
+                    if vpccfg.get('VpcId'):
+                        rg.edge(lid, vpc_target(region, vpccfg['VpcId'], vpcs_collapsed))
+            listed_nodes(rg, region, data, 'regional', lod)
             # RDS already attached inside vpc clusters earlier if vpc info existed
 
-    # Optional edges: connect IAM to resources (indicates auth)
-    dot.edge('iam', 's3:' + results['global']['s3'][0]['Name'] if results['global']['s3'] else 'iam', label='auth (example)')
+    # IAM access edges: principal -> resource, or one counted edge from the IAM
+    # node when too many principals reach the resource
+    for node, found in access:
+        if collapsed(lod, 'iam', found):
+            dot.edge('iam', node, label=f"{len(found):,} principals")
+        else:
+            for principal in found:
+                dot.edge(node_id('iam', principal), node)
 
     return dot
 
+# Results restricted to one region, or one VPC within it, for drill-down diagrams.
+# From an InventoryStore only that region / VPC is read.
+def subset_results(results, region, vpc_id=None):
+    if isinstance(results, InventoryStore):
+        return results.load(region, vpc_id, include_global=False)
+    data = results['regions'][region]
+    if vpc_id is None:
+        part = data
+    else:
+        index = Inventory(results).region(region)
+        part = new_region()
+        part['vpcs'] = {vpc_id: data['vpcs'][vpc_id]}
+        for service in part:
+            if service != 'vpcs':
+                part[service] = list(index.in_vpc(service, vpc_id))
+    return {'regions': {region: part}, 'global': new_global()}
+
+# [(region, [vpc ids])] from a results dict or an InventoryStore
+def region_vpcs(results):
+    if isinstance(results, InventoryStore):
+        return results.region_vpcs()
+    return [(region, list(data['vpcs'])) for region, data in results['regions'].items()]
+
+# One diagram per region (level='region') or per VPC (level='vpc'), each with
+# the same LOD applied, so no single render has to lay out the whole account.
+# Yields (suffix, Digraph) pairs.
+def build_drilldowns(results, level='region', lod=None):
+    for region, vpc_ids in region_vpcs(results):
+        if level == 'region':
+            yield region, build_graph(subset_results(results, region), lod=lod,
+                                      name=f"AWS_{region}", include_global=False)
+        else:
+            for vpc_id in vpc_ids:
+                yield f"{region}_{vpc_id}", build_graph(subset_results(results, region, vpc_id), lod=lod,
+                                                        name=f"AWS_{region}_{vpc_id}", include_global=False)
+
+# Render jobs for the split pipeline: a global overview plus one graph per region
+# (or per VPC), as (name, results, build_graph kwargs) for diagramrender.render_all
+def render_jobs(results, level='region', lod=None):
+    overview = results.load() if isinstance(results, InventoryStore) else results
+    jobs = [('overview', overview, {'lod': OVERVIEW_LOD})]
+    for region, vpc_ids in region_vpcs(results):
+        if level == 'region':
+            jobs.append((region, subset_results(results, region), {'lod': lod, 'include_global': False}))
+        else:
+            for vpc_id in vpc_ids:
+                jobs.append((f"{region}_{vpc_id}", subset_results(results, region, vpc_id),
+                             {'lod': lod, 'include_global': False}))
+    return jobs
+
 # Entrypoint
-def main():
-    try:
-        regions = None
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export an AWS account inventory and architecture diagram.")
+    parser.add_argument('--regions', nargs='+', help="Regions to scan (default: all enabled regions)")
+    parser.add_argument('--workers', type=int, default=SCAN_WORKERS,
+                        help=f"Max concurrent (region, service) scan jobs (default: {SCAN_WORKERS})")
+    parser.add_argument('--stream', action='store_true',
+                        help=f"Write resources to {OUT_NDJSON} as they are scanned instead of one {OUT_JSON} at the end")
+    parser.add_argument('--db', nargs='?', const=STORE_DB, metavar='PATH',
+                        help=f"Write resources to a SQLite store (default: {STORE_DB}) and draw from it")
+    parser.add_argument('--from-db', metavar='PATH',
+                        help="Don't scan; draw diagrams from an existing SQLite store")
+    parser.add_argument('--from-inventory', nargs='?', const=OUT_JSON, metavar='PATH',
+                        help=f"Don't scan; draw diagrams from a saved inventory (.json, .ndjson or .db; "
+                             f"default: {OUT_JSON})")
+    # Also lets cloudcli's `diagram --lod PATH` (run as --from-inventory --lod PATH) reach the path
+    parser.add_argument('inventory', nargs='?', metavar='PATH',
+                        help="Don't scan; draw diagrams from this saved inventory (as --from-inventory PATH)")
+    parser.add_argument('--yes', '-y', action='store_true', help="Scan without asking for confirmation")
+    parser.add_argument('--no-diagram', action='store_true', help="Only scan and save the inventory")
+    parser.add_argument('--diagram-region', metavar='REGION',
+                        help="Only draw this region (only this region is read from a --db store)")
+    parser.add_argument('--diagram-vpc', metavar='VPC_ID', help="Only draw this VPC (with --diagram-region)")
+    parser.add_argument('--profile', help="AWS profile for all clients (default: env / credential chain)")
+    parser.add_argument('--max-pool-connections', type=int, default=awsclients.MAX_POOL_CONNECTIONS,
+                        help="HTTP connections per pooled boto3 client")
+    parser.add_argument('--probe', action='store_true',
+                        help="Probe each region with the Resource Groups Tagging API first and only run scanners "
+                             "for resource types it finds (untagged resources are not seen by the probe)")
+    parser.add_argument('--trace', action='store_true',
+                        help=f"Trace every API call; writes {scantrace.REPORT_FILE} and a Chrome trace "
+                             f"({scantrace.TRACE_FILE}) after the scan")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and don't update the inventory cache")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help=f"Inventory cache directory (default: {CACHE_DIR})")
+    parser.add_argument('--ttl', action='append', metavar='SERVICE=SECONDS',
+                        help="Override a service's cache TTL (repeatable)")
+    parser.add_argument('--refresh-region', action='append', default=[], metavar='REGION',
+                        help="Rescan this region even if cached ('global' for S3/IAM; repeatable)")
+    parser.add_argument('--refresh-service', action='append', default=[], metavar='SERVICE',
+                        help="Rescan this service in every region even if cached (repeatable)")
+    parser.add_argument('--lod', action='store_true',
+                        help="Collapse large groups of resources into summary nodes (see LOD_THRESHOLDS)")
+    parser.add_argument('--lod-threshold', action='append', metavar='SERVICE=COUNT',
+                        help="Override a level-of-detail threshold, e.g. ec2=200 (implies --lod; repeatable)")
+    parser.add_argument('--drilldown', choices=['region', 'vpc'],
+                        help="Also render one diagram per region or per VPC")
+    parser.add_argument('--split', action='store_true',
+                        help=f"Render an overview plus one diagram per region (per VPC with --drilldown vpc) "
+                             f"in parallel into {DOT_BASENAME}/ with an index.html")
+    parser.add_argument('--engine', choices=diagramrender.ENGINES, default='auto',
+                        help="Graphviz layout engine for --split ('auto' uses sfdp for large graphs)")
+    parser.add_argument('--render-timeout', type=int, default=diagramrender.RENDER_TIMEOUT,
+                        help="Seconds allowed per Graphviz layout with --split")
+    parser.add_argument('--render-workers', type=int, default=diagramrender.RENDER_WORKERS,
+                        help="Parallel Graphviz processes with --split")
+    return parser.parse_args(argv)
+
+def parse_thresholds(values):
+    lod = dict(LOD_THRESHOLDS)
+    for value in values or []:
+        service, _, count = value.partition('=')
+        if not count:
+            raise ValueError(f"Bad threshold '{value}', expected service=count")
+        lod[service.strip()] = int(count)
+    return lod
+
+def render(dot, basename):
+    outpath = dot.render(filename=basename, cleanup=True)
+    # dot.render writes DOT and PDF, cleanup removes DOT, returns filename with .pdf extension
+    pdf_file = outpath if outpath.endswith('.pdf') else basename + '.pdf'
+    if os.path.exists(pdf_file):
+        print(f"Architecture PDF generated: {pdf_file}")
+    else:
+        print("PDF render may have failed. Check Graphviz installation and permissions.")
+
+# Scan as configured by the command line; returns a results dict, or the
+# InventoryStore the scan was written to
+def scan(args):
+    awsclients.configure(max_pool_connections=args.max_pool_connections, profile=args.profile)
+    regions = args.regions
+    if regions:
+        print(f"This script will scan {len(regions)} region(s): {', '.join(regions)}.")
+    else:
         print("This script will scan all regions returned by EC2.describe_regions() in your AWS account.")
-        print("Make sure AWS credentials are configured (env, ~/.aws/credentials or role).")
+    print("Make sure AWS credentials are configured (env, ~/.aws/credentials or role).")
+    # The scan only reads; without a terminal to ask on (cron, CI) it just runs
+    if not args.yes and sys.stdin.isatty():
         proceed = input("Proceed? (y/N): ").strip().lower()
         if proceed != 'y':
             print("Aborted by user.")
             sys.exit(0)
 
-        results = scan_account(regions)
-        dot = build_graph(results)
-        # Render PDF
-        outpath = dot.render(filename=DOT_BASENAME, cleanup=True)
-        # dot.render writes DOT and PDF, cleanup removes DOT, returns filename with .pdf extension
-        pdf_file = outpath if outpath.endswith('.pdf') else DOT_BASENAME + '.pdf'
-        if os.path.exists(pdf_file):
-            print(f"Architecture PDF generated: {pdf_file}")
+    cache = None
+    if not args.no_cache:
+        cache = InventoryCache(get_account_id(), args.cache_dir, parse_ttls(args.ttl))
+    scan_opts = dict(workers=args.workers, cache=cache, probe=args.probe,
+                     refresh_regions=args.refresh_region, refresh_services=args.refresh_service)
+    tracer = scantrace.install() if args.trace else None
+    try:
+        if args.db:
+            scan_account(regions, db=args.db, **scan_opts)
+            return InventoryStore(args.db)
+        if args.stream:
+            scan_account(regions, stream=OUT_NDJSON, **scan_opts)
+            return load_ndjson(OUT_NDJSON)
+        return scan_account(regions, **scan_opts)
+    finally:
+        if tracer:
+            logging.info(f"Scan report written to {tracer.write_report()}, trace to {tracer.write_chrome_trace()}")
+
+# Saved inventory to draw: a SQLite store is read lazily, per diagram
+def open_inventory(path):
+    if path.endswith('.db'):
+        return InventoryStore(path)
+    return load_inventory(path)
+
+# Returns the exit status: 0 when everything was scanned and drawn, 1 otherwise
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        if args.diagram_vpc and not args.diagram_region:
+            raise SystemExit("--diagram-vpc needs --diagram-region")
+        if args.from_db or args.inventory or args.from_inventory:
+            results = open_inventory(args.from_db or args.inventory or args.from_inventory)
         else:
-            print("PDF render may have failed. Check Graphviz installation and permissions.")
-    except NoCredentialsError:
-        logging.error("AWS credentials not found. Configure credentials before running.")
+            results = scan(args)
+            if args.no_diagram:
+                return 0
+        if args.diagram_region:
+            results = subset_results(results, args.diagram_region, args.diagram_vpc)
+        lod = parse_thresholds(args.lod_threshold) if args.lod or args.lod_threshold else None
+        if args.split:
+            rendered = diagramrender.render_all(build_graph, render_jobs(results, args.drilldown or 'region', lod),
+                                                DOT_BASENAME, engine=args.engine, timeout=args.render_timeout,
+                                                workers=args.render_workers)
+            ok = sum(1 for r in rendered if r['status'] == 'ok')
+            print(f"Rendered {ok}/{len(rendered)} diagrams; see {os.path.join(DOT_BASENAME, 'index.html')}")
+            return 0 if ok == len(rendered) else 1
+        # Render PDF
+        render(build_graph(results, lod=lod), DOT_BASENAME)
+        if args.drilldown:
+            for suffix, dot in build_drilldowns(results, args.drilldown, lod=lod):
+                render(dot, f"{DOT_BASENAME}_{suffix}")
+        return 0
     except Exception as ex:
-        logging.exception(f"Unhandled error: {ex}")
+        from botocore.exceptions import NoCredentialsError
+        if isinstance(ex, NoCredentialsError):
+            logging.error("AWS credentials not found. Configure credentials before running.")
+        else:
+            logging.exception(f"Unhandled error: {ex}")
+    return 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+diagramrender.py
+
+Split render pipeline for createinfradiagram.py.
+
+Instead of one graphviz.Digraph holding every region and a single all-or-nothing
+layout, each render job (the global overview, one per region or per VPC) is
+written straight to a .dot file by DotWriter and laid out by its own Graphviz
+subprocess. Jobs run over a process pool, each layout has a timeout, and an
+index.html links whatever was produced.
+"""
+
+import html
+import logging
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+RENDER_WORKERS = os.cpu_count() or 2
+RENDER_TIMEOUT = 600  # seconds per Graphviz layout
+# engine='auto' switches from dot to sfdp past this many nodes
+AUTO_SFDP_NODES = 2000
+ENGINES = ['auto', 'dot', 'sfdp', 'neato', 'fdp']
+
+# graphviz's DOT quoting, imported by the first DotWriter so importing this module
+# (for its settings) doesn't load graphviz
+quote = quote_edge = a_list = attr_list = None
+
+
+def _load_quoting():
+    global quote, quote_edge, a_list, attr_list
+    if quote is None:
+        from graphviz.quoting import quote, quote_edge, a_list, attr_list
+
+
+# Writes DOT statements to disk as they are produced. Implements the part of the
+# graphviz.Digraph API build_graph uses (attr, node, edge, subgraph), so the same
+# builder can target either.
+class DotWriter:
+    def __init__(self, path, name):
+        self.path = path
+        self.nodes = 0
+        self.edges = 0
+        self._depth = 1
+        _load_quoting()
+        self._fh = open(path, "w")
+        self._fh.write(f"digraph {quote(name)} {{\n")
+
+    def _line(self, text):
+        self._fh.write('\t' * self._depth + text + '\n')
+
+    def attr(self, kw=None, **attrs):
+        if not attrs:
+            return
+        if kw is None:
+            self._line(a_list(None, kwargs=attrs))
+        else:
+            self._line(f"{kw}{attr_list(None, kwargs=attrs)}")
+
+    def node(self, name, label=None, **attrs):
+        self.nodes += 1
+        self._line(f"{quote(name)}{attr_list(label, kwargs=attrs)}")
+
+    def edge(self, tail_name, head_name, label=None, **attrs):
+        self.edges += 1
+        self._line(f"{quote_edge(tail_name)} -> {quote_edge(head_name)}{attr_list(label, kwargs=attrs)}")
+
+    def subgraph(self, name=None):
+        return _Subgraph(self, name)
+
+    def close(self):
+        if not self._fh.closed:
+            self._fh.write("}\n")
+            self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Subgraph:
+    def __init__(self, writer, name):
+        self.writer = writer
+        self.name = name
+
+    def __enter__(self):
+        self.writer._line(f"subgraph {quote(self.name)} {{" if self.name else "{")
+        self.writer._depth += 1
+        return self.writer
+
+    def __exit__(self, *exc):
+        self.writer._depth -= 1
+        self.writer._line("}")
+
+
+def choose_engine(engine, nodes):
+    if engine == 'auto':
+        return 'sfdp' if nodes > AUTO_SFDP_NODES else 'dot'
+    return engine
+
+
+# Runs in a worker process: stream the job's graph to <outdir>/<name>.dot with
+# build(results, dot=writer, **build_kwargs), then lay it out with Graphviz.
+def render_job(build, name, results, build_kwargs, outdir, fmt='pdf', engine='auto',
+               timeout=RENDER_TIMEOUT, keep_dot=False):
+    dot_path = os.path.join(outdir, f"{name}.dot")
+    out_path = os.path.join(outdir, f"{name}.{fmt}")
+    start = time.perf_counter()
+    with DotWriter(dot_path, name) as writer:
+        build(results, dot=writer, **build_kwargs)
+    write_seconds = time.perf_counter() - start
+    engine = choose_engine(engine, writer.nodes)
+    status = 'ok'
+    start = time.perf_counter()
+    try:
+        subprocess.run(['dot', f'-K{engine}', f'-T{fmt}', dot_path, '-o', out_path],
+                       check=True, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        status = f'timeout after {timeout}s'
+    except FileNotFoundError:
+        status = 'Graphviz not installed'
+    except subprocess.CalledProcessError as e:
+        err = e.stderr.decode(errors='replace').strip().splitlines()
+        status = f"failed: {err[-1] if err else e.returncode}"
+    layout_seconds = time.perf_counter() - start
+    if status == 'ok' and not keep_dot:
+        os.remove(dot_path)
+    return {
+        'name': name, 'output': out_path if status == 'ok' else dot_path, 'status': status,
+        'engine': engine, 'nodes': writer.nodes, 'edges': writer.edges,
+        'write_seconds': round(write_seconds, 3), 'layout_seconds': round(layout_seconds, 3),
+    }
+
+
+def write_index(outdir, rendered, title="AWS Architecture"):
+    rows = []
+    for r in rendered:
+        link = os.path.relpath(r['output'], outdir)
+        rows.append(
+            f"<tr><td><a href=\"{html.escape(link)}\">{html.escape(r['name'])}</a></td>"
+            f"<td>{html.escape(r['status'])}</td><td>{r['engine']}</td><td>{r['nodes']}</td>"
+            f"<td>{r['edges']}</td><td>{r['write_seconds'] + r['layout_seconds']:.1f}s</td></tr>")
+    path = os.path.join(outdir, "index.html")
+    with open(path, "w") as fh:
+        fh.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(title)}</title></head>\n"
+                 f"<body><h1>{html.escape(title)}</h1>\n<table border=\"1\" cellpadding=\"4\">\n"
+                 "<tr><th>Diagram</th><th>Status</th><th>Engine</th><th>Nodes</th><th>Edges</th><th>Time</th></tr>\n"
+                 + "\n".join(rows) + "\n</table></body></html>\n")
+    return path
+
+
+# jobs is a list of (name, results, build_kwargs). Returns the per-job records in
+# job order and writes index.html next to the outputs.
+def render_all(build, jobs, outdir, fmt='pdf', engine='auto', timeout=RENDER_TIMEOUT,
+               workers=RENDER_WORKERS, keep_dot=False):
+    os.makedirs(outdir, exist_ok=True)
+    rendered = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_job, build, name, results, build_kwargs, outdir,
+                               fmt, engine, timeout, keep_dot): name
+                   for name, results, build_kwargs in jobs}
+        for fut in as_completed(futures):
+            name = futures[fut]
+            try:
+                rendered[name] = fut.result()
+            except Exception as exc:
+                logging.warning(f"Render of {name} failed: {exc}")
+                rendered[name] = {'name': name, 'output': os.path.join(outdir, f"{name}.dot"),
+                                  'status': f"failed: {exc}", 'engine': engine, 'nodes': 0, 'edges': 0,
+                                  'write_seconds': 0, 'layout_seconds': 0}
+            logging.info(f"Rendered {name}: {rendered[name]['status']}")
+    ordered = [rendered[name] for name, _, _ in jobs]
+    index = write_index(outdir, ordered)
+    logging.info(f"Diagram index written to {index}")
+    return ordered
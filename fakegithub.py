@@ -0,0 +1,323 @@
+"""
+fakegithub.py
+
+A local stand-in for the parts of the GitHub REST API the auto*repo.py scripts
+use, so they can be run and measured without touching a real account (the
+GitHub counterpart of benchmark.py's StubAccount).
+
+It serves, from memory:
+    GET    /user
+    GET    /user/repos                               paginated with Link headers; affiliation=owner
+                                                     leaves out repositories another login owns
+    POST   /user/repos
+    GET    /repos/{owner}/{repo}
+    DELETE /repos/{owner}/{repo}
+    GET    /repos/{owner}/{repo}/collaborators       paginated; affiliation=direct leaves out
+                                                     team_access grants (organisation / team);
+                                                     403 unless the login is an admin there
+    PUT    /repos/{owner}/{repo}/collaborators/{user}
+    DELETE /repos/{owner}/{repo}/collaborators/{user}
+    GET    /repos/{owner}/{repo}/invitations         paginated
+    PATCH  /repos/{owner}/{repo}/invitations/{id}
+    DELETE /repos/{owner}/{repo}/invitations/{id}
+
+GET responses carry an ETag and answer If-None-Match with 304. Every response
+has X-RateLimit-* headers; requests are counted against a quota per window
+(304s are free, as on GitHub) and get 403 once it is spent. secondary_every=N
+answers every Nth write with a secondary rate limit (403 plus Retry-After).
+With clone_root, each repository's clone_url is file://<clone_root>/<name>.git,
+and repositories created through POST /user/repos get an empty bare repository
+there to push to.
+
+Run:
+    python fakegithub.py [--port 8765] [--repos 250] [--rate-limit 5000] [--latency-ms 20]
+or in-process: server, url = serve(FakeState(repos=250)); ...; server.shutdown()
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+LOGIN = "octo"
+DEFAULT_PER_PAGE = 30
+MAX_PER_PAGE = 100
+PERMISSIONS = ['pull', 'triage', 'push', 'maintain', 'admin']
+
+
+class FakeState:
+    def __init__(self, repos=0, login=LOGIN, rate_limit=5000, rate_window=3600, secondary_every=0,
+                 latency=0.0, clone_root=None):
+        self.login = login
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.secondary_every = secondary_every
+        self.latency = latency
+        self.clone_root = clone_root
+        self.repos = {}
+        self.collaborators = {}
+        self.invitations = {}
+        # {full_name: {login: permission}} granted through the organisation or a team
+        self.team_access = {}
+        # (method, path) of every request served, in order
+        self.log = []
+        self.writes = 0
+        self._next_id = 1
+        self._window_start = time.time()
+        self._used = 0
+        self.lock = threading.Lock()
+        for n in range(repos):
+            self.add_repo(f"repo-{n:04d}", private=n % 3 != 0, fork=n % 7 == 0, archived=n % 11 == 0,
+                          pushed_at=f"20{18 + n % 7}-0{1 + n % 9}-15T12:00:00Z")
+
+    def _id(self):
+        self._next_id += 1
+        return self._next_id
+
+    def add_repo(self, name, private=True, fork=False, archived=False, pushed_at="2024-01-01T00:00:00Z",
+                 owner=None, size=1024):
+        owner = owner or self.login
+        full_name = f"{owner}/{name}"
+        clone_url = (f"file://{self.clone_root}/{name}.git" if self.clone_root
+                     else f"https://github.com/{full_name}.git")
+        repo = {'id': self._id(), 'name': name, 'full_name': full_name, 'owner': {'login': owner},
+                'private': private, 'visibility': 'private' if private else 'public', 'fork': fork,
+                'archived': archived, 'pushed_at': pushed_at, 'updated_at': pushed_at,
+                'clone_url': clone_url, 'default_branch': 'main', 'size': size}
+        self.repos[full_name] = repo
+        self.collaborators[full_name] = {owner: 'admin'}
+        self.invitations[full_name] = []
+        return repo
+
+    # Rate-limit accounting (callers hold the lock)
+    def exhausted(self):
+        now = time.time()
+        if now - self._window_start >= self.rate_window:
+            self._window_start, self._used = now, 0
+        return self._used >= self.rate_limit
+
+    def rate_headers(self, charge=True):
+        if charge:
+            self._used += 1
+        return {'X-RateLimit-Limit': str(self.rate_limit), 'X-RateLimit-Used': str(self._used),
+                'X-RateLimit-Remaining': str(max(0, self.rate_limit - self._used)),
+                'X-RateLimit-Reset': str(math.ceil(self._window_start + self.rate_window)),
+                'X-RateLimit-Resource': 'core'}
+
+
+def _etag(body):
+    return '"' + hashlib.md5(body).hexdigest() + '"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        data = b'' if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _page(self, items, query, headers):
+        per_page = min(int(query.get('per_page', [DEFAULT_PER_PAGE])[0]), MAX_PER_PAGE)
+        page = int(query.get('page', ['1'])[0])
+        last = max(1, -(-len(items) // per_page))
+        links = []
+        base = f"http://{self.headers.get('Host')}{urlsplit(self.path).path}"
+        params = {k: v[0] for k, v in query.items()}
+        if page < last:
+            links.append(f'<{base}?{urlencode(dict(params, page=page + 1, per_page=per_page))}>; rel="next"')
+            links.append(f'<{base}?{urlencode(dict(params, page=last, per_page=per_page))}>; rel="last"')
+        if links:
+            headers['Link'] = ', '.join(links)
+        return items[(page - 1) * per_page:page * per_page]
+
+    def _handle(self, method):
+        state = self.state
+        if state.latency:
+            time.sleep(state.latency)
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'null') if length else None
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        path = url.path.rstrip('/')
+        if not self.headers.get('Authorization'):
+            return self._send(401, {'message': 'Requires authentication'})
+        with state.lock:
+            state.log.append((method, path))
+            if state.exhausted():
+                return self._send(403, {'message': 'API rate limit exceeded'}, state.rate_headers(charge=False))
+            status, body, headers = self._route(method, path, query, payload)
+            # Unchanged GETs answer 304 and, as on GitHub, cost no quota
+            not_modified = False
+            if method == 'GET' and status == 200:
+                headers['ETag'] = _etag(json.dumps(body).encode())
+                not_modified = self.headers.get('If-None-Match') == headers['ETag']
+            headers.update(state.rate_headers(charge=not not_modified))
+        if not_modified:
+            return self._send(304, None, headers)
+        return self._send(status, body, headers)
+
+    # Returns (status, body, headers); runs under the state lock
+    def _route(self, method, path, query, payload):
+        state = self.state
+        headers = {}
+        if method != 'GET':
+            state.writes += 1
+            if state.secondary_every and state.writes % state.secondary_every == 0:
+                return 403, {'message': 'You have exceeded a secondary rate limit.'}, {'Retry-After': '1'}
+        if path == '/user' and method == 'GET':
+            return 200, {'login': state.login}, headers
+        if path == '/user/repos':
+            if method == 'GET':
+                repos = sorted(state.repos.values(), key=lambda r: r['full_name'])
+                visibility = query.get('visibility', ['all'])[0]
+                if visibility != 'all':
+                    repos = [r for r in repos if r['visibility'] == visibility]
+                # Repositories of other owners stand for both collaborator and organisation ones
+                affiliation = query.get('affiliation', ['owner,collaborator,organization_member'])[0].split(',')
+                if 'owner' not in affiliation:
+                    repos = [r for r in repos if r['owner']['login'] != state.login]
+                if 'collaborator' not in affiliation and 'organization_member' not in affiliation:
+                    repos = [r for r in repos if r['owner']['login'] == state.login]
+                return 200, self._page(repos, query, headers), headers
+            if method == 'POST':
+                name = (payload or {}).get('name')
+                if not name:
+                    return 422, {'message': 'Repository creation failed.',
+                                 'errors': [{'field': 'name', 'code': 'missing_field'}]}, headers
+                if f"{state.login}/{name}" in state.repos:
+                    return 422, {'message': 'Repository creation failed.',
+                                 'errors': [{'message': 'name already exists on this account'}]}, headers
+                # Empty until something is pushed (fakegithub doesn't see pushes)
+                repo = state.add_repo(name, private=(payload or {}).get('private', True), size=0)
+                if state.clone_root:
+                    subprocess.run(['git', 'init', '-q', '--bare', os.path.join(state.clone_root, f"{name}.git")],
+                                   check=True)
+                return 201, repo, headers
+        match = re.fullmatch(r'/repos/([^/]+/[^/]+)(?:/(collaborators|invitations)(?:/([^/]+))?)?', path)
+        if not match:
+            return 404, {'message': 'Not Found'}, headers
+        full_name, kind, item = match.groups()
+        repo = state.repos.get(full_name)
+        if repo is None:
+            return 404, {'message': 'Not Found'}, headers
+        if kind is None:
+            if method == 'GET':
+                return 200, repo, headers
+            if method == 'DELETE':
+                del state.repos[full_name]
+                return 204, None, headers
+        elif kind == 'collaborators':
+            collaborators = state.collaborators[full_name]
+            if method == 'GET' and item is None:
+                if collaborators.get(state.login) != 'admin':
+                    return 403, {'message': 'Must have admin rights to Repository.'}, headers
+                effective = dict(collaborators)
+                if query.get('affiliation', ['all'])[0] != 'direct':
+                    for login, permission in state.team_access.get(full_name, {}).items():
+                        if login not in effective or PERMISSIONS.index(permission) > PERMISSIONS.index(effective[login]):
+                            effective[login] = permission
+                items = [{'login': login, 'role_name': permission,
+                          'permissions': {p: PERMISSIONS.index(p) <= PERMISSIONS.index(permission)
+                                          for p in PERMISSIONS}}
+                         for login, permission in sorted(effective.items())]
+                return 200, self._page(items, query, headers), headers
+            if method == 'PUT' and item:
+                permission = (payload or {}).get('permission', 'push')
+                if item in collaborators:
+                    collaborators[item] = permission
+                    return 204, None, headers
+                invitations = state.invitations[full_name]
+                invitation = next((i for i in invitations if i['invitee']['login'] == item), None)
+                if invitation is None:
+                    invitation = {'id': state._id(), 'invitee': {'login': item}, 'repository': {'full_name': full_name}}
+                    invitations.append(invitation)
+                invitation['permissions'] = permission
+                return 201, invitation, headers
+            if method == 'DELETE' and item:
+                collaborators.pop(item, None)
+                return 204, None, headers
+        elif kind == 'invitations':
+            invitations = state.invitations[full_name]
+            if method == 'GET' and item is None:
+                return 200, self._page(list(invitations), query, headers), headers
+            invitation = next((i for i in invitations if str(i['id']) == item), None)
+            if invitation is None:
+                return 404, {'message': 'Not Found'}, headers
+            if method == 'PATCH':
+                invitation['permissions'] = (payload or {}).get('permissions', invitation['permissions'])
+                return 200, invitation, headers
+            if method == 'DELETE':
+                invitations.remove(invitation)
+                return 204, None, headers
+        return 405, {'message': 'Method Not Allowed'}, headers
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+# Start a server for state on a background thread; returns (server, base URL).
+# port=0 picks a free port.
+def serve(state, host='127.0.0.1', port=0):
+    handler = type('FakeGitHubHandler', (Handler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local fake of the GitHub REST API for the auto*repo.py scripts.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--repos', type=int, default=250, help="Repositories to generate")
+    parser.add_argument('--login', default=LOGIN)
+    parser.add_argument('--rate-limit', type=int, default=5000, help="Requests per window")
+    parser.add_argument('--rate-window', type=int, default=3600, help="Rate-limit window in seconds")
+    parser.add_argument('--secondary-every', type=int, default=0,
+                        help="Answer every Nth write with a secondary rate limit (0: never)")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay per request")
+    parser.add_argument('--clone-root', help="Directory of <name>.git bare repositories used as clone URLs")
+    args = parser.parse_args(argv)
+    state = FakeState(args.repos, args.login, args.rate_limit, args.rate_window, args.secondary_every,
+                      args.latency_ms / 1000, args.clone_root)
+    server, url = serve(state, port=args.port)
+    print(f"Fake GitHub API for {args.login} with {args.repos} repositories at {url} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    main()
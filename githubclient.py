@@ -0,0 +1,303 @@
+"""
+githubclient.py
+
+Shared GitHub REST client for the auto*repo.py scripts.
+
+GitHubClient keeps one requests.Session (a keep-alive connection pool sized for
+the scripts' worker threads) and adds, on top of plain requests:
+
+- pagination that follows the Link header's rel="next" URL, at 100 items per
+  page (GitHub's maximum; larger per_page values are silently capped);
+- conditional GETs: every response's ETag is kept in an on-disk cache
+  (ETAG_CACHE), and the next GET of the same URL sends If-None-Match. An
+  unchanged resource answers 304 with no body, which GitHub doesn't count
+  against the rate limit, and the cached body is returned instead;
+- a scheduler (RateBudget) that reads the X-RateLimit-Remaining / -Reset headers
+  and keeps throughput just under what the remaining quota allows until the
+  window resets, keeping RATE_RESERVE requests spare. Requests go straight out
+  while the quota is plentiful (up to BURST_SHARE of it at once) and are spaced
+  evenly once it is not; when it runs out, they wait for the reset instead of
+  failing.
+
+Cache entries are keyed by a fingerprint of the token, never the token itself,
+so two accounts sharing a cache directory never see each other's listings.
+base_url points the client at another server, e.g. fakegithub.py:
+
+    python fakegithub.py --port 8765 --repos 250 &
+    python autodeleterepo.py --api-url http://127.0.0.1:8765 --token test
+
+requests is imported by the first client, so importing this module stays cheap.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+API_URL = "https://api.github.com"
+ETAG_CACHE = os.path.join(".github_cache", "etags.json")
+PER_PAGE = 100
+# Connections kept alive per host; at least the number of worker threads
+POOL_SIZE = 16
+# Requests left unused in each rate-limit window (for other tools on the same token)
+RATE_RESERVE = 50
+# Share of the spare quota that may be spent in a burst before requests are spaced
+BURST_SHARE = 0.5
+REQUEST_TIMEOUT = 30  # seconds
+# Secondary rate limits without Retry-After: wait 60s, then 120s, ... (GitHub
+# asks for at least a minute)
+SECONDARY_BACKOFF = 60.0
+SECONDARY_RETRIES = 5
+
+
+# Paces requests to the remaining rate-limit quota: a virtual schedule spacing
+# them (reset - now) / spare apart, which requests may run ahead of by
+# BURST_SHARE of the time left (the generic cell rate algorithm). Thread-safe:
+# each request reserves its slot before it is sent, so concurrent workers
+# together stay within the budget.
+class RateBudget:
+    def __init__(self, reserve=RATE_RESERVE, burst_share=BURST_SHARE):
+        self.reserve = reserve
+        self.burst_share = burst_share
+        self.remaining = None
+        self.reset = None
+        self.waited = 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    # Seconds to sleep before sending; reserves this request's slot
+    def delay(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.remaining is None or self.reset is None or self.reset <= now:
+                return 0.0
+            if self.remaining <= self.reserve:
+                # Budget spent: wait for the window to reset
+                start = self.reset + 1.0
+            else:
+                interval = (self.reset - now) / (self.remaining - self.reserve)
+                start = max(now, self._next - self.burst_share * (self.reset - now))
+                self._next = max(self._next, now) + interval
+            self.remaining -= 1
+            return max(0.0, start - now)
+
+    def wait(self):
+        pause = self.delay()
+        if pause:
+            self.waited += pause
+            logging.debug(f"GitHub rate budget: waiting {pause:.2f}s")
+            time.sleep(pause)
+
+    # Update from a response's X-RateLimit-* headers
+    def update(self, headers):
+        remaining, reset = headers.get('X-RateLimit-Remaining'), headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            reset, remaining = float(reset), int(remaining)
+            if self.reset is None or reset > self.reset:
+                # A new window: the old schedule no longer applies
+                self._next = 0.0
+                self.remaining, self.reset = remaining, reset
+            elif reset == self.reset:
+                # Responses to earlier requests can arrive after later slots were
+                # reserved; never let them raise the count back up
+                self.remaining = min(self.remaining, remaining)
+
+
+class EtagCache:
+    def __init__(self, path=ETAG_CACHE):
+        self.path = path
+        self.hits = 0
+        self._changed = False
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as fh:
+                self.entries = json.load(fh)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, etag, body, next_url):
+        with self._lock:
+            self.entries[key] = {'etag': etag, 'body': body, 'next': next_url}
+            self._changed = True
+
+    def save(self):
+        with self._lock:
+            if not self._changed:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump(self.entries, fh)
+            os.replace(tmp, self.path)
+            self._changed = False
+
+
+class GitHubError(Exception):
+    def __init__(self, response):
+        self.status = response.status_code
+        try:
+            message = response.json().get('message', '')
+        except ValueError:
+            message = response.text[:200]
+        super().__init__(f"{response.request.method} {response.url}: {self.status} {message}")
+
+
+def is_secondary_limit(response):
+    if response.headers.get('Retry-After'):
+        return True
+    try:
+        message = response.json().get('message', '')
+    except ValueError:
+        return False
+    return 'secondary rate limit' in message.lower()
+
+
+class GitHubClient:
+    def __init__(self, token=None, base_url=API_URL, cache_path=ETAG_CACHE, pool_size=POOL_SIZE,
+                 reserve=RATE_RESERVE):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Accept': 'application/vnd.github+json', 'User-Agent': 'Python'})
+        if token:
+            self.session.headers['Authorization'] = f"token {token}"
+        self.budget = RateBudget(reserve)
+        self.cache = EtagCache(cache_path) if cache_path else None
+        self._scope = hashlib.sha256((token or '').encode()).hexdigest()[:16]
+        self.requests = 0
+        self.not_modified = 0
+        self.secondary_limits = 0
+        self._hold_until = 0.0
+        self._lock = threading.Lock()
+
+    def url(self, path, params=None):
+        url = path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+        return f"{url}?{urlencode(params)}" if params else url
+
+    # One request through the rate budget. Returns the response; when the quota
+    # is exhausted anyway (another client on the same token), waits for the reset
+    # and tries again once, and on a secondary rate limit backs off and retries.
+    def request(self, method, path, params=None, headers=None, **kwargs):
+        url = self.url(path, params)
+        exhausted = secondary = 0
+        while True:
+            self._hold()
+            self.budget.wait()
+            response = self.session.request(method, url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            with self._lock:
+                self.requests += 1
+            self.budget.update(response.headers)
+            if response.status_code not in (403, 429):
+                return response
+            if is_secondary_limit(response) and secondary < SECONDARY_RETRIES:
+                retry_after = response.headers.get('Retry-After')
+                pause = float(retry_after) if retry_after else SECONDARY_BACKOFF * 2 ** secondary
+                secondary += 1
+                with self._lock:
+                    self.secondary_limits += 1
+                    self._hold_until = max(self._hold_until, time.time() + pause)
+                logging.warning(f"GitHub secondary rate limit on {method} {path}; backing off {pause:.0f}s")
+                continue
+            if response.headers.get('X-RateLimit-Remaining') == '0' and not exhausted:
+                pause = max(0.0, float(response.headers.get('X-RateLimit-Reset', 0)) - time.time()) + 1.0
+                logging.warning(f"GitHub rate limit exhausted; waiting {pause:.0f}s for the reset")
+                exhausted += 1
+                time.sleep(pause)
+                continue
+            return response
+
+    # Wait out a secondary-limit backoff started by any thread
+    def _hold(self):
+        pause = self._hold_until - time.time()
+        if pause > 0:
+            with self._lock:
+                self.budget.waited += pause
+            time.sleep(pause)
+
+    # GET with If-None-Match; returns (body, next page URL or None)
+    def _get(self, url):
+        key = f"{self._scope} {url}"
+        cached = self.cache.get(key) if self.cache else None
+        headers = {'If-None-Match': cached['etag']} if cached else None
+        response = self.request('GET', url, headers=headers)
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self.not_modified += 1
+            self.cache.hits += 1
+            return cached['body'], cached['next']
+        if response.status_code != 200:
+            raise GitHubError(response)
+        body = response.json()
+        next_url = response.links.get('next', {}).get('url')
+        etag = response.headers.get('ETag')
+        if self.cache and etag:
+            self.cache.put(key, etag, body, next_url)
+        return body, next_url
+
+    def get(self, path, params=None):
+        return self._get(self.url(path, params))[0]
+
+    # Every item of a listing, page by page along the Link header
+    def paginate(self, path, params=None):
+        url = self.url(path, dict(params or {}, per_page=PER_PAGE))
+        while url:
+            items, url = self._get(url)
+            yield from items
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def save(self):
+        if self.cache:
+            self.cache.save()
+
+    def stats(self):
+        return {'requests': self.requests, 'not_modified': self.not_modified,
+                'secondary_limits': self.secondary_limits,
+                'rate_remaining': self.budget.remaining, 'waited_s': round(self.budget.waited, 1)}
+
+    def close(self):
+        self.save()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --api-url / --token / --no-etag-cache, shared by the scripts
+def add_client_args(parser, token_default=""):
+    parser.add_argument('--token', default=os.environ.get('GITHUB_TOKEN', token_default),
+                        help="Personal access token (default: $GITHUB_TOKEN)")
+    parser.add_argument('--api-url', default=os.environ.get('GITHUB_API_URL', API_URL),
+                        help=f"GitHub API base URL (default: $GITHUB_API_URL or {API_URL})")
+    parser.add_argument('--etag-cache', default=ETAG_CACHE,
+                        help=f"Conditional-request cache file (default: {ETAG_CACHE})")
+    parser.add_argument('--no-etag-cache', action='store_true', help="Don't read or update the ETag cache")
+
+
+def client_from_args(args):
+    return GitHubClient(args.token, args.api_url, None if args.no_etag_cache else args.etag_cache)
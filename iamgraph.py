@@ -0,0 +1,337 @@
+"""
+iamgraph.py
+
+Full IAM scan for createinfradiagram.py: which principals can reach which
+resource.
+
+scan_iam_graph() reads every user, group and role with their inline and
+attached policies. get_account_authorization_details returns all of that
+(local managed policy documents included) in a few large pages; when that call
+is denied, the per-principal list / get calls are made instead, concurrently.
+AWS managed policy documents are fetched per (policy ARN, default version) and
+kept in POLICY_CACHE, so repeat runs only fetch policies whose version changed.
+Org scans (orgscan.py) give each worker process a cache that doesn't save
+(use_policy_cache); the workers hand back what they fetched and the parent
+saves it once, so concurrent processes don't overwrite each other's entries.
+
+results['global']['iam'] keeps the counts and adds:
+    Account, Partition    of the scanned principals
+    Principals            {principal ARN: {'Type': 'user' | 'group' | 'role', 'Name': ..., 'Groups': [...]}}
+    Access                {resource ARN pattern: [principal ARNs]} from Allow statements, less
+                          what the principal's Deny statements take away; users also get the
+                          statements of the groups they are in
+
+A Deny statement without a Condition removes an Allow statement's resource
+pattern when one of its Resource patterns covers it (e.g. arn:aws:s3:::logs-*
+covers arn:aws:s3:::logs-2024/*) and its Action patterns cover every action the
+Allow grants; denying s3:DeleteBucket alone leaves an s3:* grant in place.
+AccessIndex matches a concrete resource ARN against the remaining patterns
+(IAM's * and ? wildcards, and sub-resources such as bucket/* for the bucket
+itself). NotResource, conditional Denies, boundaries, SCPs and resource policies
+are not evaluated: an edge means "has an Allow statement naming this resource
+that no Deny cancels outright".
+"""
+
+import bisect
+import json
+import logging
+import os
+import re
+from urllib.parse import unquote
+
+from inventorycache import CACHE_DIR
+from pagination import pages, paginate, map_concurrently
+from ratelimit import call_api, error_code
+
+# (policy ARN, version id) -> document, shared by every account (AWS managed
+# policies have the same ARN everywhere)
+POLICY_CACHE = os.path.join(CACHE_DIR, "iam_policies.json")
+DETAIL_FILTER = ['User', 'Role', 'Group', 'LocalManagedPolicy']
+
+# Principal type -> (name param, list inline, get inline, list attached), for the
+# per-principal fallback
+PRINCIPAL_CALLS = {
+    'user': ('UserName', 'list_user_policies', 'get_user_policy', 'list_attached_user_policies'),
+    'group': ('GroupName', 'list_group_policies', 'get_group_policy', 'list_attached_group_policies'),
+    'role': ('RoleName', 'list_role_policies', 'get_role_policy', 'list_attached_role_policies'),
+}
+
+
+class PolicyCache:
+    def __init__(self, path=None, autosave=True):
+        self.path = path or POLICY_CACHE
+        self.autosave = autosave
+        self.hits = 0
+        self.misses = 0
+        # Entries put since the last take_added()
+        self.added = {}
+        self._changed = False
+        try:
+            with open(self.path) as fh:
+                self.documents = json.load(fh)
+        except (OSError, ValueError):
+            self.documents = {}
+
+    def get(self, arn, version):
+        document = self.documents.get(f"{arn}@{version}")
+        if document is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return document
+
+    def put(self, arn, version, document):
+        key = f"{arn}@{version}"
+        if self.documents.get(key) != document:
+            self.documents[key] = document
+            self.added[key] = document
+            self._changed = True
+
+    # {key: document} put since the last call, for a parent process to merge
+    def take_added(self):
+        added, self.added = self.added, {}
+        return added
+
+    def merge(self, entries):
+        for key, document in entries.items():
+            if self.documents.get(key) != document:
+                self.documents[key] = document
+                self._changed = True
+
+    def save(self):
+        if not self._changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Write then rename: org scans save from several processes
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(self.documents, fh)
+        os.replace(tmp, self.path)
+
+
+# Cache scan_iam_graph uses when it isn't given one (None: a fresh PolicyCache)
+_default_cache = None
+
+
+# Make every scan_iam_graph in this process use cache (orgscan workers)
+def use_policy_cache(cache):
+    global _default_cache
+    _default_cache = cache
+
+
+# Policy documents arrive URL-encoded from some SDKs / mocks; botocore usually
+# decodes them already
+def _document(document):
+    if isinstance(document, str):
+        document = json.loads(unquote(document))
+    return document or {}
+
+
+def _as_list(value):
+    return [value] if isinstance(value, (str, dict)) else list(value or [])
+
+
+# (actions, resource patterns) of a document's Allow statements; NotAction
+# grants count as every action
+def allow_statements(document):
+    for statement in _as_list(_document(document).get('Statement')):
+        if statement.get('Effect') == 'Allow':
+            actions = _as_list(statement.get('Action')) or ['*']
+            yield [a.lower() for a in actions], _as_list(statement.get('Resource'))
+
+
+# (action regexes, resource regexes) of a document's Deny statements that always
+# apply: ones with a Condition, NotAction or NotResource are left out
+def deny_statements(document):
+    for statement in _as_list(_document(document).get('Statement')):
+        if statement.get('Effect') != 'Deny' or statement.get('Condition') \
+                or 'NotAction' in statement or 'NotResource' in statement:
+            continue
+        yield ([_regex(a.lower()) for a in _as_list(statement.get('Action'))],
+               [_regex(r) for r in _as_list(statement.get('Resource'))])
+
+
+# Whether a Deny covers resource pattern for every one of actions. Only the
+# resource's own service's actions apply to it, so "*" there means "<service>:*".
+def _denied(actions, resource, denies):
+    service = resource.split(':')[2] if resource.count(':') >= 2 else '*'
+    if '*' not in service and '?' not in service:
+        actions = [f"{service}:*" if action == '*' else action for action in actions]
+    return any(any(r.fullmatch(resource) for r in resources)
+               and all(any(a.fullmatch(action) for a in denied) for action in actions)
+               for denied, resources in denies)
+
+
+def _principal(kind, item, inline, attached, groups=()):
+    return {'Arn': item['Arn'], 'Type': kind, 'Name': item[PRINCIPAL_CALLS[kind][0]],
+            'Inline': [_document(d) for d in inline], 'Attached': list(attached), 'Groups': list(groups)}
+
+
+# Every principal and local managed policy from get_account_authorization_details.
+# Returns (principals, local policies as {Arn, DefaultVersionId, Document}).
+def _authorization_details(client):
+    details = {'UserDetailList': [], 'GroupDetailList': [], 'RoleDetailList': [], 'Policies': []}
+    for page in pages(client, 'get_account_authorization_details', Filter=DETAIL_FILTER):
+        for key, items in details.items():
+            items.extend(page.get(key, []))
+    principals = []
+    for kind, key, inline_key in (('user', 'UserDetailList', 'UserPolicyList'),
+                                  ('group', 'GroupDetailList', 'GroupPolicyList'),
+                                  ('role', 'RoleDetailList', 'RolePolicyList')):
+        for item in details[key]:
+            principals.append(_principal(kind, item, [p['PolicyDocument'] for p in item.get(inline_key, [])],
+                                         [p['PolicyArn'] for p in item.get('AttachedManagedPolicies', [])],
+                                         item.get('GroupList', [])))
+    policies = []
+    for policy in details['Policies']:
+        default = next((v for v in policy.get('PolicyVersionList', []) if v.get('IsDefaultVersion')), {})
+        policies.append({'Arn': policy['Arn'], 'DefaultVersionId': policy.get('DefaultVersionId'),
+                         'Document': default.get('Document')})
+    return principals, policies
+
+
+# The same, one principal at a time (for callers without
+# iam:GetAccountAuthorizationDetails); principals are resolved concurrently
+def _list_principals(client):
+    def resolve(job):
+        kind, item = job
+        param, list_inline, get_inline, list_attached = PRINCIPAL_CALLS[kind]
+        name = {param: item[param]}
+        inline = [call_api(client, get_inline, PolicyName=policy, **name)['PolicyDocument']
+                  for policy in paginate(client, list_inline, 'PolicyNames', **name)]
+        attached = [p['PolicyArn'] for p in paginate(client, list_attached, 'AttachedPolicies', **name)]
+        groups = []
+        if kind == 'user':
+            groups = [g['GroupName'] for g in paginate(client, 'list_groups_for_user', 'Groups', **name)]
+        return _principal(kind, item, inline, attached, groups)
+
+    jobs = [('user', u) for u in paginate(client, 'list_users', 'Users')]
+    jobs += [('group', g) for g in paginate(client, 'list_groups', 'Groups')]
+    jobs += [('role', r) for r in paginate(client, 'list_roles', 'Roles')]
+    principals = map_concurrently(resolve, jobs)
+    policies = [dict(p, Document=None) for p in paginate(client, 'list_policies', 'Policies', Scope='Local')]
+    return principals, policies
+
+
+# Documents of policies, {arn: document}. Documents already known (from the
+# authorization details) are stored in the cache; the rest are read from the cache
+# or fetched, concurrently, by version
+def _policy_documents(client, policies, cache):
+    documents = {}
+    missing = []
+    for policy in policies:
+        arn, version, document = policy['Arn'], policy.get('DefaultVersionId'), policy.get('Document')
+        if document is not None:
+            documents[arn] = _document(document)
+            cache.put(arn, version, documents[arn])
+            continue
+        document = cache.get(arn, version)
+        if document is None:
+            missing.append((arn, version))
+        else:
+            documents[arn] = document
+
+    def fetch(key):
+        arn, version = key
+        return _document(call_api(client, 'get_policy_version', PolicyArn=arn, VersionId=version)
+                         ['PolicyVersion'].get('Document'))
+
+    for (arn, version), document in zip(missing, map_concurrently(fetch, missing)):
+        documents[arn] = document
+        cache.put(arn, version, document)
+    return documents
+
+
+# {resource pattern: [principal ARNs]}. Groups get their own entries, and each
+# user's statements include those of its groups (listed under
+# Principals[user]['Groups']), since that is how most users get access. A group's
+# Deny applies to its users too.
+def build_access(principals, documents):
+    def own(principal):
+        return principal['Inline'] + [documents[arn] for arn in principal['Attached'] if arn in documents]
+
+    groups = {p['Name']: own(p) for p in principals if p['Type'] == 'group'}
+    access = {}
+    for principal in principals:
+        docs = own(principal) + [doc for group in principal['Groups'] for doc in groups.get(group, [])]
+        denies = [deny for doc in docs for deny in deny_statements(doc)]
+        for actions, resources in (allow for doc in docs for allow in allow_statements(doc)):
+            for resource in resources:
+                if not _denied(actions, resource, denies):
+                    access.setdefault(resource, set()).add(principal['Arn'])
+    return {resource: sorted(arns) for resource, arns in sorted(access.items())}
+
+
+# Full IAM scan (see module docstring); returns the results['global']['iam'] dict
+def scan_iam_graph(client, cache=None):
+    from botocore.exceptions import ClientError
+    cache = cache or _default_cache or PolicyCache()
+    try:
+        principals, local = _authorization_details(client)
+    except ClientError as e:
+        if error_code(e) not in ('AccessDenied', 'AccessDeniedException'):
+            raise
+        logging.info("get_account_authorization_details denied; resolving IAM policies per principal")
+        principals, local = _list_principals(client)
+    # AWS managed policies only matter where something has them attached
+    aws_managed = list(paginate(client, 'list_policies', 'Policies', Scope='AWS', OnlyAttached=True))
+    documents = _policy_documents(client, local + aws_managed, cache)
+    if cache.autosave:
+        cache.save()
+    logging.info(f"IAM: {len(principals)} principals, {len(documents)} managed policies "
+                 f"({cache.hits} cached, {cache.misses} fetched)")
+    groups = {p['Name']: p['Arn'] for p in principals if p['Type'] == 'group'}
+    account = partition = None
+    if principals:
+        # arn:<partition>:iam::<account>:<type>/<name>
+        parts = principals[0]['Arn'].split(':')
+        partition, account = parts[1], parts[4]
+    return {
+        'UsersCount': sum(1 for p in principals if p['Type'] == 'user'),
+        'GroupsCount': len(groups),
+        'RolesCount': sum(1 for p in principals if p['Type'] == 'role'),
+        'ManagedPoliciesCount': len(local),
+        'Account': account,
+        'Partition': partition,
+        'Principals': {p['Arn']: {'Type': p['Type'], 'Name': p['Name'],
+                                  'Groups': [groups[g] for g in p['Groups'] if g in groups]}
+                       for p in principals},
+        'Access': build_access(principals, documents),
+    }
+
+
+def _regex(pattern):
+    return re.compile(re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.'))
+
+
+# Resource ARN -> principals lookups over an iam dict's Access patterns. Resource
+# "*" is left out: it names everything, so it says nothing about one resource.
+class AccessIndex:
+    def __init__(self, iam):
+        self.exact = {}
+        self.wildcards = {}
+        for pattern, principals in (iam.get('Access') or {}).items():
+            if pattern == '*':
+                continue
+            if '*' in pattern or '?' in pattern:
+                # Bucketed by service when the pattern names one
+                service = pattern.split(':')[2] if pattern.count(':') >= 2 else '*'
+                key = service if '*' not in service and '?' not in service else '*'
+                self.wildcards.setdefault(key, []).append((_regex(pattern), principals))
+            else:
+                self.exact[pattern] = principals
+        self._sorted = sorted(self.exact)
+
+    # Principals allowed on arn or on something inside it (arn/...)
+    def principals(self, arn):
+        found = set(self.exact.get(arn, ()))
+        start = bisect.bisect_left(self._sorted, arn + '/')
+        for key in self._sorted[start:]:
+            if not key.startswith(arn + '/'):
+                break
+            found.update(self.exact[key])
+        service = arn.split(':')[2] if arn.count(':') >= 2 else ''
+        for regex, principals in self.wildcards.get(service, []) + self.wildcards.get('*', []):
+            if regex.fullmatch(arn) or regex.fullmatch(arn + '/x'):
+                found.update(principals)
+        return sorted(found)
@@ -0,0 +1,417 @@
+"""
+inventory.py
+
+Streaming NDJSON inventory format for createinfradiagram.py.
+
+Each line is one JSON record:
+    {"region": "eu-west-1"}                                          region marker
+    {"region": "eu-west-1", "service": "ec2", "attributes": {...}}   one resource
+    {"region": null, "service": "s3", "attributes": {...}}           global resource
+    {"region": "eu-west-1", "service": "ec2", "status": "partial"}   scan job status
+
+Records are written as each scan job finishes, so the scan never holds the whole
+account in memory and a crash keeps everything scanned so far. load_ndjson()
+rebuilds the nested `results` dict that build_graph expects.
+
+Resources are held as compact records (Ec2Record, LambdaRecord, ...): classes
+with __slots__ instead of a dict per resource, with repeated values such as
+instance type, state, runtime and VPC / subnet ids interned, so each string is
+stored once per process rather than once per resource. Records are read-only
+mappings with the same keys the dicts had (record['InstanceId'],
+record.get('VpcId'), dict(record)), and json_default serialises them to the
+same JSON shape.
+
+Inventory wraps a results dict with per-region indexes (by VpcId, SubnetId and
+service) so consumers like build_graph do constant-time lookups instead of
+rescanning every resource list per VPC.
+"""
+
+import json
+import sys
+from collections import defaultdict
+from collections.abc import Mapping
+
+
+def _intern(value):
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(v) if isinstance(v, str) else v for v in value]
+    return value
+
+
+# A resource: KEYS are its JSON keys, in order, and INTERN the slots whose values
+# repeat across resources. Subclasses list their storage in __slots__.
+class Record(Mapping):
+    __slots__ = ()
+    KEYS = ()
+    INTERN = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            value = values.get(name)
+            setattr(self, name, _intern(value) if name in self.INTERN else value)
+
+    @classmethod
+    def from_dict(cls, attrs):
+        return cls(**attrs)
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    # Only existing keys can be updated (e.g. an instance's State)
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, _intern(value) if key in self.INTERN else value)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.KEYS}
+
+
+class Ec2Record(Record):
+    __slots__ = KEYS = ('InstanceId', 'State', 'InstanceType', 'VpcId', 'SubnetId', 'Name')
+    INTERN = ('State', 'InstanceType', 'VpcId', 'SubnetId')
+
+
+class RdsRecord(Record):
+    __slots__ = KEYS = ('DBInstanceIdentifier', 'Engine', 'DBInstanceClass', 'VpcId', 'Status', 'MultiAZ')
+    INTERN = ('Engine', 'DBInstanceClass', 'VpcId', 'Status')
+
+
+# Keeps only the VPC id, subnets and security groups of the function's VpcConfig;
+# VpcConfig is rebuilt from them, in the shape AWS returns even for functions
+# outside a VPC (empty lists and VpcId '')
+class LambdaRecord(Record):
+    __slots__ = ('FunctionName', 'Runtime', 'VpcId', 'SubnetIds', 'SecurityGroupIds')
+    KEYS = ('FunctionName', 'Runtime', 'VpcConfig')
+    INTERN = ('Runtime', 'VpcId', 'SubnetIds', 'SecurityGroupIds')
+
+    @classmethod
+    def from_dict(cls, attrs):
+        vpc = attrs.get('VpcConfig') or {}
+        return cls(FunctionName=attrs.get('FunctionName'), Runtime=attrs.get('Runtime'),
+                   VpcId=vpc.get('VpcId') or None, SubnetIds=vpc.get('SubnetIds') or None,
+                   SecurityGroupIds=vpc.get('SecurityGroupIds') or None)
+
+    @property
+    def VpcConfig(self):
+        return {'SubnetIds': self.SubnetIds or [], 'SecurityGroupIds': self.SecurityGroupIds or [],
+                'VpcId': self.VpcId or ''}
+
+    def __setitem__(self, key, value):
+        if key == 'VpcConfig':
+            other = LambdaRecord.from_dict({'VpcConfig': value})
+            self.VpcId, self.SubnetIds, self.SecurityGroupIds = other.VpcId, other.SubnetIds, other.SecurityGroupIds
+        else:
+            super().__setitem__(key, value)
+
+
+class EksRecord(Record):
+    __slots__ = KEYS = ('Name', 'Version', 'VpcId', 'Subnets')
+    INTERN = ('Version', 'VpcId', 'Subnets')
+
+
+class EcsRecord(Record):
+    __slots__ = KEYS = ('ClusterArn', 'ClusterName', 'Status', 'RegisteredContainerInstancesCount')
+    INTERN = ('Status',)
+
+
+class Elbv2Record(Record):
+    __slots__ = KEYS = ('LoadBalancerName', 'Type', 'Scheme', 'VpcId', 'DNSName')
+    INTERN = ('Type', 'Scheme', 'VpcId')
+
+
+# A VPC's entry in results['regions'][r]['vpcs'] (keyed by VpcId)
+class VpcRecord(Record):
+    __slots__ = KEYS = ('CidrBlock', 'IsDefault', 'Tags', 'Subnets')
+
+    @classmethod
+    def from_dict(cls, attrs):
+        subnets = [s if isinstance(s, Record) else make_record('subnets', s) for s in attrs.get('Subnets') or []]
+        return cls(**dict(attrs, Subnets=subnets))
+
+
+class SubnetRecord(Record):
+    __slots__ = KEYS = ('SubnetId', 'CidrBlock', 'AvailabilityZone')
+    INTERN = ('AvailabilityZone',)
+
+
+class BucketRecord(Record):
+    __slots__ = KEYS = ('Name', 'CreationDate')
+
+
+class DynamodbRecord(Record):
+    __slots__ = KEYS = ('TableName', 'TableStatus', 'BillingMode', 'ItemCount', 'TableSizeBytes')
+    INTERN = ('TableStatus', 'BillingMode')
+
+
+class SqsRecord(Record):
+    __slots__ = KEYS = ('QueueUrl', 'QueueArn', 'FifoQueue', 'ApproximateNumberOfMessages')
+
+
+class SnsRecord(Record):
+    __slots__ = KEYS = ('TopicArn',)
+
+
+class ElastiCacheRecord(Record):
+    __slots__ = KEYS = ('CacheClusterId', 'Engine', 'EngineVersion', 'CacheNodeType', 'CacheClusterStatus',
+                        'NumCacheNodes', 'CacheSubnetGroupName')
+    INTERN = ('Engine', 'EngineVersion', 'CacheNodeType', 'CacheClusterStatus', 'CacheSubnetGroupName')
+
+
+class ApiGatewayRecord(Record):
+    __slots__ = KEYS = ('Id', 'Name', 'EndpointTypes')
+    INTERN = ('EndpointTypes',)
+
+
+class CloudFrontRecord(Record):
+    __slots__ = KEYS = ('Id', 'DomainName', 'Status', 'Enabled', 'Aliases', 'Origins')
+    INTERN = ('Status',)
+
+
+RECORD_TYPES = {
+    'ec2': Ec2Record,
+    'rds': RdsRecord,
+    'lambda': LambdaRecord,
+    'eks': EksRecord,
+    'ecs': EcsRecord,
+    'elbv2': Elbv2Record,
+    'vpcs': VpcRecord,
+    'subnets': SubnetRecord,
+    's3': BucketRecord,
+    'dynamodb': DynamodbRecord,
+    'sqs': SqsRecord,
+    'sns': SnsRecord,
+    'elasticache': ElastiCacheRecord,
+    'apigateway': ApiGatewayRecord,
+    'cloudfront': CloudFrontRecord,
+}
+
+
+# Record for a service's attributes dict; attributes the record type has no slot
+# for (or services without a record type) stay a plain dict
+def make_record(service, attrs):
+    cls = RECORD_TYPES.get(service)
+    if cls is None or isinstance(attrs, Record) or not set(attrs) <= set(cls.KEYS):
+        return attrs
+    return cls.from_dict(attrs)
+
+
+# make_record over one service's scan output (a list, or the vpcs dict)
+def make_records(service, data):
+    if service == 'vpcs':
+        return {vpc_id: make_record('vpcs', info) for vpc_id, info in data.items()}
+    if isinstance(data, list):
+        return [make_record(service, item) for item in data]
+    return data
+
+
+# Convert a results dict read back from JSON to records, in place
+def to_records(results):
+    for data in results['regions'].values():
+        for service in data:
+            data[service] = make_records(service, data[service])
+    for service in results['global']:
+        results['global'][service] = make_records(service, results['global'][service])
+    return results
+
+
+# json.dump(..., default=json_default) writes records as the dicts they stand for
+def json_default(value):
+    if isinstance(value, Record):
+        return value.as_dict()
+    return str(value)
+
+
+class InventoryWriter:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._fh = open(path, "w")
+
+    def _write(self, record):
+        self._fh.write(json.dumps(record, default=json_default))
+        self._fh.write("\n")
+
+    def region(self, region):
+        self._write({'region': region})
+        self._fh.flush()
+
+    # Write everything one scan job produced, then flush so the batch is durable
+    def write_service(self, region, service, data, status='complete'):
+        self._write({'region': region, 'service': service, 'status': status})
+        if service == 'vpcs':
+            # vpcs is keyed by VpcId in results; fold the key into the record
+            for vpc_id, info in data.items():
+                self._write({'region': region, 'service': service, 'attributes': dict(info, VpcId=vpc_id)})
+                self.count += 1
+        elif isinstance(data, dict):
+            # Summary services (IAM counts) are a single record
+            if data:
+                self._write({'region': region, 'service': service, 'attributes': data})
+                self.count += 1
+        else:
+            for item in data:
+                self._write({'region': region, 'service': service, 'attributes': item})
+                self.count += 1
+        self._fh.flush()
+
+    def close(self):
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def new_region():
+    return {
+        'ec2': [], 'rds': [], 'lambda': [], 'eks': [], 'ecs': [], 'elbv2': [],
+        'dynamodb': [], 'sqs': [], 'sns': [], 'elasticache': [], 'apigateway': [],
+        'vpcs': {}
+    }
+
+
+def new_global():
+    return {'s3': [], 'iam': {}, 'cloudfront': []}
+
+
+# Record that a scanner hit an error and its data may be incomplete
+def mark_partial(results, region, service):
+    results.setdefault('status', {}).setdefault(region or 'global', {})[service] = 'partial'
+
+
+# records=False keeps resources as plain dicts
+def add_record(results, record, records=True):
+    region = record.get('region')
+    service = record.get('service')
+    if service is None:
+        results['regions'].setdefault(region, new_region())
+        return
+    if 'status' in record:
+        results['status'].setdefault(region or 'global', {})[service] = record['status']
+        return
+    attrs = record.get('attributes') or {}
+    if region is None:
+        target = results['global']
+    else:
+        target = results['regions'].setdefault(region, new_region())
+    if service == 'vpcs':
+        attrs = dict(attrs)
+        vpc_id = attrs.pop('VpcId')
+        target['vpcs'][vpc_id] = make_record('vpcs', attrs) if records else attrs
+    elif isinstance(target.get(service), dict):
+        target[service].update(attrs)
+    else:
+        target.setdefault(service, []).append(make_record(service, attrs) if records else attrs)
+
+
+# Rebuild the scan_account() results shape from an NDJSON stream. A truncated last
+# line (e.g. the scan was killed mid-write) is ignored.
+def load_ndjson(path, records=True):
+    results = {'regions': {}, 'global': new_global(), 'status': {}}
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            add_record(results, record, records)
+    return results
+
+
+# Any saved inventory: aws_resources.json, an NDJSON stream (--stream) or a
+# SQLite store (--db). records=False keeps resources as plain dicts.
+def load_inventory(path, records=True):
+    if path.endswith('.ndjson'):
+        return load_ndjson(path, records)
+    if path.endswith('.db'):
+        from inventorystore import InventoryStore
+        with InventoryStore(path) as store:
+            return store.load()
+    with open(path) as fh:
+        results = json.load(fh)
+    return to_records(results) if records else results
+
+
+# Where each service keeps its VPC / subnet membership
+def _vpc_of(service, item):
+    if service == 'lambda':
+        return (item.get('VpcConfig') or {}).get('VpcId') or None
+    return item.get('VpcId')
+
+
+def _subnets_of(service, item):
+    if service == 'lambda':
+        return (item.get('VpcConfig') or {}).get('SubnetIds') or []
+    if service == 'eks':
+        return item.get('Subnets') or []
+    subnet = item.get('SubnetId')
+    return [subnet] if subnet else []
+
+
+class RegionIndex:
+    def __init__(self, data):
+        self.data = data
+        self._by_vpc = defaultdict(lambda: defaultdict(list))
+        self._by_subnet = defaultdict(lambda: defaultdict(list))
+        self._subnet_vpc = {}
+        for vpc_id, vpc in data.get('vpcs', {}).items():
+            for subnet in vpc.get('Subnets', []):
+                self._subnet_vpc[subnet['SubnetId']] = vpc_id
+        for service, items in data.items():
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                vpc_id = _vpc_of(service, item)
+                if vpc_id:
+                    self._by_vpc[service][vpc_id].append(item)
+                for subnet_id in _subnets_of(service, item):
+                    self._by_subnet[service][subnet_id].append(item)
+
+    def of_type(self, service):
+        items = self.data.get(service)
+        return items if isinstance(items, list) else []
+
+    def in_vpc(self, service, vpc_id):
+        return self._by_vpc[service].get(vpc_id, [])
+
+    def in_subnet(self, service, subnet_id):
+        return self._by_subnet[service].get(subnet_id, [])
+
+    def vpc_of_subnet(self, subnet_id):
+        return self._subnet_vpc.get(subnet_id)
+
+
+class Inventory:
+    def __init__(self, results):
+        self.results = results
+        self._regions = {}
+
+    def regions(self):
+        return list(self.results['regions'])
+
+    # Indexes are built on first use, once per region
+    def region(self, name):
+        index = self._regions.get(name)
+        if index is None:
+            index = RegionIndex(self.results['regions'][name])
+            self._regions[name] = index
+        return index
@@ -0,0 +1,91 @@
+"""
+inventorycache.py
+
+On-disk cache of scan results for createinfradiagram.py, one JSON file per
+(account, region, service):
+
+    .inventory_cache/<account>/<region|global>/<service>.json
+
+Each entry stores when it was scanned; an entry older than the service's TTL is
+stale and gets rescanned. Slow-changing global services (IAM, S3) keep for a day,
+while EC2 is only trusted for a few minutes.
+"""
+
+import json
+import os
+import time
+
+from inventory import json_default
+
+CACHE_DIR = ".inventory_cache"
+
+# Seconds an entry stays fresh, per service
+DEFAULT_TTL = 900
+CACHE_TTLS = {
+    'iam': 86400,
+    's3': 86400,
+    'vpcs': 3600,
+    'eks': 3600,
+    'ec2': 300,
+    'rds': 900,
+    'lambda': 900,
+    'ecs': 900,
+    'elbv2': 900,
+    # Region list and per-region occupancy probe (see createinfradiagram.probe_regions)
+    '_regions': 86400,
+    '_occupancy': 3600,
+}
+
+
+class InventoryCache:
+    def __init__(self, account, path=CACHE_DIR, ttls=None):
+        self.account = account
+        self.path = path
+        self.ttls = dict(CACHE_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.hits = 0
+        self.misses = 0
+
+    def _file(self, region, service):
+        return os.path.join(self.path, self.account, region or 'global', f"{service}.json")
+
+    def ttl(self, service):
+        return self.ttls.get(service, DEFAULT_TTL)
+
+    # Return the cached data, or None when missing, unreadable or stale
+    def get(self, region, service, now=None):
+        path = self._file(region, service)
+        try:
+            with open(path) as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        now = time.time() if now is None else now
+        if now - entry.get('scanned_at', 0) > self.ttl(service):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.get('data')
+
+    def put(self, region, service, data, now=None):
+        path = self._file(region, service)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'scanned_at': time.time() if now is None else now, 'data': data}
+        # Write then rename so a crash never leaves a half-written entry
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as fh:
+            json.dump(entry, fh, default=json_default)
+        os.replace(tmp, path)
+
+
+# Parse "service=seconds" CLI overrides into a ttls dict
+def parse_ttls(values):
+    ttls = {}
+    for value in values or []:
+        service, _, seconds = value.partition('=')
+        if not seconds:
+            raise ValueError(f"Bad TTL '{value}', expected service=seconds")
+        ttls[service.strip()] = int(seconds)
+    return ttls
@@ -0,0 +1,322 @@
+"""
+inventorystore.py
+
+SQLite inventory backend for createinfradiagram.py.
+
+Each service gets its own table with one column per inventory attribute, plus
+the region; VPC subnets get their own table. region, VpcId, SubnetId and the
+state / status columns are indexed, so questions like "which m5 instances are
+stopped in eu-west-1" are a single indexed query instead of loading
+aws_resources.json:
+
+    python inventorystore.py query ec2 --region eu-west-1 --where State=stopped --where InstanceType=m5.%
+
+InventoryStore has the same region() / write_service() interface as
+inventory.InventoryWriter, so scan_account can write straight into it (--db).
+Each scan job's rows replace that (region, service)'s previous rows in one
+transaction. load() rebuilds the results dict build_graph expects, optionally
+for a single region or VPC only.
+
+Run:
+    python inventorystore.py import aws_resources.json [--db aws_resources.db]
+    python inventorystore.py query SERVICE [--region R] [--vpc VPC_ID] [--where COLUMN=VALUE] [--count]
+"""
+
+import argparse
+import json
+import sqlite3
+
+from inventory import load_ndjson, new_region, new_global, make_record, json_default
+
+STORE_DB = "aws_resources.db"
+
+# Table -> inventory attributes stored as columns, in record order
+TABLES = {
+    'ec2': ['InstanceId', 'State', 'InstanceType', 'VpcId', 'SubnetId', 'Name'],
+    'rds': ['DBInstanceIdentifier', 'Engine', 'DBInstanceClass', 'VpcId', 'Status', 'MultiAZ'],
+    'lambda': ['FunctionName', 'Runtime', 'VpcConfig', 'VpcId'],
+    'eks': ['Name', 'Version', 'VpcId', 'Subnets'],
+    'ecs': ['ClusterArn', 'ClusterName', 'Status', 'RegisteredContainerInstancesCount'],
+    'elbv2': ['LoadBalancerName', 'Type', 'Scheme', 'VpcId', 'DNSName'],
+    'vpcs': ['VpcId', 'CidrBlock', 'IsDefault', 'Tags'],
+    'subnets': ['SubnetId', 'VpcId', 'CidrBlock', 'AvailabilityZone'],
+    's3': ['Name', 'CreationDate'],
+    'dynamodb': ['TableName', 'TableStatus', 'BillingMode', 'ItemCount', 'TableSizeBytes'],
+    'sqs': ['QueueUrl', 'QueueArn', 'FifoQueue', 'ApproximateNumberOfMessages'],
+    'sns': ['TopicArn'],
+    'elasticache': ['CacheClusterId', 'Engine', 'EngineVersion', 'CacheNodeType', 'CacheClusterStatus',
+                    'NumCacheNodes', 'CacheSubnetGroupName'],
+    'apigateway': ['Id', 'Name', 'EndpointTypes'],
+    'cloudfront': ['Id', 'DomainName', 'Status', 'Enabled', 'Aliases', 'Origins'],
+}
+# Tables of account-wide services (stored with a NULL region)
+GLOBAL_TABLES = ['s3', 'cloudfront']
+# Columns holding lists / dicts (stored as JSON text) and booleans (stored as 0/1)
+JSON_COLUMNS = {'VpcConfig', 'Subnets', 'Tags', 'EndpointTypes', 'Aliases', 'Origins'}
+BOOL_COLUMNS = {'MultiAZ', 'IsDefault', 'FifoQueue', 'Enabled'}
+# Columns filled in for indexing that aren't part of the record itself
+DERIVED_COLUMNS = {
+    ('lambda', 'VpcId'): lambda record: (record.get('VpcConfig') or {}).get('VpcId') or None,
+}
+INDEXED_COLUMNS = ['region', 'VpcId', 'SubnetId', 'State', 'Status']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS regions (region TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS status (scope TEXT, service TEXT, status TEXT, PRIMARY KEY (scope, service));
+CREATE TABLE IF NOT EXISTS iam (attributes TEXT);
+CREATE TABLE IF NOT EXISTS resources (region TEXT, service TEXT, attributes TEXT);
+CREATE INDEX IF NOT EXISTS idx_resources_region ON resources (region, service);
+"""
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _sql_value(column, value):
+    if column in JSON_COLUMNS:
+        return json.dumps(value, default=json_default)
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def _py_value(column, value):
+    if value is None:
+        return None
+    if column in JSON_COLUMNS:
+        return json.loads(value)
+    if column in BOOL_COLUMNS:
+        return bool(value)
+    return value
+
+
+def _where(conditions):
+    if not conditions:
+        return "", []
+    clauses = []
+    params = []
+    for column, value in conditions:
+        if isinstance(value, str) and '%' in value:
+            clauses.append(f"{_quote(column)} LIKE ?")
+        else:
+            clauses.append(f"{_quote(column)} IS ?")
+        params.append(value)
+    return " WHERE " + " AND ".join(clauses), params
+
+
+class InventoryStore:
+    def __init__(self, path=STORE_DB):
+        self.path = path
+        self.count = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            for table, columns in TABLES.items():
+                # _extra keeps any attributes without a column, so nothing is lost
+                cols = ", ".join(_quote(c) for c in ['region'] + columns + ['_extra'])
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_quote(table)} ({cols})")
+                for column in INDEXED_COLUMNS:
+                    if column == 'region' or column in columns:
+                        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(f'idx_{table}_{column}')} "
+                                          f"ON {_quote(table)} ({_quote(column)})")
+
+    def _row(self, table, region, record):
+        row = [region]
+        for column in TABLES[table]:
+            derive = DERIVED_COLUMNS.get((table, column))
+            row.append(_sql_value(column, derive(record) if derive else record.get(column)))
+        extra = {k: v for k, v in record.items() if k not in TABLES[table]}
+        row.append(json.dumps(extra, default=json_default) if extra else None)
+        return row
+
+    def _insert(self, table, rows):
+        marks = ", ".join("?" * (len(TABLES[table]) + 2))
+        self.conn.executemany(f"INSERT INTO {_quote(table)} VALUES ({marks})", rows)
+        self.count += len(rows)
+
+    def region(self, region):
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO regions VALUES (?)", (region,))
+
+    # Replace everything stored for (region, service) with one scan job's output,
+    # in a single transaction
+    def write_service(self, region, service, data, status='complete'):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO status VALUES (?, ?, ?)", (region or 'global', service, status))
+            if region is not None:
+                self.conn.execute("INSERT OR IGNORE INTO regions VALUES (?)", (region,))
+            if service == 'vpcs':
+                self.conn.execute("DELETE FROM vpcs WHERE region IS ?", (region,))
+                self.conn.execute("DELETE FROM subnets WHERE region IS ?", (region,))
+                # Subnets live in their own table; load() puts them back on the VPC
+                self._insert('vpcs', [self._row('vpcs', region, dict({k: v for k, v in info.items() if k != 'Subnets'},
+                                                                     VpcId=vpc_id))
+                                      for vpc_id, info in data.items()])
+                self._insert('subnets', [self._row('subnets', region, dict(subnet, VpcId=vpc_id))
+                                         for vpc_id, info in data.items() for subnet in info.get('Subnets', [])])
+            elif service == 'iam':
+                self.conn.execute("DELETE FROM iam")
+                if data:
+                    self.conn.execute("INSERT INTO iam VALUES (?)", (json.dumps(data, default=json_default),))
+            elif service in TABLES:
+                self.conn.execute(f"DELETE FROM {_quote(service)} WHERE region IS ?", (region,))
+                self._insert(service, [self._row(service, region, item) for item in data])
+            else:
+                # Services without a table of their own
+                self.conn.execute("DELETE FROM resources WHERE region IS ? AND service = ?", (region, service))
+                items = data if isinstance(data, list) else [data]
+                self.conn.executemany("INSERT INTO resources VALUES (?, ?, ?)",
+                                      [(region, service, json.dumps(item, default=json_default)) for item in items])
+
+    # Store a whole results dict (e.g. an existing aws_resources.json)
+    def write_results(self, results):
+        for region, data in results['regions'].items():
+            self.region(region)
+            for service, items in data.items():
+                self.write_service(region, service, items, results.get('status', {}).get(region, {}).get(service, 'complete'))
+        for service, items in results['global'].items():
+            self.write_service(None, service, items, results.get('status', {}).get('global', {}).get(service, 'complete'))
+
+    def _select(self, table, conditions=()):
+        columns = [c for c in TABLES[table] if (table, c) not in DERIVED_COLUMNS]
+        cols = ", ".join(_quote(c) for c in ['region'] + columns + ['_extra'])
+        where, params = _where(conditions)
+        for row in self.conn.execute(f"SELECT {cols} FROM {_quote(table)}{where} ORDER BY rowid", params):
+            record = {c: _py_value(c, v) for c, v in zip(columns, row[1:-1])}
+            if row[-1]:
+                record.update(json.loads(row[-1]))
+            yield row[0], record
+
+    def regions(self):
+        return [r for (r,) in self.conn.execute("SELECT region FROM regions ORDER BY rowid")]
+
+    # [(region, [vpc ids])] in scan order, for drill-down diagrams
+    def region_vpcs(self):
+        vpcs = {region: [] for region in self.regions()}
+        for region, vpc_id in self.conn.execute("SELECT region, VpcId FROM vpcs ORDER BY rowid"):
+            vpcs.setdefault(region, []).append(vpc_id)
+        return list(vpcs.items())
+
+    # Rebuild the scan_account() results shape, for every region or only `region`
+    # (and only the resources in `vpc_id` within it)
+    def load(self, region=None, vpc_id=None, include_global=True):
+        results = {'regions': {}, 'global': new_global(), 'status': {}}
+        regions = [region] if region else self.regions()
+        for r in regions:
+            results['regions'][r] = new_region()
+        scope = [('region', region)] if region else []
+        if vpc_id:
+            scope.append(('VpcId', vpc_id))
+        for r, record in self._select('vpcs', scope):
+            vid = record.pop('VpcId')
+            results['regions'].setdefault(r, new_region())['vpcs'][vid] = make_record('vpcs', dict(record, Subnets=[]))
+        for r, record in self._select('subnets', scope):
+            vpc = results['regions'].get(r, {}).get('vpcs', {}).get(record.pop('VpcId'))
+            if vpc is not None:
+                vpc['Subnets'].append(make_record('subnets', record))
+        for table, columns in TABLES.items():
+            if table in ('vpcs', 'subnets') or table in GLOBAL_TABLES or (vpc_id and 'VpcId' not in columns):
+                continue
+            for r, record in self._select(table, scope):
+                if r is not None:
+                    results['regions'].setdefault(r, new_region())[table].append(make_record(table, record))
+        if not vpc_id:
+            where, params = _where(scope)
+            for r, service, attributes in self.conn.execute(
+                    f"SELECT region, service, attributes FROM resources{where} ORDER BY rowid", params):
+                if r is not None:
+                    results['regions'].setdefault(r, new_region()).setdefault(service, []).append(
+                        make_record(service, json.loads(attributes)))
+        if include_global:
+            for table in GLOBAL_TABLES:
+                results['global'][table] = [make_record(table, record) for _, record in self._select(table)]
+            row = self.conn.execute("SELECT attributes FROM iam").fetchone()
+            results['global']['iam'] = json.loads(row[0]) if row else {}
+            for service, attributes in self.conn.execute(
+                    "SELECT service, attributes FROM resources WHERE region IS NULL ORDER BY rowid"):
+                results['global'].setdefault(service, []).append(make_record(service, json.loads(attributes)))
+        scopes = set(results['regions']) | ({'global'} if include_global else set())
+        for s, service, status in self.conn.execute("SELECT scope, service, status FROM status ORDER BY rowid"):
+            if s in scopes:
+                results['status'].setdefault(s, {})[service] = status
+        return results
+
+    # Records of one service matching every (column, value) condition; a value
+    # containing % is matched with LIKE. Each record carries its region.
+    def query(self, service, region=None, vpc_id=None, where=()):
+        if service not in TABLES:
+            raise ValueError(f"Unknown service '{service}', expected one of: {', '.join(TABLES)}")
+        conditions = list(where)
+        for column, _ in conditions:
+            if column not in TABLES[service]:
+                raise ValueError(f"Unknown column '{column}' for {service}, expected one of: {', '.join(TABLES[service])}")
+        if region:
+            conditions.append(('region', region))
+        if vpc_id:
+            if 'VpcId' not in TABLES[service]:
+                raise ValueError(f"{service} resources aren't placed in a VPC")
+            conditions.append(('VpcId', vpc_id))
+        for r, record in self._select(service, conditions):
+            yield dict(record, region=r)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_where(values):
+    conditions = []
+    for value in values or []:
+        column, sep, match = value.partition('=')
+        if not sep:
+            raise ValueError(f"Bad condition '{value}', expected COLUMN=VALUE")
+        conditions.append((column.strip(), match))
+    return conditions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQLite store for the AWS inventory.")
+    parser.add_argument('--db', default=STORE_DB, help=f"Store path (default: {STORE_DB})")
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help="Load an aws_resources.json / .ndjson file into the store")
+    imp.add_argument('path')
+    query = sub.add_parser('query', help="List resources of one service, e.g. query ec2 --where State=stopped")
+    query.add_argument('service', choices=list(TABLES))
+    query.add_argument('--region')
+    query.add_argument('--vpc', help="Only resources in this VPC")
+    query.add_argument('--where', action='append', metavar='COLUMN=VALUE',
+                       help="Match a column exactly, or with LIKE if VALUE contains %% (repeatable)")
+    query.add_argument('--count', action='store_true', help="Only print the number of matches")
+    args = parser.parse_args(argv)
+
+    with InventoryStore(args.db) as store:
+        if args.command == 'import':
+            if args.path.endswith('.ndjson'):
+                results = load_ndjson(args.path)
+            else:
+                with open(args.path) as fh:
+                    results = json.load(fh)
+            store.write_results(results)
+            print(f"Imported {store.count} resources into {args.db}")
+            return
+        try:
+            matches = store.query(args.service, args.region, args.vpc, parse_where(args.where))
+            if args.count:
+                print(sum(1 for _ in matches))
+            else:
+                for record in matches:
+                    print(json.dumps(record, default=json_default))
+        except ValueError as e:
+            parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
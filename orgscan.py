@@ -0,0 +1,246 @@
+"""
+orgscan.py
+
+Organisation mode for createinfradiagram.py: scan many AWS accounts in one run.
+
+For each member account the scanner assumes a role (OrganizationAccountAccessRole
+by default) and runs the normal scan_account with those credentials. Assumed-role
+credentials are cached per worker process and refreshed by botocore shortly
+before they expire, so long scans don't fail halfway. Accounts are scanned in
+parallel over a process pool; processes x per-account scan workers is capped by
+--max-concurrency.
+
+Outputs, under --out-dir (default org_inventory/):
+    <account>/aws_resources.json    per-account inventory
+    aws_resources.json              merged inventory; regions are keyed
+                                    "<account>/<region>" so the usual diagram
+                                    and drill-down code works unchanged
+    accounts.json                   per-account scan status
+    overview.pdf                    org-wide overview diagram
+
+Run:
+    python orgscan.py --accounts 111111111111 222222222222 [--role-name ROLE]
+    python orgscan.py --organization [--skip-account 123456789012]
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import awsclients
+import createinfradiagram as cid
+import diagramrender
+import iamgraph
+from awsclients import get_client
+from inventory import json_default, new_global
+from inventorycache import InventoryCache, CACHE_DIR, parse_ttls
+from pagination import paginate
+from ratelimit import LIMITERS
+
+OUT_DIR = "org_inventory"
+ROLE_NAME = "OrganizationAccountAccessRole"
+SESSION_NAME = "aws-architecture-exporter"
+SESSION_DURATION = 3600  # seconds per assumed-role session
+ORG_PROCESSES = min(os.cpu_count() or 2, 8)
+# Scan jobs in flight across every process
+MAX_CONCURRENCY = 32
+
+# (account, role) -> boto3 session, per process
+_SESSIONS = {}
+# IAM policy documents fetched by this process; shared by the accounts it scans
+# and handed back to the parent, which saves them (iamgraph.POLICY_CACHE)
+_POLICIES = None
+
+
+# Active member accounts of the organisation the current credentials manage
+def list_org_accounts():
+    org = get_client('organizations')
+    return [a['Id'] for a in paginate(org, 'list_accounts', 'Accounts') if a.get('Status') == 'ACTIVE']
+
+
+# boto3 session with the role's credentials in `account`. The credentials are
+# cached and refreshed by botocore before they expire (it calls refresh again
+# inside its advisory window), so the session stays usable for long scans.
+def assume_role_session(account, role_name=ROLE_NAME, base_profile=None, external_id=None,
+                        duration=SESSION_DURATION):
+    key = (account, role_name)
+    session = _SESSIONS.get(key)
+    if session is not None:
+        return session
+    import boto3.session
+    from botocore.credentials import RefreshableCredentials
+    from botocore.session import get_session
+    sts = boto3.session.Session(profile_name=base_profile).client('sts')
+    params = {'RoleArn': f"arn:aws:iam::{account}:role/{role_name}",
+              'RoleSessionName': SESSION_NAME, 'DurationSeconds': duration}
+    if external_id:
+        params['ExternalId'] = external_id
+
+    def refresh():
+        creds = sts.assume_role(**params)['Credentials']
+        logging.debug(f"Assumed {role_name} in {account} until {creds['Expiration']}")
+        return {
+            'access_key': creds['AccessKeyId'],
+            'secret_key': creds['SecretAccessKey'],
+            'token': creds['SessionToken'],
+            'expiry_time': creds['Expiration'].isoformat(),
+        }
+
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(), refresh_using=refresh, method='sts-assume-role')
+    botocore_session = get_session()
+    botocore_session._credentials = credentials
+    session = boto3.session.Session(botocore_session=botocore_session)
+    _SESSIONS[key] = session
+    return session
+
+
+# Runs in a worker process: scan one account with the assumed role and write its
+# inventory to <out_dir>/<account>/. Returns (account, results or None, summary,
+# IAM policy cache entries fetched for it).
+def scan_member(account, role_name, out_dir, regions=None, workers=cid.SCAN_WORKERS, probe=False,
+                cache_dir=None, ttls=None, base_profile=None, external_id=None):
+    global _POLICIES
+    start = time.perf_counter()
+    summary = {'status': 'ok'}
+    if _POLICIES is None:
+        _POLICIES = iamgraph.PolicyCache(autosave=False)
+        iamgraph.use_policy_cache(_POLICIES)
+    try:
+        session = assume_role_session(account, role_name, base_profile, external_id)
+        # Clients and learned API rates belong to the previous account
+        awsclients.configure(session=session)
+        LIMITERS.clear()
+        cache = InventoryCache(account, cache_dir, ttls) if cache_dir else None
+        os.makedirs(os.path.join(out_dir, account), exist_ok=True)
+        results = cid.scan_account(regions, workers=workers, cache=cache, probe=probe,
+                                   out_json=os.path.join(out_dir, account, cid.OUT_JSON))
+        partial = [f"{scope}/{service}" for scope, services in results['status'].items()
+                   for service, status in services.items() if status == 'partial']
+        if partial:
+            summary['status'] = 'partial'
+            summary['partial'] = partial
+    except Exception as exc:
+        logging.warning(f"Scan of account {account} failed: {exc}")
+        results = None
+        summary = {'status': 'failed', 'error': str(exc)}
+    summary['seconds'] = round(time.perf_counter() - start, 1)
+    return account, results, summary, _POLICIES.take_added()
+
+
+# One results dict for the whole organisation: regions keyed "<account>/<region>",
+# global resources (S3 buckets, CloudFront distributions) concatenated, IAM
+# counts summed and IAM principals / access patterns combined (each region key
+# names its account, so no single Account is kept)
+def merge_inventories(per_account):
+    merged = {'regions': {}, 'global': new_global(), 'status': {}}
+    for account, results in per_account.items():
+        for region, data in results['regions'].items():
+            merged['regions'][f"{account}/{region}"] = data
+        for scope, services in results['status'].items():
+            merged['status'][f"{account}/{scope}"] = services
+        for service, items in results['global'].items():
+            if isinstance(items, list):
+                merged['global'].setdefault(service, []).extend(items)
+        iam = merged['global']['iam']
+        for key, value in (results['global'].get('iam') or {}).items():
+            if isinstance(value, int):
+                iam[key] = iam.get(key, 0) + value
+            elif key == 'Access':
+                # Patterns like "*" are shared between accounts
+                for pattern, principals in value.items():
+                    iam.setdefault('Access', {}).setdefault(pattern, []).extend(principals)
+            elif isinstance(value, dict):
+                iam.setdefault(key, {}).update(value)
+            elif key == 'Partition':
+                iam[key] = value
+    return merged
+
+
+def scan_organization(accounts, role_name=ROLE_NAME, out_dir=OUT_DIR, regions=None,
+                      processes=ORG_PROCESSES, max_concurrency=MAX_CONCURRENCY, probe=False,
+                      cache_dir=CACHE_DIR, ttls=None, base_profile=None, external_id=None):
+    processes = max(1, min(processes, len(accounts)))
+    workers = max(1, max_concurrency // processes)
+    logging.info(f"Scanning {len(accounts)} accounts over {processes} processes x {workers} scan workers")
+    os.makedirs(out_dir, exist_ok=True)
+    kwargs = dict(regions=regions, workers=workers, probe=probe, cache_dir=cache_dir, ttls=ttls,
+                  base_profile=base_profile, external_id=external_id)
+    per_account = {}
+    summaries = {}
+    policies = iamgraph.PolicyCache()
+
+    def collect(outcome):
+        account, results, summary, fetched = outcome
+        summaries[account] = summary
+        if results is not None:
+            per_account[account] = results
+        policies.merge(fetched)
+
+    from tqdm import tqdm
+    if processes == 1:
+        for account in tqdm(accounts, desc="Accounts"):
+            collect(scan_member(account, role_name, out_dir, **kwargs))
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(scan_member, account, role_name, out_dir, **kwargs) for account in accounts]
+            for fut in tqdm(as_completed(futures), total=len(futures), desc="Accounts"):
+                collect(fut.result())
+
+    policies.save()
+    # Merge in the order accounts were given, not completion order
+    merged = merge_inventories({a: per_account[a] for a in accounts if a in per_account})
+    with open(os.path.join(out_dir, cid.OUT_JSON), "w") as fh:
+        json.dump(merged, fh, indent=2, default=json_default)
+    with open(os.path.join(out_dir, "accounts.json"), "w") as fh:
+        json.dump({a: summaries[a] for a in accounts}, fh, indent=2)
+    failed = [a for a in accounts if summaries[a]['status'] == 'failed']
+    if failed:
+        logging.warning(f"{len(failed)} account(s) could not be scanned: {', '.join(failed)}")
+    return merged, summaries
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scan every account of an AWS organisation.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--accounts', nargs='+', metavar='ACCOUNT_ID', help="Account IDs to scan")
+    source.add_argument('--organization', action='store_true',
+                        help="Scan every active account listed by AWS Organizations")
+    parser.add_argument('--skip-account', action='append', default=[], metavar='ACCOUNT_ID',
+                        help="Leave this account out (repeatable)")
+    parser.add_argument('--role-name', default=ROLE_NAME, help=f"Role to assume in each account (default: {ROLE_NAME})")
+    parser.add_argument('--external-id', help="ExternalId for the role's trust policy")
+    parser.add_argument('--profile', help="Profile whose credentials assume the roles")
+    parser.add_argument('--regions', nargs='+', help="Regions to scan (default: all enabled regions)")
+    parser.add_argument('--processes', type=int, default=ORG_PROCESSES,
+                        help=f"Accounts scanned in parallel (default: {ORG_PROCESSES})")
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY,
+                        help=f"Scan jobs in flight across all accounts (default: {MAX_CONCURRENCY})")
+    parser.add_argument('--probe', action='store_true', help="Run the Tagging API occupancy probe first")
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and don't update the inventory cache")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help=f"Inventory cache directory (default: {CACHE_DIR})")
+    parser.add_argument('--ttl', action='append', metavar='SERVICE=SECONDS',
+                        help="Override a service's cache TTL (repeatable)")
+    parser.add_argument('--out-dir', default=OUT_DIR, help=f"Output directory (default: {OUT_DIR})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    awsclients.configure(profile=args.profile)
+    accounts = args.accounts or list_org_accounts()
+    accounts = [a for a in accounts if a not in set(args.skip_account)]
+    merged, summaries = scan_organization(
+        accounts, args.role_name, args.out_dir, args.regions, args.processes, args.max_concurrency,
+        probe=args.probe, cache_dir=None if args.no_cache else args.cache_dir, ttls=parse_ttls(args.ttl),
+        base_profile=args.profile, external_id=args.external_id)
+    rendered = diagramrender.render_job(cid.build_graph, 'overview', merged, {'lod': cid.OVERVIEW_LOD}, args.out_dir)
+    ok = sum(1 for s in summaries.values() if s['status'] != 'failed')
+    print(f"Scanned {ok}/{len(accounts)} accounts into {args.out_dir}; overview: {rendered['output']} ({rendered['status']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+pagination.py
+
+Pagination and batching helpers shared by the AWS scanners, so every list /
+describe call reads the whole inventory in as few round trips as possible:
+
+- pages() / paginate() follow each API's continuation token, asking for the
+  largest page size the API allows (PAGINATION). Response tokens may be dotted
+  paths into the page (CloudFront's DistributionList.NextMarker), and APIs
+  without a page size take None.
+- batched_describe() chunks identifier lists to the API's maximum batch size
+  (BATCH_LIMITS).
+- map_concurrently() runs per-item describes (e.g. EKS describe_cluster, which
+  only takes one name) over a small thread pool, each in a copy of the caller's
+  contextvars, so per-job context such as scantrace's job region follows the
+  work onto the pool's threads.
+
+All calls go through ratelimit.call_api, so they share the per-(service, region)
+limiter and retries.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from ratelimit import call_api
+
+# (service, operation) -> (request token, response token, page size param, max page size).
+# scannerregistry.py adds the operations its entries list.
+PAGINATION = {
+    ('ec2', 'describe_instances'): ('NextToken', 'NextToken', 'MaxResults', 1000),
+    ('ec2', 'describe_vpcs'): ('NextToken', 'NextToken', 'MaxResults', 1000),
+    ('ec2', 'describe_subnets'): ('NextToken', 'NextToken', 'MaxResults', 1000),
+    ('rds', 'describe_db_instances'): ('Marker', 'Marker', 'MaxRecords', 100),
+    ('lambda', 'list_functions'): ('Marker', 'NextMarker', 'MaxItems', 50),
+    ('eks', 'list_clusters'): ('nextToken', 'nextToken', 'maxResults', 100),
+    ('ecs', 'list_clusters'): ('nextToken', 'nextToken', 'maxResults', 100),
+    ('elbv2', 'describe_load_balancers'): ('Marker', 'NextMarker', 'PageSize', 400),
+    ('iam', 'list_users'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_roles'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_groups'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_groups_for_user'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_user_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_group_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_role_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_attached_user_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_attached_group_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'list_attached_role_policies'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('iam', 'get_account_authorization_details'): ('Marker', 'Marker', 'MaxItems', 1000),
+    ('s3', 'list_buckets'): ('ContinuationToken', 'ContinuationToken', 'MaxBuckets', 10000),
+    ('s3', 'list_objects_v2'): ('ContinuationToken', 'NextContinuationToken', 'MaxKeys', 1000),
+    ('organizations', 'list_accounts'): ('NextToken', 'NextToken', 'MaxResults', 20),
+    ('resourcegroupstaggingapi', 'get_resources'): ('PaginationToken', 'PaginationToken', 'ResourcesPerPage', 100),
+}
+
+# (service, operation) -> max identifiers accepted per call
+BATCH_LIMITS = {
+    ('ecs', 'describe_clusters'): 100,
+    ('ec2', 'describe_instances'): 1000,
+}
+
+# Threads per scanner for APIs that only describe one item per call
+DESCRIBE_WORKERS = 8
+
+
+def _service(client):
+    return client.meta.service_model.service_name
+
+
+# page['a']['b'] for path 'a.b'; None if any part is missing
+def _lookup(page, path):
+    for key in path.split('.'):
+        page = (page or {}).get(key)
+    return page
+
+
+# Yield every response page of operation, following its continuation token
+def pages(client, operation, **kwargs):
+    config = PAGINATION.get((_service(client), operation))
+    if config is None:
+        yield call_api(client, operation, **kwargs)
+        return
+    token_in, token_out, size_param, max_size = config
+    if size_param:
+        kwargs.setdefault(size_param, max_size)
+    while True:
+        page = call_api(client, operation, **kwargs)
+        yield page
+        token = _lookup(page, token_out)
+        if not token:
+            return
+        kwargs[token_in] = token
+
+
+# Yield every item under result_key across all pages
+def paginate(client, operation, result_key, **kwargs):
+    for page in pages(client, operation, **kwargs):
+        yield from page.get(result_key, [])
+
+
+def batched(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Describe ids in as few calls as the API allows: param=<chunk of ids> per call.
+# Explicit-id describes return everything in one response (and several APIs reject
+# a page size alongside ids), so chunks are not paginated.
+def batched_describe(client, operation, param, ids, result_key, **kwargs):
+    size = BATCH_LIMITS.get((_service(client), operation), 1)
+    for chunk in batched(ids, size):
+        yield from call_api(client, operation, **{param: chunk}, **kwargs).get(result_key, [])
+
+
+# fn(item) for every item over a thread pool; results come back in input order
+def map_concurrently(fn, items, workers=DESCRIBE_WORKERS):
+    items = list(items)
+    if len(items) <= 1 or workers <= 1:
+        return [fn(item) for item in items]
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        # A context can only be entered by one thread at a time: one copy per item
+        return list(pool.map(lambda item: context.copy().run(fn, item), items))
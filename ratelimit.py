@@ -0,0 +1,176 @@
+"""
+ratelimit.py
+
+Client-side rate limiting and throttling-aware retries for the AWS scanners.
+
+Every API call made through call_api() takes a token from the limiter for its
+(service, region). Each limiter is a token bucket plus a concurrency cap that
+adapt AIMD-style: a throttling response halves both, and a run of successful
+calls raises them again, so a scan settles just under the API quota instead of
+hammering it. Throttled and transient errors are retried with jittered
+exponential backoff; anything else (or running out of attempts) is raised so the
+scanner can mark its result partial.
+
+botocore's own retries are disabled on pooled clients (see awsclients) so
+throttling is seen and handled here. Its exceptions are imported by the
+functions that catch them, keeping botocore out of CLI start-up.
+"""
+
+import random
+import threading
+import time
+import logging
+
+THROTTLE_CODES = {
+    'Throttling', 'ThrottlingException', 'ThrottledException', 'RequestLimitExceeded',
+    'RequestThrottled', 'RequestThrottledException', 'TooManyRequestsException',
+    'SlowDown', 'EC2ThrottledException', 'BandwidthLimitExceeded', 'PriorRequestNotComplete',
+    'ProvisionedThroughputExceededException',
+}
+TRANSIENT_CODES = {
+    'InternalError', 'InternalFailure', 'InternalServerError', 'ServiceUnavailable',
+    'RequestTimeout', 'RequestTimeoutException',
+}
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 0.25   # seconds
+BACKOFF_MAX = 20.0
+
+# Starting point and bounds per (service, region); AWS quotas are per account and
+# region, and most control-plane APIs sustain somewhere between 5 and 100 rps
+DEFAULT_RATE = 20.0         # tokens per second
+MIN_RATE = 0.5
+MAX_RATE = 200.0
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+# Consecutive successes before rate and concurrency are raised again
+RAMP_UP_AFTER = 20
+
+
+class AdaptiveLimiter:
+    def __init__(self, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY,
+                 min_rate=MIN_RATE, max_rate=MAX_RATE, max_concurrency=MAX_CONCURRENCY):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.limit = concurrency
+        self.max_concurrency = max_concurrency
+        self.tokens = 1.0
+        self.in_flight = 0
+        self.successes = 0
+        self.throttles = 0
+        self.calls = 0
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        # Burst is capped at one second's worth of tokens
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self.in_flight < self.limit and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    self.calls += 1
+                    return
+                wait = None if self.in_flight >= self.limit else (1.0 - self.tokens) / self.rate
+                self._cond.wait(wait)
+
+    def release(self, throttled=False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttles += 1
+                self.successes = 0
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.limit = max(1, self.limit // 2)
+            else:
+                self.successes += 1
+                if self.successes >= RAMP_UP_AFTER:
+                    self.successes = 0
+                    self.rate = min(self.max_rate, self.rate * 1.25)
+                    self.limit = min(self.max_concurrency, self.limit + 1)
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'rate': round(self.rate, 2), 'concurrency': self.limit,
+                    'calls': self.calls, 'throttles': self.throttles}
+
+
+class LimiterRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limiters = {}
+
+    def get(self, service, region):
+        key = (service, region)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = AdaptiveLimiter()
+                self._limiters[key] = limiter
+            return limiter
+
+    # Forget learned rates, e.g. before scanning another account (quotas are per account)
+    def clear(self):
+        with self._lock:
+            self._limiters.clear()
+
+    def stats(self):
+        with self._lock:
+            items = list(self._limiters.items())
+        return {f"{service}/{region or 'global'}": limiter.stats() for (service, region), limiter in items}
+
+
+LIMITERS = LimiterRegistry()
+
+# Attempt number of the call_api call running on this thread (for tracing)
+_attempts = threading.local()
+
+
+def current_attempt():
+    return getattr(_attempts, 'value', 0)
+
+
+def error_code(exc):
+    from botocore.exceptions import ClientError
+    if isinstance(exc, ClientError):
+        return exc.response.get('Error', {}).get('Code')
+    return None
+
+
+def backoff(attempt):
+    # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+# Call client.<operation>(**kwargs) under the (service, region) limiter, retrying
+# throttled and transient failures. Works the same with a botocore Stubber.
+def call_api(client, operation, **kwargs):
+    from botocore.exceptions import ClientError, ConnectionClosedError, ReadTimeoutError
+    limiter = LIMITERS.get(client.meta.service_model.service_name, client.meta.region_name)
+    method = getattr(client, operation)
+    attempt = 0
+    while True:
+        limiter.acquire()
+        throttled = False
+        _attempts.value = attempt
+        try:
+            return method(**kwargs)
+        except (ClientError, ConnectionClosedError, ReadTimeoutError) as exc:
+            code = error_code(exc)
+            throttled = code in THROTTLE_CODES
+            retryable = throttled or code in TRANSIENT_CODES or not isinstance(exc, ClientError)
+            attempt += 1
+            if not retryable or attempt >= MAX_ATTEMPTS:
+                raise
+            logging.debug(f"{operation} in {client.meta.region_name}: {code or exc}, retry {attempt}")
+        finally:
+            limiter.release(throttled)
+        time.sleep(backoff(attempt))
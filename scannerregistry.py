@@ -0,0 +1,287 @@
+"""
+scannerregistry.py
+
+Declarative scanners for createinfradiagram.py.
+
+Every service that is "list (and maybe describe) resources, keep a few fields"
+is one SCANNERS entry instead of a hand-written scan_* function:
+
+    service      results key (results['regions'][r][service] or results['global'][service])
+    client       boto3 client name
+    operation    list / describe operation; pages are followed as pagination.PAGINATION says
+    pagination   PAGINATION tuple for operations pagination.py doesn't list itself
+    items        JMESPath selecting the items in each page
+    describe     optional second call for the listed items: operation, param, result key,
+                 extra kwargs, and batch=True to send chunks of ids (BATCH_LIMITS) rather
+                 than one call per item (those run concurrently, and the listed value is
+                 available to fields as Listed)
+    fields       {record key: JMESPath}, compiled once into a single multiselect
+                 expression; keys must match the record's KEYS
+    record       inventory.py Record class the projection is stored as
+    scope        'regional' or 'global'
+    probe        Tagging API resource type for the --probe occupancy check (regional);
+                 'service' alone matches every type of that service
+    diagram      drawn by build_graph as (label, name key, summary key) nodes; services
+                 with their own drawing code (EC2, RDS, ...) leave it out
+    arn          template for a record's ARN ({partition}, {region}, {account} and
+                 record keys), so IAM access edges can find the resource
+
+Adding a service is an entry here plus its Record class and container in
+inventory.py. Scanner.scan runs any entry: it follows the pages, describes each
+page's items on a side thread while the next page is read, and keeps only the
+projected fields.
+"""
+
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import jmespath
+
+from awsclients import get_client
+from inventory import (mark_partial, Ec2Record, RdsRecord, LambdaRecord, EksRecord, EcsRecord, Elbv2Record,
+                       DynamodbRecord, SqsRecord, SnsRecord, ElastiCacheRecord, ApiGatewayRecord, CloudFrontRecord)
+from pagination import PAGINATION, pages, batched_describe, map_concurrently
+from ratelimit import call_api
+
+SCANNERS = [
+    {
+        'service': 'ec2', 'client': 'ec2', 'operation': 'describe_instances',
+        'items': 'Reservations[].Instances[]',
+        'fields': {
+            'InstanceId': 'InstanceId',
+            'State': 'State.Name',
+            'InstanceType': 'InstanceType',
+            'VpcId': 'VpcId',
+            'SubnetId': 'SubnetId',
+            'Name': "(Tags[?Key=='Name'].Value | [0]) || ''",
+        },
+        'record': Ec2Record, 'probe': 'ec2:instance',
+    },
+    {
+        'service': 'rds', 'client': 'rds', 'operation': 'describe_db_instances', 'items': 'DBInstances',
+        'fields': {
+            'DBInstanceIdentifier': 'DBInstanceIdentifier',
+            'Engine': 'Engine',
+            'DBInstanceClass': 'DBInstanceClass',
+            'VpcId': 'DBSubnetGroup.VpcId',
+            'Status': 'DBInstanceStatus',
+            'MultiAZ': 'MultiAZ',
+        },
+        'arn': 'arn:{partition}:rds:{region}:{account}:db:{DBInstanceIdentifier}',
+        'record': RdsRecord, 'probe': 'rds:db',
+    },
+    {
+        'service': 'lambda', 'client': 'lambda', 'operation': 'list_functions', 'items': 'Functions',
+        'fields': {'FunctionName': 'FunctionName', 'Runtime': 'Runtime', 'VpcConfig': 'VpcConfig'},
+        'arn': 'arn:{partition}:lambda:{region}:{account}:function:{FunctionName}',
+        'record': LambdaRecord, 'probe': 'lambda:function',
+    },
+    {
+        'service': 'eks', 'client': 'eks', 'operation': 'list_clusters', 'items': 'clusters',
+        # describe_cluster takes a single name
+        'describe': {'operation': 'describe_cluster', 'param': 'name', 'result': 'cluster'},
+        'fields': {
+            'Name': 'Listed',
+            'Version': 'version',
+            'VpcId': 'resourcesVpcConfig.vpcId',
+            'Subnets': 'resourcesVpcConfig.subnetIds || `[]`',
+        },
+        'arn': 'arn:{partition}:eks:{region}:{account}:cluster/{Name}',
+        'record': EksRecord, 'probe': 'eks:cluster',
+    },
+    {
+        'service': 'ecs', 'client': 'ecs', 'operation': 'list_clusters', 'items': 'clusterArns',
+        'describe': {'operation': 'describe_clusters', 'param': 'clusters', 'result': 'clusters', 'batch': True},
+        'fields': {
+            'ClusterArn': 'clusterArn',
+            'ClusterName': 'clusterName',
+            'Status': 'status',
+            'RegisteredContainerInstancesCount': 'registeredContainerInstancesCount',
+        },
+        'arn': '{ClusterArn}',
+        'record': EcsRecord, 'probe': 'ecs:cluster',
+    },
+    {
+        'service': 'elbv2', 'client': 'elbv2', 'operation': 'describe_load_balancers', 'items': 'LoadBalancers',
+        'fields': {
+            'LoadBalancerName': 'LoadBalancerName',
+            'Type': 'Type',
+            'Scheme': 'Scheme',
+            'VpcId': 'VpcId',
+            'DNSName': 'DNSName',
+        },
+        'record': Elbv2Record, 'probe': 'elasticloadbalancing:loadbalancer',
+    },
+    {
+        'service': 'dynamodb', 'client': 'dynamodb', 'operation': 'list_tables', 'items': 'TableNames',
+        'pagination': ('ExclusiveStartTableName', 'LastEvaluatedTableName', 'Limit', 100),
+        'describe': {'operation': 'describe_table', 'param': 'TableName', 'result': 'Table'},
+        'fields': {
+            'TableName': 'TableName',
+            'TableStatus': 'TableStatus',
+            'BillingMode': "BillingModeSummary.BillingMode || 'PROVISIONED'",
+            'ItemCount': 'ItemCount',
+            'TableSizeBytes': 'TableSizeBytes',
+        },
+        'arn': 'arn:{partition}:dynamodb:{region}:{account}:table/{TableName}',
+        'record': DynamodbRecord, 'probe': 'dynamodb:table',
+        'diagram': ('DynamoDB', 'TableName', 'BillingMode'),
+    },
+    {
+        'service': 'sqs', 'client': 'sqs', 'operation': 'list_queues', 'items': 'QueueUrls',
+        'pagination': ('NextToken', 'NextToken', 'MaxResults', 1000),
+        'describe': {'operation': 'get_queue_attributes', 'param': 'QueueUrl', 'result': 'Attributes',
+                     'kwargs': {'AttributeNames': ['QueueArn', 'FifoQueue', 'ApproximateNumberOfMessages']}},
+        'fields': {
+            'QueueUrl': 'Listed',
+            'QueueArn': 'QueueArn',
+            'FifoQueue': "FifoQueue == 'true'",
+            'ApproximateNumberOfMessages': 'to_number(ApproximateNumberOfMessages)',
+        },
+        'arn': '{QueueArn}',
+        'record': SqsRecord, 'probe': 'sqs',
+        'diagram': ('SQS', 'QueueUrl', 'FifoQueue'),
+    },
+    {
+        'service': 'sns', 'client': 'sns', 'operation': 'list_topics', 'items': 'Topics',
+        'pagination': ('NextToken', 'NextToken', None, None),
+        'fields': {'TopicArn': 'TopicArn'},
+        'arn': '{TopicArn}',
+        'record': SnsRecord, 'probe': 'sns',
+        'diagram': ('SNS', 'TopicArn', None),
+    },
+    {
+        'service': 'elasticache', 'client': 'elasticache', 'operation': 'describe_cache_clusters',
+        'items': 'CacheClusters',
+        'pagination': ('Marker', 'Marker', 'MaxRecords', 100),
+        'fields': {
+            'CacheClusterId': 'CacheClusterId',
+            'Engine': 'Engine',
+            'EngineVersion': 'EngineVersion',
+            'CacheNodeType': 'CacheNodeType',
+            'CacheClusterStatus': 'CacheClusterStatus',
+            'NumCacheNodes': 'NumCacheNodes',
+            'CacheSubnetGroupName': 'CacheSubnetGroupName',
+        },
+        'arn': 'arn:{partition}:elasticache:{region}:{account}:cluster:{CacheClusterId}',
+        'record': ElastiCacheRecord, 'probe': 'elasticache:cluster',
+        'diagram': ('ElastiCache', 'CacheClusterId', 'Engine'),
+    },
+    {
+        'service': 'apigateway', 'client': 'apigateway', 'operation': 'get_rest_apis', 'items': 'items',
+        'pagination': ('position', 'position', 'limit', 500),
+        'fields': {'Id': 'id', 'Name': 'name', 'EndpointTypes': 'endpointConfiguration.types || `[]`'},
+        'arn': 'arn:{partition}:apigateway:{region}::/restapis/{Id}',
+        'record': ApiGatewayRecord, 'probe': 'apigateway:restapis',
+        'diagram': ('API Gateway', 'Name', None),
+    },
+    {
+        'service': 'cloudfront', 'client': 'cloudfront', 'operation': 'list_distributions',
+        'items': 'DistributionList.Items', 'scope': 'global',
+        # MaxItems is a string in the CloudFront API
+        'pagination': ('Marker', 'DistributionList.NextMarker', 'MaxItems', '1000'),
+        'fields': {
+            'Id': 'Id',
+            'DomainName': 'DomainName',
+            'Status': 'Status',
+            'Enabled': 'Enabled',
+            'Aliases': 'Aliases.Items || `[]`',
+            'Origins': 'Origins.Items[].DomainName || `[]`',
+        },
+        'arn': 'arn:{partition}:cloudfront::{account}:distribution/{Id}',
+        'record': CloudFrontRecord,
+        'diagram': ('CloudFront', 'DomainName', 'Status'),
+    },
+]
+
+
+class Scanner:
+    def __init__(self, entry):
+        self.service = entry['service']
+        self.client = entry['client']
+        self.operation = entry['operation']
+        self.scope = entry.get('scope', 'regional')
+        self.describe = entry.get('describe')
+        self.record = entry['record']
+        self.probe = entry.get('probe')
+        self.diagram = entry.get('diagram')
+        self.arn = entry.get('arn')
+        if tuple(entry['fields']) != tuple(self.record.KEYS):
+            raise ValueError(f"{self.service}: fields {list(entry['fields'])} don't match "
+                             f"{self.record.__name__} keys {list(self.record.KEYS)}")
+        self.items = jmespath.compile(entry['items'])
+        # One expression builds the whole record dict
+        self.fields = jmespath.compile("{" + ", ".join(f"{key}: {expr}" for key, expr in entry['fields'].items()) + "}")
+        if 'pagination' in entry:
+            PAGINATION.setdefault((self.client, self.operation), entry['pagination'])
+
+    def project(self, item):
+        return self.record.from_dict(self.fields.search(item))
+
+    # ARN of a scanned record, or None when the entry has no template or the
+    # record lacks a value it needs
+    def arn_of(self, record, region, account, partition='aws'):
+        if not self.arn:
+            return None
+        try:
+            arn = self.arn.format(partition=partition, region=region or '', account=account or '', **record)
+        except KeyError:
+            return None
+        return arn if 'None' not in arn.split(':') else None
+
+    def _describe(self, client, listed):
+        d = self.describe
+        kwargs = d.get('kwargs', {})
+        if d.get('batch'):
+            return list(batched_describe(client, d['operation'], d['param'], listed, d['result'], **kwargs))
+        return map_concurrently(
+            lambda item: dict(call_api(client, d['operation'], **{d['param']: item}, **kwargs).get(d['result']) or {},
+                              Listed=item), listed)
+
+    # Scan into results['regions'][region] (results['global'] for region=None).
+    # Each page's describe runs on a side thread while the next page is read;
+    # pages are kept in order as they complete, so a failure part way keeps
+    # what was read.
+    def scan(self, region, results):
+        client = get_client(self.client, region)
+        target = results['regions'][region] if region else results['global']
+        data = target.setdefault(self.service, [])
+        pending = None
+        try:
+            with ThreadPoolExecutor(max_workers=1) as describer:
+                for page in pages(client, self.operation):
+                    items = self.items.search(page) or []
+                    if pending is not None:
+                        data.extend(self.project(item) for item in pending.result())
+                        pending = None
+                    if self.describe and items:
+                        pending = describer.submit(contextvars.copy_context().run, self._describe, client, items)
+                    else:
+                        data.extend(self.project(item) for item in items)
+                if pending is not None:
+                    data.extend(self.project(item) for item in pending.result())
+        except Exception as e:
+            logging.warning(f"{self.client} {self.operation} failed in {region or 'global'}: {e}")
+            mark_partial(results, region, self.service)
+
+
+REGISTRY = {entry['service']: Scanner(entry) for entry in SCANNERS}
+
+
+# [(service, scanner function)] for one scope, in registry order; regional
+# functions take (region, results), global ones (results)
+def scanners(scope):
+    return [(s.service, s.scan if scope == 'regional' else partial(s.scan, None))
+            for s in REGISTRY.values() if s.scope == scope]
+
+
+# Tagging API resource type -> service, for the occupancy probe
+def probe_types():
+    return {s.probe: s.service for s in REGISTRY.values() if s.probe}
+
+
+# [(service, (label, name key, summary key))] drawn generically in scope
+def diagram_services(scope):
+    return [(s.service, s.diagram) for s in REGISTRY.values() if s.scope == scope and s.diagram]
@@ -0,0 +1,256 @@
+"""
+scantrace.py
+
+Per-API-call tracing for createinfradiagram.py scans (--trace).
+
+install() hooks botocore's before-call / after-call events on every client in
+the shared ClientPool and records, for each API call attempt: service,
+operation, region, latency, call_api attempt number (retries), bytes received,
+HTTP status and error code. run_scan_job wraps each (region, service) job in a
+job_span, so calls can be attributed to the job that made them. The job's
+region is a context variable, which pagination.map_concurrently carries onto
+its worker threads, so a describe fanned out by a global or batched scanner
+still counts towards the job's region, not its client's.
+
+At the end of a run:
+    write_report()        slowest calls, per-service latency histograms, error
+                          codes and the critical path (slowest job) per region
+    write_chrome_trace()  Trace Event Format JSON; open in chrome://tracing or
+                          https://ui.perfetto.dev (jobs and their calls nest per
+                          thread, so it reads as a flame chart)
+"""
+
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import partial
+
+import awsclients
+from ratelimit import current_attempt
+
+REPORT_FILE = "scan_report.txt"
+TRACE_FILE = "scan_trace.json"
+# Latency histogram bucket upper bounds, in milliseconds
+HISTOGRAM_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, float('inf')]
+SLOWEST_CALLS = 20
+
+# Active tracer, if install() was called
+TRACER = None
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class ScanTracer:
+    def __init__(self):
+        self.calls = []
+        self.jobs = []
+        self._lock = threading.Lock()
+        self._threads = {}
+        # Region of the scan job the current code runs for (thread pools that
+        # copy the context, like pagination.map_concurrently, keep it)
+        self._job_region = contextvars.ContextVar('scantrace_job_region', default=None)
+        self._origin = time.perf_counter()
+
+    def _now(self):
+        return time.perf_counter() - self._origin
+
+    def _thread(self):
+        ident = threading.get_ident()
+        with self._lock:
+            return self._threads.setdefault(ident, len(self._threads) + 1)
+
+    def attach(self, client):
+        region = client.meta.region_name or 'global'
+        events = client.meta.events
+        # First, so the start time is taken even when another before-call handler
+        # (e.g. a Stubber) answers the call
+        events.register_first('before-call.*.*', partial(self._before, region), unique_id='scantrace-before')
+        events.register('after-call.*.*', partial(self._after, region), unique_id='scantrace-after')
+        events.register('after-call-error.*.*', partial(self._after_error, region), unique_id='scantrace-error')
+
+    def _before(self, region, model=None, context=None, **kwargs):
+        if context is not None:
+            context['scantrace_start'] = self._now()
+
+    def _record(self, region, model, context, **fields):
+        start = (context or {}).get('scantrace_start')
+        if start is None:
+            return
+        end = self._now()
+        # Clients made without a region (S3, IAM) report their default one; the
+        # job they run under says which scope they belong to
+        region = self._job_region.get() or region
+        call = {
+            'service': model.service_model.service_name, 'operation': model.name, 'region': region,
+            'start': start, 'end': end, 'latency': end - start, 'attempt': current_attempt(),
+            'thread': self._thread(), 'bytes': 0, 'status': None, 'error': None, 'sdk_retries': 0,
+        }
+        call.update(fields)
+        with self._lock:
+            self.calls.append(call)
+
+    def _after(self, region, http_response=None, parsed=None, model=None, context=None, **kwargs):
+        parsed = parsed or {}
+        content = getattr(http_response, 'content', None) or b''
+        self._record(region, model, context, bytes=len(content),
+                     status=getattr(http_response, 'status_code', None),
+                     error=(parsed.get('Error') or {}).get('Code'),
+                     sdk_retries=(parsed.get('ResponseMetadata') or {}).get('RetryAttempts', 0))
+
+    def _after_error(self, region, exception=None, model=None, context=None, **kwargs):
+        self._record(region, model, context, error=type(exception).__name__)
+
+    @contextmanager
+    def job(self, region, service):
+        start = self._now()
+        token = self._job_region.set(region)
+        try:
+            yield
+        finally:
+            self._job_region.reset(token)
+            end = self._now()
+            thread = self._thread()
+            with self._lock:
+                self.jobs.append({'region': region, 'service': service, 'start': start, 'end': end,
+                                  'duration': end - start, 'thread': thread})
+
+    # Per-service latency summary and histogram
+    def services(self):
+        by_service = {}
+        for call in self.calls:
+            by_service.setdefault(call['service'], []).append(call)
+        summary = {}
+        for service, calls in sorted(by_service.items()):
+            latencies = [c['latency'] for c in calls]
+            buckets = [0] * len(HISTOGRAM_BUCKETS)
+            for latency in latencies:
+                ms = latency * 1000
+                buckets[next(i for i, bound in enumerate(HISTOGRAM_BUCKETS) if ms < bound)] += 1
+            summary[service] = {
+                'calls': len(calls), 'errors': sum(1 for c in calls if c['error']),
+                'retries': sum(1 for c in calls if c['attempt']) + sum(c['sdk_retries'] for c in calls),
+                'bytes': sum(c['bytes'] for c in calls), 'total': sum(latencies),
+                'p50': _percentile(latencies, 50), 'p95': _percentile(latencies, 95), 'max': max(latencies),
+                'histogram': buckets,
+            }
+        return summary
+
+    # Per region: wall time with at least one call in flight, and the critical
+    # path - jobs in a region run concurrently, so it can't finish before its
+    # slowest job
+    def regions(self):
+        summary = {}
+        by_region = {}
+        for call in self.calls:
+            by_region.setdefault(call['region'], []).append(call)
+        for region, calls in by_region.items():
+            busy = 0.0
+            current_start = current_end = None
+            for call in sorted(calls, key=lambda c: c['start']):
+                if current_end is None or call['start'] > current_end:
+                    if current_end is not None:
+                        busy += current_end - current_start
+                    current_start, current_end = call['start'], call['end']
+                else:
+                    current_end = max(current_end, call['end'])
+            if current_end is not None:
+                busy += current_end - current_start
+            summary[region] = {'calls': len(calls), 'busy': busy, 'critical_path': 0.0, 'slowest_job': None}
+        for job in self.jobs:
+            entry = summary.setdefault(job['region'], {'calls': 0, 'busy': 0.0, 'critical_path': 0.0, 'slowest_job': None})
+            if job['duration'] > entry['critical_path']:
+                entry['critical_path'] = job['duration']
+                entry['slowest_job'] = job['service']
+        return dict(sorted(summary.items(), key=lambda kv: -kv[1]['critical_path']))
+
+    def errors(self):
+        counts = {}
+        for call in self.calls:
+            if call['error']:
+                key = (call['error'], f"{call['service']}.{call['operation']}")
+                counts[key] = counts.get(key, 0) + 1
+        return sorted(counts.items(), key=lambda kv: -kv[1])
+
+    def report(self):
+        with self._lock:
+            calls = list(self.calls)
+        wall = max((c['end'] for c in calls), default=0.0) - min((c['start'] for c in calls), default=0.0)
+        lines = [
+            "Scan performance report",
+            f"  {len(calls)} API calls, {sum(1 for c in calls if c['error'])} errors, "
+            f"{sum(1 for c in calls if c['attempt'])} retried attempts, "
+            f"{sum(c['bytes'] for c in calls) / 1e6:.1f} MB received, {wall:.1f}s wall time",
+            "",
+            f"Slowest {SLOWEST_CALLS} calls:",
+        ]
+        for c in sorted(calls, key=lambda c: -c['latency'])[:SLOWEST_CALLS]:
+            note = f" {c['error']}" if c['error'] else ""
+            retry = f" (attempt {c['attempt'] + 1})" if c['attempt'] else ""
+            lines.append(f"  {c['latency'] * 1000:8.0f} ms  {c['region']:<16} {c['service']}.{c['operation']}"
+                         f"{retry}{note}")
+        lines += ["", "Per service:"]
+        labels = [f"<{b}ms" if b != float('inf') else f">={HISTOGRAM_BUCKETS[-2]}ms" for b in HISTOGRAM_BUCKETS]
+        for service, s in self.services().items():
+            lines.append(f"  {service}: {s['calls']} calls, {s['errors']} errors, {s['retries']} retries, "
+                         f"{s['bytes'] / 1e3:.0f} KB, total {s['total']:.1f}s, p50 {s['p50'] * 1000:.0f} ms, "
+                         f"p95 {s['p95'] * 1000:.0f} ms, max {s['max'] * 1000:.0f} ms")
+            peak = max(s['histogram']) or 1
+            for label, count in zip(labels, s['histogram']):
+                if count:
+                    lines.append(f"    {label:>9} {count:>6} {'#' * max(1, round(40 * count / peak))}")
+        lines += ["", "Per region (critical path = slowest scan job):"]
+        for region, r in self.regions().items():
+            lines.append(f"  {region:<16} critical path {r['critical_path']:6.1f}s ({r['slowest_job'] or '-'}), "
+                         f"busy {r['busy']:6.1f}s, {r['calls']} calls")
+        errors = self.errors()
+        if errors:
+            lines += ["", "Errors:"]
+            for (code, call), count in errors:
+                lines.append(f"  {count:>6}  {code}  {call}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path=REPORT_FILE):
+        with open(path, "w") as fh:
+            fh.write(self.report())
+        return path
+
+    def write_chrome_trace(self, path=TRACE_FILE):
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': 'scan'}}]
+        with self._lock:
+            jobs = list(self.jobs)
+            calls = list(self.calls)
+        for job in jobs:
+            events.append({'name': f"{job['region']}/{job['service']}", 'cat': 'job', 'ph': 'X', 'pid': 1,
+                           'tid': job['thread'], 'ts': job['start'] * 1e6, 'dur': job['duration'] * 1e6})
+        for c in calls:
+            events.append({'name': f"{c['service']}.{c['operation']}", 'cat': c['region'], 'ph': 'X', 'pid': 1,
+                           'tid': c['thread'], 'ts': c['start'] * 1e6, 'dur': c['latency'] * 1e6,
+                           'args': {'region': c['region'], 'attempt': c['attempt'], 'bytes': c['bytes'],
+                                    'status': c['status'], 'error': c['error']}})
+        with open(path, "w") as fh:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fh)
+        return path
+
+
+# Start tracing every client of the pool (existing and future ones)
+def install(pool=None):
+    global TRACER
+    if TRACER is None:
+        TRACER = ScanTracer()
+        (pool or awsclients.CLIENTS).add_hook(TRACER.attach)
+    return TRACER
+
+
+# Context manager attributing the enclosed calls to a (region, service) scan job;
+# does nothing unless tracing is installed
+def job_span(region, service):
+    if TRACER is None:
+        return nullcontext()
+    return TRACER.job(region, service)
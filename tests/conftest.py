@@ -0,0 +1,56 @@
+"""
+Shared fixtures: a moto-mocked AWS account and a fakegithub.py server.
+
+Every test runs in its own temporary directory, so inventories, caches and
+traces the code under test writes there never land in the repository.
+"""
+
+import pytest
+
+import awsclients
+import iamgraph
+import orgscan
+import ratelimit
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+# Pooled clients, learned rates and the IAM policy cache an org scan installs
+# are process-wide; every test starts without them
+@pytest.fixture(autouse=True)
+def fresh_pools(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'BACKOFF_BASE', 0.001)
+    monkeypatch.setattr(awsclients, 'CLIENTS', awsclients.ClientPool())
+    monkeypatch.setattr(iamgraph, '_default_cache', None)
+    monkeypatch.setattr(orgscan, '_POLICIES', None)
+    ratelimit.LIMITERS.clear()
+    yield
+    ratelimit.LIMITERS.clear()
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    moto = pytest.importorskip('moto')
+    for key, value in {'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+                       'AWS_SESSION_TOKEN': 'testing', 'AWS_DEFAULT_REGION': 'us-east-1'}.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.delenv('AWS_PROFILE', raising=False)
+    with moto.mock_aws():
+        yield
+
+
+
+# A fakegithub server; the test adds repositories to the returned state
+@pytest.fixture
+def github():
+    from fakegithub import FakeState, serve
+    state = FakeState()
+    server, url = serve(state)
+    state.url = url
+    yield state
+    server.shutdown()
+    server.server_close()
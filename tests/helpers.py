@@ -0,0 +1,10 @@
+"""Helpers for filling the mocked AWS account (see conftest.aws)."""
+
+import boto3
+
+
+# count instances in region, on the account's first AMI
+def run_instances(region, count, instance_type='m5.large'):
+    ec2 = boto3.client('ec2', region_name=region)
+    image = ec2.describe_images()['Images'][0]['ImageId']
+    return ec2.run_instances(ImageId=image, MinCount=count, MaxCount=count, InstanceType=instance_type)['Instances']
@@ -0,0 +1,88 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+import autoclonerepo
+
+GIT_IDENTITY = ['-c', 'user.email=test@example.com', '-c', 'user.name=test']
+
+
+def git(*args, cwd=None):
+    return subprocess.run(['git'] + list(args), cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+# repo-0..repo-3, each a bare repository with one commit under the fake
+# server's clone root
+@pytest.fixture
+def remote(github, tmp_path):
+    if subprocess.run(['git', '--version'], capture_output=True).returncode:
+        pytest.skip("needs git")
+    github.clone_root = str(tmp_path / 'bare')
+    os.makedirs(github.clone_root)
+    for n in range(4):
+        push(github, github.add_repo(f"repo-{n}")['name'], 'README', f"repo {n}")
+    return github
+
+
+def push(state, name, filename, text):
+    bare = os.path.join(state.clone_root, f"{name}.git")
+    work = f"{bare}.work"
+    if not os.path.exists(bare):
+        git('init', '-q', '--bare', '-b', 'main', bare)
+        git('clone', '-q', bare, work)
+    with open(os.path.join(work, filename), 'w') as fh:
+        fh.write(text)
+    git('add', '.', cwd=work)
+    git(*GIT_IDENTITY, 'commit', '-qm', f"Add {filename}", cwd=work)
+    git('push', '-q', 'origin', 'HEAD:main', cwd=work)
+
+
+def sync(state, dest, *extra):
+    return autoclonerepo.main(['--api-url', state.url, '--token', 'token', '--etag-cache', 'etags.json',
+                               '--dest', str(dest), '--visibility', 'all', '--report', 'report.json'] + list(extra))
+
+
+def report():
+    with open('report.json') as fh:
+        return {row['repo']: row['action'] for row in json.load(fh)}
+
+
+def test_only_changed_repositories_are_fetched(remote, tmp_path):
+    dest = tmp_path / 'out'
+    assert sync(remote, dest, '--mode', 'partial') == 0
+    assert set(report().values()) == {'clone'}
+    assert sync(remote, dest, '--mode', 'partial') == 0
+    assert set(report().values()) == {'skip'}
+
+    push(remote, 'repo-2', 'CHANGES', "second commit")
+    remote.repos['octo/repo-2']['pushed_at'] = '2030-01-01T00:00:00Z'
+    assert sync(remote, dest, '--mode', 'partial') == 0
+    assert report() == {'octo/repo-0': 'skip', 'octo/repo-1': 'skip', 'octo/repo-2': 'fetch', 'octo/repo-3': 'skip'}
+    assert 'Add CHANGES' in git('-C', str(dest / 'repo-2'), 'log', '--oneline', 'origin/main')
+
+
+def test_failed_clone_is_retried_next_run(remote, tmp_path):
+    dest = tmp_path / 'out'
+    remote.repos['octo/repo-1']['clone_url'] = f"file://{tmp_path}/missing.git"
+    assert sync(remote, dest) == 1
+    with open(dest / autoclonerepo.STATE_FILE) as fh:
+        assert 'octo/repo-1' not in json.load(fh)
+    remote.repos['octo/repo-1']['clone_url'] = f"file://{remote.clone_root}/repo-1.git"
+    assert sync(remote, dest) == 0
+    assert report()['octo/repo-1'] == 'clone'
+
+
+def test_mirror_mode_makes_bare_copies(remote, tmp_path):
+    assert sync(remote, tmp_path / 'mirror', '--mode', 'mirror') == 0
+    assert sorted(os.listdir(tmp_path / 'mirror')) == [autoclonerepo.STATE_FILE] + [f"repo-{n}.git" for n in range(4)]
+
+
+def test_token_reaches_git_as_a_header_for_the_clone_hosts_only(monkeypatch):
+    monkeypatch.delenv('GIT_CONFIG_COUNT', raising=False)
+    repos = [{'clone_url': 'https://ghe.example.com/octo/a.git'}, {'clone_url': 'file:///srv/b.git'}]
+    env = autoclonerepo.git_env('token', autoclonerepo.clone_hosts(repos))
+    assert env['GIT_CONFIG_COUNT'] == '1'
+    assert env['GIT_CONFIG_KEY_0'] == 'http.https://ghe.example.com/.extraheader'
+    assert 'token' not in env['GIT_CONFIG_VALUE_0']
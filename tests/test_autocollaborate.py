@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import autocollaborate
+
+
+@pytest.fixture
+def account(github):
+    for n in range(4):
+        github.add_repo(f"repo-{n}")
+    github.collaborators['octo/repo-1']['stale'] = 'push'
+    github.collaborators['octo/repo-2']['alice'] = 'pull'
+    github.invitations['octo/repo-3'].append({'id': 999, 'invitee': {'login': 'bob'}, 'permissions': 'write'})
+    return github
+
+
+def run(state, desired, *args):
+    with open('desired.json', 'w') as fh:
+        json.dump(desired, fh)
+    return autocollaborate.main(['--api-url', state.url, '--token', 'token', '--etag-cache', 'etags.json',
+                                 '--desired', 'desired.json'] + list(args))
+
+
+def writes(state, since):
+    return [entry for entry in state.log[since:] if entry[0] != 'GET']
+
+
+DESIRED = {"octo/*": {"Alice": "admin", "ci": "read"}, "octo/repo-3": {"bob": "admin"}}
+
+
+def test_reconciles_then_reruns_without_writes(account):
+    assert run(account, DESIRED, '--prune') == 0
+    assert account.collaborators['octo/repo-1'] == {'octo': 'admin'}
+    assert account.collaborators['octo/repo-2'] == {'octo': 'admin', 'alice': 'admin'}
+    assert {i['invitee']['login']: i['permissions'] for i in account.invitations['octo/repo-3']} == \
+        {'bob': 'admin', 'ci': 'pull', 'alice': 'admin'}
+    since = len(account.log)
+    assert run(account, DESIRED, '--prune') == 0
+    assert writes(account, since) == []
+
+
+def test_logins_are_compared_case_insensitively(account):
+    account.collaborators['octo/repo-0']['ALICE'] = 'admin'
+    run(account, {"octo/repo-0": {"alice": "admin"}})
+    assert writes(account, 0) == []
+
+
+def test_team_access_counts_and_is_never_pruned(account):
+    account.team_access['octo/repo-0'] = {'ci': 'push', 'team-member': 'maintain'}
+    since = len(account.log)
+    assert run(account, {"octo/repo-0": {"ci": "read"}}, '--prune') == 0
+    assert writes(account, since) == []
+
+
+def test_foreign_repositories_are_left_out_or_skipped(account):
+    account.add_repo('shared', owner='some-org')
+    since = len(account.log)
+    assert run(account, {"*": {"ci": "read"}}) == 0
+    assert not [path for _, path in account.log[since:] if path.startswith('/repos/some-org/')]
+    # Named with --username, the repository is tried and, without admin rights, skipped
+    assert run(account, {"*": {"ci": "read"}}, '--username', 'some-org') == 1
+    assert account.invitations['some-org/shared'] == []
+
+
+def test_a_call_that_raises_is_failed_and_the_rest_applied(account):
+    from githubclient import GitHubClient
+
+    class Flaky(GitHubClient):
+        def request(self, method, path, *args, **kwargs):
+            if path.endswith('/collaborators/ci'):
+                raise ConnectionError("connection reset")
+            return super().request(method, path, *args, **kwargs)
+
+    with Flaky('token', account.url, None) as client:
+        changes, _, _ = autocollaborate.plan(client, {"octo/repo-0": {"ci": "read", "dev": "push"}})
+        failed = autocollaborate.apply(client, changes)
+    assert [c['login'] for c in failed] == ['ci']
+    assert [i['invitee']['login'] for i in account.invitations['octo/repo-0']] == ['dev']
@@ -0,0 +1,84 @@
+import os
+import subprocess
+
+import pytest
+
+import autocreaterepo
+from githubclient import GitHubClient
+
+
+def git(*args, cwd=None):
+    return subprocess.run(['git'] + list(args), cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+
+# base/proj-0..proj-2, each a plain folder with one file; the fake server
+# creates a bare repository under bare/ per POST /user/repos
+@pytest.fixture
+def base(github, tmp_path, monkeypatch):
+    if subprocess.run(['git', '--version'], capture_output=True).returncode:
+        pytest.skip("needs git")
+    for key in ('GIT_AUTHOR_NAME', 'GIT_COMMITTER_NAME'):
+        monkeypatch.setenv(key, 'test')
+    for key in ('GIT_AUTHOR_EMAIL', 'GIT_COMMITTER_EMAIL'):
+        monkeypatch.setenv(key, 'test@example.com')
+    github.clone_root = str(tmp_path / 'bare')
+    os.makedirs(github.clone_root)
+    for n in range(3):
+        os.makedirs(tmp_path / 'base' / f"proj-{n}")
+        with open(tmp_path / 'base' / f"proj-{n}" / 'README', 'w') as fh:
+            fh.write(f"project {n}")
+    return tmp_path / 'base'
+
+
+def create(state, base):
+    return autocreaterepo.main([str(base), '--api-url', state.url, '--token', 'token', '--no-etag-cache'])
+
+
+def pushed(state, name):
+    bare = os.path.join(state.clone_root, f"{name}.git")
+    return subprocess.run(['git', '--git-dir', bare, 'rev-parse', '--verify', 'main'],
+                          capture_output=True).returncode == 0
+
+
+def test_rerun_only_does_what_is_left(github, base):
+    assert create(github, base) == 0
+    assert all(pushed(github, f"proj-{n}") for n in range(3))
+    del github.log[:]
+    assert create(github, base) == 0
+    assert github.log == []
+
+
+def test_repository_created_before_an_interrupt_is_still_pushed(github, base):
+    # The POST went through but the run stopped before journaling it
+    with GitHubClient('token', github.url, None) as client:
+        assert client.post('/user/repos', json={'name': 'proj-1'}).status_code == 201
+    assert create(github, base) == 0
+    assert all(pushed(github, f"proj-{n}") for n in range(3))
+    assert ('POST', '/user/repos') in github.log
+
+
+def test_failed_push_is_retried_against_the_journaled_repository(github, base, monkeypatch):
+    push_step = autocreaterepo.push_step
+
+    def failing(path, env, clone_url):
+        if path.endswith('proj-2'):
+            raise autocreaterepo.StepFailed("fatal: connection reset")
+        return push_step(path, env, clone_url)
+
+    monkeypatch.setattr(autocreaterepo, 'push_step', failing)
+    assert create(github, base) == 1
+    assert not pushed(github, 'proj-2')
+    monkeypatch.setattr(autocreaterepo, 'push_step', push_step)
+    assert create(github, base) == 0
+    assert pushed(github, 'proj-2')
+    assert git('remote', 'get-url', 'origin', cwd=base / 'proj-2').strip() == github.repos['octo/proj-2']['clone_url']
+
+
+def test_someone_elses_repository_is_left_alone(github, base):
+    github.add_repo('proj-0')
+    git('init', '-q', '--bare', os.path.join(github.clone_root, 'proj-0.git'))
+    assert create(github, base) == 0
+    assert not pushed(github, 'proj-0')
+    assert pushed(github, 'proj-1')
+    journal = autocreaterepo.Journal(str(base / autocreaterepo.JOURNAL_FILE))
+    assert ('proj-0', 'push') in journal.done
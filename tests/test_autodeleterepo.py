@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+import autodeleterepo
+
+
+@pytest.fixture
+def account(github):
+    for n in range(12):
+        github.add_repo(f"tmp-{n:02d}", archived=n % 2 == 0, pushed_at=f"20{10 + n}-06-01T00:00:00Z")
+    github.add_repo('keep-me', archived=True, pushed_at="2012-06-01T00:00:00Z")
+    # Matches every filter below, but isn't the user's to delete
+    github.add_repo('tmp-00', archived=True, pushed_at="2010-06-01T00:00:00Z", owner='some-org')
+    return github
+
+
+def run(state, *args):
+    return autodeleterepo.main(['--api-url', state.url, '--token', 'token', '--no-etag-cache'] + list(args))
+
+
+def test_plan_lists_matches_without_deleting(account):
+    assert run(account, '--name', 'tmp-*', '--archived', 'yes', '--pushed-before', '2016', '--plan', 'plan.json') == 0
+    with open('plan.json') as fh:
+        plan = json.load(fh)
+    assert [r['full_name'] for r in plan['repositories']] == ['octo/tmp-00', 'octo/tmp-02', 'octo/tmp-04']
+    assert plan['filters'] == {'name': ['tmp-*'], 'archived': 'yes', 'pushed_before': '2016'}
+    assert len(account.repos) == 14
+    assert not [method for method, _ in account.log if method == 'DELETE']
+
+
+def test_apply_deletes_the_plan_and_skips_changed_repositories(account):
+    account.secondary_every = 4
+    run(account, '--name', 'tmp-*', '--plan', 'plan.json')
+    account.repos['octo/tmp-03']['pushed_at'] = '2030-01-01T00:00:00Z'
+    del account.repos['octo/tmp-05']
+    assert run(account, '--apply', 'plan.json', '--workers', '4') == 0
+    with open('plan.results.json') as fh:
+        results = json.load(fh)
+    assert results['counts'] == {'deleted': 10, 'changed': 1, 'not-found': 1}
+    assert results['secondary_limits'] >= 1
+    assert sorted(account.repos) == ['octo/keep-me', 'octo/tmp-03', 'some-org/tmp-00']
+    # Rerunning finds nothing left to delete
+    assert run(account, '--apply', 'plan.json') == 0
+
+
+def test_dry_run_apply_deletes_nothing(account):
+    run(account, '--name', 'tmp-0*', '--plan', 'plan.json')
+    assert run(account, '--apply', 'plan.json', '--dry-run', '--results', 'dry.json') == 0
+    with open('dry.json') as fh:
+        assert json.load(fh)['counts'] == {'would-delete': 10}
+    assert len(account.repos) == 14
+
+
+def test_named_repositories_are_deleted_with_yes(account):
+    assert run(account, '--repo', 'octo/tmp-01', '--repo', 'octo/tmp-02', '--yes') == 0
+    assert 'octo/tmp-01' not in account.repos and 'octo/tmp-02' not in account.repos
+    assert len(account.repos) == 12
+
+
+def test_other_owners_repositories_are_never_listed(account):
+    run(account, '--name', '*tmp-00', '--plan', 'plan.json')
+    with open('plan.json') as fh:
+        assert [r['full_name'] for r in json.load(fh)['repositories']] == ['octo/tmp-00']
+    assert run(account, '--repo', 'some-org/tmp-00', '--yes') == 0
+    assert 'some-org/tmp-00' in account.repos
+
+
+def test_plan_and_repo_selection_do_not_mix(account):
+    with pytest.raises(SystemExit):
+        run(account, '--apply', 'plan.json', '--name', 'tmp-*')
+    with pytest.raises(SystemExit):
+        run(account, '--yes')
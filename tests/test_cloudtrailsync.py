@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+
+import cloudtrailsync as cts
+import createinfradiagram as cid
+from inventory import LambdaRecord, json_default
+from tests.helpers import run_instances
+
+REGION = 'us-east-1'
+LOG_DIR = f"AWSLogs/123456789012/CloudTrail/{REGION}/2024/01/01"
+
+
+def write_log(stamp, *events):
+    os.makedirs(os.path.join('logs', LOG_DIR), exist_ok=True)
+    path = os.path.join('logs', LOG_DIR, f"123456789012_CloudTrail_{REGION}_20240101{stamp}Z_abc.json.gz")
+    with gzip.open(path, 'wt') as fh:
+        json.dump({'Records': list(events)}, fh)
+
+
+def event(name, when, request=None, response=None):
+    return {'eventSource': 'ec2.amazonaws.com', 'eventName': name, 'awsRegion': REGION, 'eventTime': when,
+            'requestParameters': request, 'responseElements': response}
+
+
+def launched(instance_id, when):
+    return event('RunInstances', when, response={'instancesSet': {'items': [
+        {'instanceId': instance_id, 'instanceType': 't3.micro', 'instanceState': {'name': 'running'}}]}})
+
+
+def sync(*extra):
+    cts.main(['logs', '--inventory', 'inventory.json', '--state', 'state.json'] + list(extra))
+    with open('inventory.json') as fh:
+        instances = [i['InstanceId'] for i in json.load(fh)['regions'][REGION]['ec2']]
+    with open('state.json') as fh:
+        return instances, json.load(fh)
+
+
+def baseline():
+    with open('inventory.json', 'w') as fh:
+        json.dump(cid.new_results([REGION]), fh, default=json_default)
+
+
+def test_watermark_only_lets_new_files_through(aws, capsys):
+    baseline()
+    write_log('T1000', launched('i-1', '2024-01-01T10:00:00Z'))
+    instances, state = sync()
+    assert instances == ['i-1']
+    assert state['watermarks'][LOG_DIR].endswith('T1000Z_abc.json.gz')
+
+    write_log('T1100', event('TerminateInstances', '2024-01-01T11:00:00Z',
+                              request={'instancesSet': {'items': [{'instanceId': 'i-1'}]}}))
+    capsys.readouterr()
+    assert sync()[0] == []
+    assert 'Applied 1 events' in capsys.readouterr().out
+    sync()
+    assert 'Applied 0 events' in capsys.readouterr().out
+
+
+def test_late_file_behind_the_watermark_is_read_once(aws, capsys):
+    baseline()
+    write_log('T1030', launched('i-2', '2024-01-01T10:30:00Z'))
+    sync()
+    # Delivered after the 10:30 file, for events at 10:15
+    write_log('T1015', launched('i-1', '2024-01-01T10:15:00Z'))
+    instances, state = sync()
+    assert instances == ['i-2', 'i-1']
+    assert len(state['recent_files'][LOG_DIR]) == 2
+    capsys.readouterr()
+    sync()
+    assert 'Applied 0 events' in capsys.readouterr().out
+
+    # Older than OVERLAP behind the watermark: too late
+    write_log('T0900', launched('i-0', '2024-01-01T09:00:00Z'))
+    assert sync()[0] == ['i-2', 'i-1']
+
+
+def test_pending_rescans_run_on_the_next_sync(aws):
+    baseline()
+    instance_id = run_instances(REGION, 1)[0]['InstanceId']
+    write_log('T1000', event('ModifyInstanceAttribute', '2024-01-01T10:00:00Z',
+                              request={'instanceId': instance_id}))
+    instances, state = sync('--no-rescan')
+    assert instances == []
+    assert state['pending_rescans'] == [[REGION, 'ec2', [instance_id]]]
+
+    instances, state = sync()
+    assert instances == [instance_id]
+    assert state['pending_rescans'] == []
+
+
+def test_resources_not_found_on_rescan_are_removed(aws):
+    results = cid.new_results([REGION])
+    results['regions'][REGION]['lambda'].append(LambdaRecord(FunctionName='gone', Runtime='python3.12'))
+    assert cts.describe_ids(REGION, 'lambda', ['gone']) == {'gone': None}
+    assert cts.run_rescans(results, {(REGION, 'lambda'): {'gone'}}) == {}
+    assert results['regions'][REGION]['lambda'] == []
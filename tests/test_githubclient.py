@@ -0,0 +1,74 @@
+import time
+
+from githubclient import GitHubClient, RateBudget
+
+
+def _repos(state, count):
+    for n in range(count):
+        state.add_repo(f"repo-{n:04d}")
+
+
+def test_paginates_along_the_link_header(github, tmp_path):
+    _repos(github, 250)
+    with GitHubClient('token', github.url, str(tmp_path / 'etags.json')) as client:
+        names = [r['name'] for r in client.paginate('/user/repos')]
+        assert client.stats()['requests'] == 3
+    assert names == [f"repo-{n:04d}" for n in range(250)]
+
+
+def test_unchanged_listings_are_304s_served_from_the_cache(github, tmp_path):
+    _repos(github, 150)
+    cache = str(tmp_path / 'etags.json')
+    with GitHubClient('token', github.url, cache) as client:
+        first = list(client.paginate('/user/repos'))
+    used = github._used
+    with GitHubClient('token', github.url, cache) as client:
+        assert list(client.paginate('/user/repos')) == first
+        assert client.stats()['not_modified'] == 2
+    # 304s don't count against the quota
+    assert github._used == used
+
+
+def test_cache_entries_are_per_token(github, tmp_path):
+    _repos(github, 5)
+    cache = str(tmp_path / 'etags.json')
+    with GitHubClient('token', github.url, cache) as client:
+        list(client.paginate('/user/repos'))
+    with GitHubClient('other-token', github.url, cache) as client:
+        list(client.paginate('/user/repos'))
+        assert client.stats()['not_modified'] == 0
+
+
+def test_changed_listing_is_fetched_again(github, tmp_path):
+    _repos(github, 5)
+    cache = str(tmp_path / 'etags.json')
+    with GitHubClient('token', github.url, cache) as client:
+        list(client.paginate('/user/repos'))
+    github.add_repo('repo-new')
+    with GitHubClient('token', github.url, cache) as client:
+        assert len(list(client.paginate('/user/repos'))) == 6
+        assert client.stats()['not_modified'] == 0
+
+
+def test_secondary_limit_is_backed_off_and_retried(github):
+    github.secondary_every = 2
+    with GitHubClient('token', github.url, None) as client:
+        statuses = [client.post('/user/repos', json={'name': f"new-{n}"}).status_code for n in range(2)]
+        assert client.stats()['secondary_limits'] == 1
+    assert statuses == [201, 201]
+
+
+def test_budget_spaces_requests_once_the_quota_is_short():
+    budget = RateBudget(reserve=10, burst_share=0)
+    now = time.time()
+    budget.update({'X-RateLimit-Remaining': '20', 'X-RateLimit-Reset': str(now + 100)})
+    delays = [budget.delay(now) for _ in range(3)]
+    # 10 spare requests over 100s: 10s apart, then 100s / 9 once one is spent
+    assert [round(d, 1) for d in delays] == [0.0, 10.0, 21.1]
+
+
+def test_budget_waits_for_the_reset_when_spent():
+    budget = RateBudget(reserve=10)
+    now = time.time()
+    budget.update({'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': str(now + 30)})
+    assert round(budget.delay(now)) == 31
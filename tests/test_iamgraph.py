@@ -0,0 +1,50 @@
+import json
+
+import boto3
+
+from iamgraph import AccessIndex, PolicyCache, scan_iam_graph
+
+BUCKET = 'arn:aws:s3:::data-lake'
+
+
+def _policy(effect, actions, resources):
+    return json.dumps({'Version': '2012-10-17',
+                       'Statement': [{'Effect': effect, 'Action': actions, 'Resource': resources}]})
+
+
+def _reaching_bucket(tmp_path):
+    iam = scan_iam_graph(boto3.client('iam'), PolicyCache(str(tmp_path / 'policies.json')))
+    return AccessIndex(iam).principals(BUCKET)
+
+
+# alice can do anything with the bucket and its objects
+def _alice():
+    boto3.client('s3').create_bucket(Bucket='data-lake')
+    client = boto3.client('iam')
+    arn = client.create_user(UserName='alice')['User']['Arn']
+    client.put_user_policy(UserName='alice', PolicyName='lake',
+                           PolicyDocument=_policy('Allow', 's3:*', [BUCKET, f"{BUCKET}/*"]))
+    return client, arn
+
+
+def test_deny_removes_the_access_edge(aws, tmp_path):
+    client, alice = _alice()
+    assert _reaching_bucket(tmp_path) == [alice]
+
+    # Denying one action still leaves the rest of s3:*
+    client.put_user_policy(UserName='alice', PolicyName='no-delete',
+                           PolicyDocument=_policy('Deny', 's3:DeleteBucket', BUCKET))
+    assert _reaching_bucket(tmp_path) == [alice]
+
+    client.put_user_policy(UserName='alice', PolicyName='lockout',
+                           PolicyDocument=_policy('Deny', 's3:*', 'arn:aws:s3:::data-*'))
+    assert _reaching_bucket(tmp_path) == []
+
+
+def test_group_deny_applies_to_its_users(aws, tmp_path):
+    client, alice = _alice()
+    client.create_group(GroupName='contractors')
+    client.add_user_to_group(GroupName='contractors', UserName='alice')
+    client.put_group_policy(GroupName='contractors', PolicyName='lockout',
+                            PolicyDocument=_policy('Deny', '*', '*'))
+    assert _reaching_bucket(tmp_path) == []
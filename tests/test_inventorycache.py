@@ -0,0 +1,43 @@
+import pytest
+
+import createinfradiagram as cid
+from inventorycache import InventoryCache, parse_ttls
+from tests.helpers import run_instances
+
+
+def test_entries_expire_after_their_service_ttl(tmp_path):
+    cache = InventoryCache('123456789012', str(tmp_path), ttls={'ec2': 60})
+    cache.put('us-east-1', 'ec2', [{'InstanceId': 'i-1'}], now=1000)
+    assert cache.get('us-east-1', 'ec2', now=1060) == [{'InstanceId': 'i-1'}]
+    assert cache.get('us-east-1', 'ec2', now=1061) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_missing_or_corrupt_entries_are_misses(tmp_path):
+    cache = InventoryCache('123456789012', str(tmp_path))
+    assert cache.get('us-east-1', 'rds') is None
+    cache.put('us-east-1', 'rds', [])
+    with open(cache._file('us-east-1', 'rds'), 'w') as fh:
+        fh.write('{not json')
+    assert cache.get('us-east-1', 'rds') is None
+
+
+def test_parse_ttls():
+    assert parse_ttls(['ec2=60', ' s3 =3600']) == {'ec2': 60, 's3': 3600}
+    with pytest.raises(ValueError):
+        parse_ttls(['ec2'])
+
+
+def test_rescan_uses_cache_until_refreshed(aws, tmp_path):
+    run_instances('us-east-1', 3)
+    cache = InventoryCache(cid.get_account_id(), str(tmp_path / 'cache'))
+    first = cid.scan_account(['us-east-1'], cache=cache)
+    run_instances('us-east-1', 1)
+    # Served from the cache: the new instance isn't seen yet
+    assert len(cid.scan_account(['us-east-1'], cache=cache)['regions']['us-east-1']['ec2']) == 3
+    refreshed = cid.scan_account(['us-east-1'], cache=cache, refresh_services=['ec2'])
+    assert len(refreshed['regions']['us-east-1']['ec2']) == 4
+    assert refreshed['regions']['us-east-1']['vpcs'] == first['regions']['us-east-1']['vpcs']
+    run_instances('us-east-1', 1)
+    by_region = cid.scan_account(['us-east-1'], cache=cache, refresh_regions=['us-east-1'])
+    assert len(by_region['regions']['us-east-1']['ec2']) == 5
@@ -0,0 +1,68 @@
+import json
+
+import boto3
+
+import createinfradiagram as cid
+import inventorystore
+from inventory import LambdaRecord, json_default
+from tests.helpers import run_instances
+
+
+def _dump(data):
+    return json.loads(json.dumps(data, default=json_default, sort_keys=True))
+
+
+# Three m5.large and two t3.micro instances in us-east-1, one of each stopped,
+# scanned and imported into aws_resources.db
+def _imported(capsys):
+    large = run_instances('us-east-1', 3)
+    micro = run_instances('us-east-1', 2, 't3.micro')
+    boto3.client('ec2', region_name='us-east-1').stop_instances(
+        InstanceIds=[large[0]['InstanceId'], micro[0]['InstanceId']])
+    results = cid.scan_account(['us-east-1'])
+    with open('aws_resources.json', 'w') as fh:
+        json.dump(results, fh, default=json_default)
+    inventorystore.main(['import', 'aws_resources.json'])
+    assert capsys.readouterr().out.startswith("Imported ")
+    return results
+
+
+def query(capsys, *args):
+    inventorystore.main(['query', 'ec2'] + list(args))
+    return capsys.readouterr().out.splitlines()
+
+
+def test_import_then_filter(aws, capsys):
+    _imported(capsys)
+    assert query(capsys, '--count') == ['5']
+    assert query(capsys, '--where', 'State=stopped', '--count') == ['2']
+    assert query(capsys, '--where', 'InstanceType=t3.%', '--count') == ['2']
+    stopped_micro = [json.loads(line) for line in query(capsys, '--where', 'State=stopped',
+                                                        '--where', 'InstanceType=t3.%')]
+    assert [(r['InstanceType'], r['State'], r['region']) for r in stopped_micro] == [('t3.micro', 'stopped', 'us-east-1')]
+    assert query(capsys, '--region', 'eu-west-1', '--count') == ['0']
+
+
+def test_load_round_trips_a_region_and_a_vpc(aws, capsys):
+    results = _imported(capsys)
+    region = results['regions']['us-east-1']
+    with inventorystore.InventoryStore() as store:
+        loaded = store.load('us-east-1')
+        assert _dump(loaded['regions']['us-east-1']) == _dump(region)
+        assert _dump(loaded['status']) == _dump(results['status'])
+
+        vpc_id = region['ec2'][0]['VpcId']
+        in_vpc = store.load('us-east-1', vpc_id, include_global=False)['regions']['us-east-1']
+    assert list(in_vpc['vpcs']) == [vpc_id]
+    assert _dump(in_vpc['ec2']) == _dump([i for i in region['ec2'] if i['VpcId'] == vpc_id])
+
+
+def test_lambda_outside_a_vpc_keeps_the_aws_vpc_config():
+    outside = {'SubnetIds': [], 'SecurityGroupIds': [], 'VpcId': ''}
+    record = LambdaRecord.from_dict({'FunctionName': 'fn', 'Runtime': 'python3.12', 'VpcConfig': outside})
+    assert record['VpcConfig'] == outside
+    with inventorystore.InventoryStore() as store:
+        store.write_service('us-east-1', 'lambda', [record])
+        [loaded] = store.load('us-east-1')['regions']['us-east-1']['lambda']
+    assert loaded['VpcConfig'] == outside
+    assert _dump(loaded) == {'FunctionName': 'fn', 'Runtime': 'python3.12', 'VpcConfig': outside}
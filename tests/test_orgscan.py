@@ -0,0 +1,86 @@
+import json
+import multiprocessing
+import os
+
+import boto3
+import pytest
+
+import orgscan
+
+UNREACHABLE = '000000000001'
+
+
+# Three member accounts with 1, 2 and 3 instances and a bucket each
+@pytest.fixture
+def members(aws):
+    org = boto3.client('organizations')
+    org.create_organization(FeatureSet='ALL')
+    accounts = []
+    for n in range(3):
+        account = org.create_account(AccountName=f"member-{n}",
+                                     Email=f"member-{n}@example.com")['CreateAccountStatus']['AccountId']
+        credentials = boto3.client('sts').assume_role(
+            RoleArn=f"arn:aws:iam::{account}:role/{orgscan.ROLE_NAME}", RoleSessionName='setup')['Credentials']
+        session = boto3.session.Session(aws_access_key_id=credentials['AccessKeyId'],
+                                        aws_secret_access_key=credentials['SecretAccessKey'],
+                                        aws_session_token=credentials['SessionToken'], region_name='us-east-1')
+        image = session.client('ec2').describe_images()['Images'][0]['ImageId']
+        session.client('ec2').run_instances(ImageId=image, MinCount=n + 1, MaxCount=n + 1)
+        session.client('s3').create_bucket(Bucket=f"bucket-{account}")
+        accounts.append(account)
+    return accounts
+
+
+def test_org_scan_merges_every_member(members, tmp_path):
+    merged, summaries = orgscan.scan_organization(members, out_dir=str(tmp_path / 'org'), regions=['us-east-1'],
+                                                  processes=1, cache_dir=None)
+    assert [len(merged['regions'][f"{a}/us-east-1"]['ec2']) for a in members] == [1, 2, 3]
+    assert sorted(b['Name'] for b in merged['global']['s3']) == sorted(f"bucket-{a}" for a in members)
+    # moto may not serve every API (apigateway needs extra packages), so partial is fine here
+    assert all(summaries[a]['status'] != 'failed' for a in members)
+    assert sorted(os.listdir(tmp_path / 'org')) == sorted(members + ['accounts.json', 'aws_resources.json'])
+    with open(tmp_path / 'org' / members[0] / 'aws_resources.json') as fh:
+        assert len(json.load(fh)['regions']['us-east-1']['ec2']) == 1
+
+
+def test_process_count_does_not_change_the_inventory(members, tmp_path):
+    # Worker processes only see the mocked account when they are forked from this one
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip("needs the fork start method")
+    # Pooled first: scan threads that have just been joined can still be in
+    # OpenSSL's thread cleanup, and a fork then hands the workers a held lock
+    pooled, _ = orgscan.scan_organization(members, out_dir=str(tmp_path / 'two'), regions=['us-east-1'],
+                                          processes=2, cache_dir=None)
+    serial, _ = orgscan.scan_organization(members, out_dir=str(tmp_path / 'one'), regions=['us-east-1'],
+                                          processes=1, cache_dir=None)
+    assert json.dumps(pooled, default=str, sort_keys=True) == json.dumps(serial, default=str, sort_keys=True)
+
+
+def test_unreachable_account_is_reported_not_fatal(members, tmp_path, monkeypatch):
+    assume = orgscan.assume_role_session
+
+    def denied_for_one(account, *args, **kwargs):
+        if account == UNREACHABLE:
+            raise RuntimeError("AccessDenied")
+        return assume(account, *args, **kwargs)
+
+    monkeypatch.setattr(orgscan, 'assume_role_session', denied_for_one)
+    merged, summaries = orgscan.scan_organization([UNREACHABLE, members[0]], out_dir=str(tmp_path / 'org'),
+                                                  regions=['us-east-1'], processes=1, cache_dir=None)
+    assert (summaries[UNREACHABLE]['status'], summaries[UNREACHABLE]['error']) == ('failed', 'AccessDenied')
+    assert list(merged['regions']) == [f"{members[0]}/us-east-1"]
+
+
+def test_merge_inventories_sums_iam_counts():
+    per_account = {
+        account: {'regions': {'us-east-1': {'ec2': [{'InstanceId': f"i-{account}"}]}},
+                  'global': {'s3': [{'Name': account}],
+                             'iam': {'UsersCount': 2, 'Access': {'*': [f"arn:aws:iam::{account}:user/a"]}}},
+                  'status': {'us-east-1': {'ec2': 'complete'}}}
+        for account in ('111111111111', '222222222222')
+    }
+    merged = orgscan.merge_inventories(per_account)
+    assert list(merged['regions']) == ['111111111111/us-east-1', '222222222222/us-east-1']
+    assert merged['global']['iam']['UsersCount'] == 4
+    assert len(merged['global']['iam']['Access']['*']) == 2
+    assert [b['Name'] for b in merged['global']['s3']] == ['111111111111', '222222222222']
@@ -0,0 +1,52 @@
+import boto3
+from botocore.stub import Stubber
+
+import scannerregistry  # noqa: F401  (adds its entries' operations to PAGINATION)
+from pagination import BATCH_LIMITS, batched, batched_describe, map_concurrently, pages, paginate
+
+
+def _client(service):
+    return boto3.client(service, region_name='us-east-1', aws_access_key_id='testing',
+                        aws_secret_access_key='testing')
+
+
+def test_pages_follow_the_token_at_the_largest_page_size():
+    client = _client('rds')
+    with Stubber(client) as stub:
+        stub.add_response('describe_db_instances', {'DBInstances': [{'DBInstanceIdentifier': 'a'}], 'Marker': 'm1'},
+                          {'MaxRecords': 100})
+        stub.add_response('describe_db_instances', {'DBInstances': [{'DBInstanceIdentifier': 'b'}]},
+                          {'MaxRecords': 100, 'Marker': 'm1'})
+        names = [i['DBInstanceIdentifier'] for i in paginate(client, 'describe_db_instances', 'DBInstances')]
+        stub.assert_no_pending_responses()
+    assert names == ['a', 'b']
+
+
+def test_dotted_response_tokens():
+    client = _client('cloudfront')
+    with Stubber(client) as stub:
+        page = {'Marker': '', 'MaxItems': 1, 'IsTruncated': True, 'Quantity': 1, 'NextMarker': 'next'}
+        stub.add_response('list_distributions', {'DistributionList': page}, {'MaxItems': '1000'})
+        stub.add_response('list_distributions', {'DistributionList': dict(page, IsTruncated=False, NextMarker='')},
+                          {'Marker': 'next', 'MaxItems': '1000'})
+        assert len(list(pages(client, 'list_distributions'))) == 2
+        stub.assert_no_pending_responses()
+
+
+def test_batched_describe_chunks_to_the_batch_limit():
+    client = _client('ecs')
+    limit = BATCH_LIMITS[('ecs', 'describe_clusters')]
+    arns = [f"arn:aws:ecs:us-east-1:123456789012:cluster/c{n}" for n in range(limit * 2 + 5)]
+    with Stubber(client) as stub:
+        for chunk in batched(arns, limit):
+            stub.add_response('describe_clusters', {'clusters': [{'clusterArn': arn} for arn in chunk]},
+                              {'clusters': chunk, 'include': ['TAGS']})
+        described = list(batched_describe(client, 'describe_clusters', 'clusters', arns, 'clusters',
+                                          include=['TAGS']))
+        stub.assert_no_pending_responses()
+    assert [c['clusterArn'] for c in described] == arns
+
+
+def test_map_concurrently_keeps_input_order():
+    assert map_concurrently(lambda n: n * n, range(50), workers=8) == [n * n for n in range(50)]
+    assert map_concurrently(str, [7]) == ['7']
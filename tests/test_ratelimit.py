@@ -0,0 +1,83 @@
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+import ratelimit
+from ratelimit import AdaptiveLimiter, LIMITERS, call_api, error_code
+
+
+def _client(service='ec2'):
+    return boto3.client(service, region_name='us-east-1', aws_access_key_id='testing',
+                        aws_secret_access_key='testing')
+
+
+def test_throttled_calls_are_retried_and_slow_the_limiter():
+    client = _client()
+    with Stubber(client) as stub:
+        stub.add_client_error('describe_vpcs', 'RequestLimitExceeded')
+        stub.add_client_error('describe_vpcs', 'Throttling')
+        stub.add_response('describe_vpcs', {'Vpcs': [{'VpcId': 'vpc-1'}]})
+        assert call_api(client, 'describe_vpcs')['Vpcs'] == [{'VpcId': 'vpc-1'}]
+        stub.assert_no_pending_responses()
+    stats = LIMITERS.get('ec2', 'us-east-1').stats()
+    assert stats['calls'] == 3
+    assert stats['throttles'] == 2
+    assert stats['rate'] == ratelimit.DEFAULT_RATE / 4
+    assert stats['concurrency'] == 1
+
+
+def test_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'MAX_ATTEMPTS', 3)
+    client = _client()
+    with Stubber(client) as stub:
+        for _ in range(3):
+            stub.add_client_error('describe_vpcs', 'Throttling')
+        with pytest.raises(ClientError) as raised:
+            call_api(client, 'describe_vpcs')
+    assert error_code(raised.value) == 'Throttling'
+
+
+def test_other_errors_are_not_retried():
+    client = _client()
+    with Stubber(client) as stub:
+        stub.add_client_error('describe_vpcs', 'UnauthorizedOperation')
+        stub.add_response('describe_vpcs', {'Vpcs': []})
+        with pytest.raises(ClientError):
+            call_api(client, 'describe_vpcs')
+    assert LIMITERS.get('ec2', 'us-east-1').stats()['calls'] == 1
+
+
+def test_limiter_ramps_up_after_a_run_of_successes():
+    limiter = AdaptiveLimiter(rate=10, concurrency=2)
+    for _ in range(ratelimit.RAMP_UP_AFTER):
+        limiter.acquire()
+        limiter.release()
+    assert limiter.stats()['rate'] == 12.5
+    assert limiter.stats()['concurrency'] == 3
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.stats()['rate'] == 6.25
+    assert limiter.stats()['concurrency'] == 1
+
+
+def test_error_code_of_other_exceptions_is_none():
+    assert error_code(ValueError('x')) is None
+
+
+def test_scanner_is_partial_when_retries_run_out(monkeypatch):
+    import createinfradiagram as cid
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setattr(ratelimit, 'MAX_ATTEMPTS', 2)
+    ec2 = cid.get_client('ec2', 'us-east-1')
+    scanner = dict(cid.REGIONAL_SCANNERS)['ec2']
+    with Stubber(ec2) as stub:
+        stub.add_client_error('describe_instances', 'RequestLimitExceeded')
+        stub.add_response('describe_instances', {'Reservations': [{'Instances': [{'InstanceId': 'i-1'}]}]})
+        data, status = cid.run_scan_job('us-east-1', 'ec2', scanner)
+        assert status == 'complete'
+        assert [i['InstanceId'] for i in data] == ['i-1']
+        for _ in range(2):
+            stub.add_client_error('describe_instances', 'Throttling')
+        assert cid.run_scan_job('us-east-1', 'ec2', scanner)[1] == 'partial'
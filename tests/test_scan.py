@@ -0,0 +1,59 @@
+import json
+
+import boto3
+
+import createinfradiagram as cid
+from tests.helpers import run_instances
+
+REGIONS = ['us-east-1', 'eu-west-1']
+
+
+def _account():
+    run_instances('us-east-1', 3)
+    run_instances('eu-west-1', 2, 't3.micro')
+    boto3.client('s3').create_bucket(Bucket='bucket-one')
+    boto3.client('iam').create_user(UserName='alice')
+
+
+def _dump(results):
+    return json.dumps(results, default=cid.json_default, sort_keys=True)
+
+
+def test_scan_is_the_same_for_any_worker_count(aws):
+    _account()
+    serial = cid.scan_account(REGIONS, workers=1)
+    assert len(serial['regions']['us-east-1']['ec2']) == 3
+    assert len(serial['regions']['eu-west-1']['ec2']) == 2
+    assert [b['Name'] for b in serial['global']['s3']] == ['bucket-one']
+    for workers in (2, 8):
+        assert _dump(cid.scan_account(REGIONS, workers=workers)) == _dump(serial)
+
+
+def test_streamed_scan_loads_back_the_same(aws):
+    _account()
+    results = cid.scan_account(REGIONS, workers=4)
+    cid.scan_account(REGIONS, workers=4, stream=cid.OUT_NDJSON)
+    assert _dump(cid.load_ndjson(cid.OUT_NDJSON)) == _dump(results)
+
+
+def test_failed_job_marks_only_its_service_partial(aws):
+    def broken(region, results):
+        raise RuntimeError("boom")
+
+    data, status = cid.run_scan_job('us-east-1', 'ec2', broken)
+    assert (data, status) == ([], 'partial')
+    assert cid.run_scan_job('us-east-1', 'ec2', dict(cid.REGIONAL_SCANNERS)['ec2'])[1] == 'complete'
+
+
+def test_region_and_account_lookups_are_retried_when_throttled(monkeypatch):
+    from botocore.stub import Stubber
+    clients = {service: boto3.client(service, region_name='us-east-1', aws_access_key_id='testing',
+                                     aws_secret_access_key='testing') for service in ('ec2', 'sts')}
+    monkeypatch.setattr(cid, 'get_client', lambda service, region=None: clients[service])
+    with Stubber(clients['ec2']) as ec2, Stubber(clients['sts']) as sts:
+        ec2.add_client_error('describe_regions', 'RequestLimitExceeded')
+        ec2.add_response('describe_regions', {'Regions': [{'RegionName': 'us-east-1'}]})
+        sts.add_client_error('get_caller_identity', 'Throttling')
+        sts.add_response('get_caller_identity', {'Account': '123456789012'})
+        assert cid.get_all_regions() == ['us-east-1']
+        assert cid.get_account_id() == '123456789012'